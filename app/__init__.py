@@ -5,7 +5,8 @@ Clinic Management System Application Package.
 from flask import Flask
 import logging
 from app.routes import register_routes
-from app.repositories import patient_repository, appointment_repository
+from app.cli import register_commands
+from app import cache, repositories, services, wal
 from app.models import Patient, Appointment
 
 # Configure logging
@@ -19,24 +20,45 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__, template_folder='templates', static_folder='static')
 app.secret_key = 'clinic-management-system-secret-key-change-in-production'
 
-# Register all routes
+# Storage engine defaults; override via create_app(config) or FLASK_* environment variables
+app.config.from_mapping(
+    REPOSITORY_ENGINE='memory',
+    SQLITE_PATH='clinic.db',
+    # Rendered responses kept by the response cache; 0 disables it
+    RESPONSE_CACHE_SIZE=cache.DEFAULT_CACHE_SIZE,
+    # What adding a patient with another's name and phone does: reject, warn or merge
+    DUPLICATE_POLICY=services.DEFAULT_DUPLICATE_POLICY,
+    # Directory for the memory and columnar engines' write-ahead log and
+    # snapshots; data there is recovered on startup. None keeps data in memory only
+    DURABILITY_PATH=None,
+    # When logged writes are fsynced: always, interval or never
+    WAL_FSYNC=wal.DEFAULT_FSYNC_POLICY,
+    WAL_FSYNC_INTERVAL=wal.WAL_FSYNC_INTERVAL,
+    # Logged writes between snapshots; 0 disables automatic snapshots
+    SNAPSHOT_EVERY=wal.SNAPSHOT_EVERY
+)
+
+# Register all routes and CLI commands
 register_routes(app)
+register_commands(app)
 
 
 def initialize_sample_data():
     """Initialize the application with sample data for demonstration."""
     try:
         # Check if data already exists
-        if patient_repository.count() > 0:
+        if repositories.patient_repository.count() > 0:
             logger.info("Sample data already exists, skipping initialization")
             return
         
         # Create sample patients
-        patient1 = patient_repository.create('Ahmed Ali', '30', '091-111-222', 'Regular patient')
-        patient2 = patient_repository.create('Sara Omar', '25', '092-222-333', 'New patient')
+        patient1 = repositories.patient_repository.create('Ahmed Ali', '30', '091-111-222',
+                                                          'Regular patient')
+        patient2 = repositories.patient_repository.create('Sara Omar', '25', '092-222-333',
+                                                          'New patient')
         
         # Create sample appointment
-        appointment_repository.create(
+        repositories.appointment_repository.create(
             patient_id=patient1.id,
             date='2025-10-22',
             description='General Checkup'
@@ -47,8 +69,26 @@ def initialize_sample_data():
         logger.error(f"Error initializing sample data: {e}", exc_info=True)
 
 
-def create_app():
-    """Application factory function."""
+def create_app(config=None):
+    """
+    Application factory function.
+    
+    Args:
+        config: Optional mapping of configuration overrides, e.g.
+                {'REPOSITORY_ENGINE': 'sqlite', 'SQLITE_PATH': 'clinic.db',
+                 'RESPONSE_CACHE_SIZE': 1024, 'DUPLICATE_POLICY': 'reject',
+                 'DURABILITY_PATH': 'data', 'WAL_FSYNC': 'always'}
+    """
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
+    
+    # Select the storage engine
+    repositories.configure_repositories(app.config['REPOSITORY_ENGINE'], app.config)
+    logger.info(f"Using {app.config['REPOSITORY_ENGINE']} repository engine")
+    cache.configure_response_cache(app.config['RESPONSE_CACHE_SIZE'])
+    services.configure_duplicate_policy(app.config['DUPLICATE_POLICY'])
+    
     # Initialize sample data
     initialize_sample_data()
     return app
@@ -0,0 +1,131 @@
+"""
+Size-bounded LRU cache for rendered responses.
+Entries are tagged with the data version they were built from, so a
+write anywhere in the repositories makes every older entry a miss.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Default number of cached responses; 0 disables caching
+DEFAULT_CACHE_SIZE = 256
+
+
+class ResponseCache:
+    """
+    LRU cache of values that are only valid for one data version.
+
+    get() returns a value only if it was stored for the same version;
+    a stale entry is dropped on lookup. Once full, the least recently
+    used entry is evicted.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum number of cached values; 0 disables caching
+
+        Raises:
+            ValueError: If max_entries is negative
+        """
+        if max_entries < 0:
+            raise ValueError("max_entries must not be negative")
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (version, value), least recently used first
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything at all."""
+        return self.max_entries > 0
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        """
+        Look up a value built from the given data version.
+
+        Args:
+            key: Cache key
+            version: Current data version
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, version: Hashable, value: Any) -> None:
+        """
+        Store a value built from the given data version.
+
+        Args:
+            key: Cache key
+            version: Data version read before the value was built
+            value: Value to cache
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss metrics.
+
+        Returns:
+            Dictionary with entry count, capacity, hits, misses,
+            evictions and hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+# Active cache used by routes. Always look it up through this module so
+# configure_response_cache() replacements take effect.
+response_cache = ResponseCache()
+
+
+def configure_response_cache(max_entries: int = DEFAULT_CACHE_SIZE) -> None:
+    """
+    Replace the active response cache with an empty one.
+
+    Args:
+        max_entries: Maximum number of cached responses; 0 disables caching
+
+    Raises:
+        ValueError: If max_entries is negative
+    """
+    global response_cache
+    response_cache = ResponseCache(max_entries)
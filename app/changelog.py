@@ -0,0 +1,114 @@
+"""
+Bounded change logs for the in-memory repositories.
+Record which IDs each write touched, so clients can sync deltas instead
+of re-fetching everything.
+"""
+
+import time
+from collections import deque
+from itertools import count
+from typing import Iterable, List, NamedTuple, Optional
+
+# Kinds of change recorded in a log
+CHANGE_OPS = ('create', 'update', 'delete')
+
+# Default number of entries a log keeps; older entries are dropped
+CHANGE_LOG_SIZE = 10_000
+
+# Versions for every in-process log come from one counter, so no two
+# repositories, and no two states of one repository, share a version.
+# It starts at the clock in nanoseconds, so a restarted process never
+# repeats a version handed out (for example in an ETag) by an earlier one.
+_versions = count(time.time_ns())
+
+
+class Change(NamedTuple):
+    """One record touched by one write."""
+    version: int
+    op: str
+    record_id: int
+
+
+class ChangeLog:
+    """
+    Version counter plus the most recent changes of one repository.
+
+    Every write gets a new, higher version. The log keeps the last
+    max_entries changes; once older ones are dropped, clients holding a
+    version from before the drop must re-fetch everything.
+
+    Not thread-safe on its own: repositories record changes while
+    holding their write lock and read them while holding the read lock.
+    """
+
+    def __init__(self, max_entries: int = CHANGE_LOG_SIZE):
+        """
+        Initialize an empty log.
+
+        Args:
+            max_entries: Maximum number of changes kept
+
+        Raises:
+            ValueError: If max_entries is less than 1
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self._entries: deque = deque(maxlen=max_entries)
+        self.version = next(_versions)
+        # Every change after this version is still in the log
+        self._floor = self.version
+
+    def record(self, op: str, record_ids: Iterable[int]) -> int:
+        """
+        Record one write touching the given records.
+
+        Args:
+            op: One of CHANGE_OPS
+            record_ids: IDs of the created, updated or deleted records
+
+        Returns:
+            The new version
+        """
+        version = next(_versions)
+        changes = [Change(version, op, record_id) for record_id in record_ids]
+        overflow = len(self._entries) + len(changes) - self.max_entries
+        if overflow > 0:
+            # The last change pushed out sets the new floor
+            self._floor = (self._entries[overflow - 1].version
+                           if overflow <= len(self._entries) else version)
+        self._entries.extend(changes)
+        self.version = version
+        return version
+
+    def reset(self) -> int:
+        """
+        Forget every change, e.g. after all records were removed.
+
+        Returns:
+            The new version; clients on any older version must re-fetch
+        """
+        self._entries.clear()
+        self.version = self._floor = next(_versions)
+        return self.version
+
+    def since(self, version: int) -> Optional[List[Change]]:
+        """
+        Get the changes made after a version.
+
+        Args:
+            version: Version the client last synced to
+
+        Returns:
+            Changes in the order they were made, or None if the log no
+            longer reaches back to that version (or never issued it)
+        """
+        if version < self._floor or version > self.version:
+            return None
+        changes = []
+        for change in reversed(self._entries):
+            if change.version <= version:
+                break
+            changes.append(change)
+        changes.reverse()
+        return changes
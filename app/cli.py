@@ -0,0 +1,138 @@
+"""
+Command line interface for the Clinic Management System.
+Adds `flask import-patients`, `flask import-appointments` and
+`flask find-duplicates`.
+"""
+
+import functools
+import os
+import time
+from typing import Callable, Optional, TextIO
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+from app import repositories, services
+from app.importer import IMPORT_BATCH_SIZE, IMPORT_FORMATS, ImportReport, import_patients, import_appointments
+from app.services import find_patient_duplicate_clusters
+
+
+# Engines that keep data in the process; they persist only with DURABILITY_PATH
+IN_PROCESS_ENGINES = ('memory', 'columnar')
+
+
+def with_repositories(command: Optional[Callable] = None, *,
+                      persistent: bool = False) -> Callable:
+    """
+    Run a command against the storage engine selected by the app config.
+
+    The `flask` command loads the module-level app, which never goes through
+    create_app(), so the engine and duplicate policy are configured here from
+    the app config and FLASK_* environment variables. No sample data is added.
+
+    Args:
+        command: Command callback; omit to pass options
+        persistent: Refuse to run unless written data outlives the command,
+                    i.e. the engine is not in-process or DURABILITY_PATH is set
+    """
+    if command is None:
+        return functools.partial(with_repositories, persistent=persistent)
+
+    @functools.wraps(command)
+    @with_appcontext
+    def wrapper(*args, **kwargs):
+        config = current_app.config
+        config.from_prefixed_env()
+        engine = config['REPOSITORY_ENGINE']
+        if persistent and engine in IN_PROCESS_ENGINES and not config.get('DURABILITY_PATH'):
+            raise click.ClickException(
+                f"The {engine} engine keeps data only until the command exits; set "
+                "FLASK_REPOSITORY_ENGINE=sqlite (with FLASK_SQLITE_PATH) or "
+                "FLASK_DURABILITY_PATH so the data is kept")
+        repositories.configure_repositories(engine, config)
+        services.configure_duplicate_policy(config['DUPLICATE_POLICY'])
+        return command(*args, **kwargs)
+    return wrapper
+
+
+def _detect_format(stream: TextIO, fmt: Optional[str]) -> str:
+    """Use the given format, or infer it from the file extension (default csv)."""
+    if fmt:
+        return fmt
+    extension = os.path.splitext(getattr(stream, 'name', ''))[1].lower()
+    return 'jsonl' if extension in ('.jsonl', '.ndjson') else 'csv'
+
+
+def _run_import(importer: Callable[..., ImportReport], noun: str,
+                stream: TextIO, fmt: Optional[str], batch_size: int) -> None:
+    """Run an import, print a summary and the row errors, and exit 1 if any row failed."""
+    start = time.perf_counter()
+    report = importer(stream, _detect_format(stream, fmt), batch_size)
+    elapsed = time.perf_counter() - start
+    rate = report.imported / elapsed if elapsed else 0
+    click.echo(f"Imported {report.imported} {noun} in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    if report.merged:
+        click.echo(f"Merged {report.merged} duplicate row(s) into existing {noun}")
+    if report.failed:
+        for row, message in report.errors:
+            click.echo(f"  row {row}: {message}", err=True)
+        hidden = report.failed - len(report.errors)
+        if hidden:
+            click.echo(f"  ... and {hidden} more", err=True)
+        click.echo(f"{report.failed} row(s) rejected", err=True)
+        raise SystemExit(1)
+
+
+def _import_options(command: Callable) -> Callable:
+    """Add the options shared by the import commands."""
+    command = click.option('--batch-size', type=click.IntRange(min=1), default=IMPORT_BATCH_SIZE,
+                           show_default=True, help='Records inserted per batch.')(command)
+    command = click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS),
+                           help='Input format; inferred from the file extension by default.')(command)
+    return click.argument('source', type=click.File('r', encoding='utf-8'))(command)
+
+
+@click.command('import-patients')
+@_import_options
+@with_repositories(persistent=True)
+def import_patients_command(source: TextIO, fmt: Optional[str], batch_size: int) -> None:
+    """Import patients from SOURCE, a CSV or JSON Lines file ('-' for stdin)."""
+    _run_import(import_patients, 'patients', source, fmt, batch_size)
+
+
+@click.command('import-appointments')
+@_import_options
+@with_repositories(persistent=True)
+def import_appointments_command(source: TextIO, fmt: Optional[str], batch_size: int) -> None:
+    """Import appointments from SOURCE, a CSV or JSON Lines file ('-' for stdin)."""
+    _run_import(import_appointments, 'appointments', source, fmt, batch_size)
+
+
+@click.command('find-duplicates')
+@with_repositories
+def find_duplicates_command() -> None:
+    """List groups of patients sharing a name and phone number; exit 1 if any."""
+    start = time.perf_counter()
+    clusters = find_patient_duplicate_clusters()
+    elapsed = time.perf_counter() - start
+    for cluster in clusters:
+        ids = ', '.join(f'#{patient.id}' for patient in cluster.patients)
+        click.echo(f"{cluster.patients[0].name} ({cluster.patients[0].phone}): {ids}")
+    duplicates = sum(len(cluster.patients) - 1 for cluster in clusters)
+    click.echo(f"Found {len(clusters)} duplicate group(s), {duplicates} extra record(s) "
+               f"in {elapsed:.2f}s")
+    if clusters:
+        raise SystemExit(1)
+
+
+def register_commands(app: Flask) -> None:
+    """
+    Register CLI commands with the Flask application.
+    
+    Args:
+        app: Flask application instance
+    """
+    app.cli.add_command(import_patients_command)
+    app.cli.add_command(import_appointments_command)
+    app.cli.add_command(find_duplicates_command)
@@ -0,0 +1,429 @@
+"""
+Column-oriented in-memory storage for appointments.
+Keeps appointment fields in typed arrays instead of one Python object per
+row, which cuts memory per appointment several-fold at large sizes.
+"""
+
+import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.locking import ReadWriteLock, reader, writer
+from app.models import Appointment
+from app.changelog import CHANGE_LOG_SIZE, ChangeLog
+from app.repositories import AppointmentRepository, _appointment_row
+from app.sequence import IdSequence
+from app.sorted_list import SortedList
+from app.text_index import InvertedIndex
+from app.wal import WriteAheadLog, durable
+
+# Rows per block; a delete shifts at most one block's arrays
+BLOCK_SIZE = 1000
+
+# Date index keys pack (date ordinal, id) into one int
+ID_BITS = 40
+ID_MASK = (1 << ID_BITS) - 1
+
+
+@lru_cache(maxsize=4096)
+def iso_date(ordinal: int) -> str:
+    """Format a date ordinal as YYYY-MM-DD; cached as few dates recur often."""
+    return datetime.date.fromordinal(ordinal).isoformat()
+
+
+def date_ordinal(date: str) -> int:
+    """
+    Convert a YYYY-MM-DD date to its proleptic Gregorian ordinal.
+    
+    Args:
+        date: Date string
+    
+    Returns:
+        Day number as returned by datetime.date.toordinal
+    
+    Raises:
+        ValueError: If date is not a valid YYYY-MM-DD date
+    """
+    try:
+        ordinal = datetime.date.fromisoformat(date).toordinal()
+    except (TypeError, ValueError):
+        ordinal = None
+    # fromisoformat also accepts forms like 20251225 that would not round-trip
+    if ordinal is None or iso_date(ordinal) != date:
+        raise ValueError(f"Date must be in YYYY-MM-DD format: {date!r}")
+    return ordinal
+
+
+class _Block:
+    """Up to BLOCK_SIZE consecutive rows, one array per column."""
+    
+    __slots__ = ('ids', 'patient_ids', 'dates', 'descriptions')
+    
+    def __init__(self):
+        """Initialize an empty block."""
+        self.ids = array('q')
+        self.patient_ids = array('q')
+        self.dates = array('i')
+        self.descriptions: List[str] = []
+    
+    def row(self, index: int) -> Appointment:
+        """Build the Appointment stored at a row index."""
+        return Appointment(
+            appointment_id=self.ids[index],
+            patient_id=self.patient_ids[index],
+            date=iso_date(self.dates[index]),
+            description=self.descriptions[index]
+        )
+    
+    def delete(self, index: int) -> None:
+        """Remove the row at an index."""
+        del self.ids[index]
+        del self.patient_ids[index]
+        del self.dates[index]
+        del self.descriptions[index]
+
+
+class AppointmentTable:
+    """
+    Appointment rows ordered by ID and stored column-wise in blocks.
+    
+    Supports the mapping operations AppointmentRepository performs on its
+    id -> Appointment dict. Reads build a new Appointment from the columns.
+    Identical descriptions share one string object.
+    """
+    
+    def __init__(self):
+        """Initialize an empty table."""
+        self._blocks: List[_Block] = []
+        # Largest ID in each block, for locating a row by bisection
+        self._maxes: List[int] = []
+        self._len = 0
+        # Pool of distinct descriptions, released by clear()
+        self._strings: Dict[str, str] = {}
+    
+    def __len__(self) -> int:
+        """Get the number of rows."""
+        return self._len
+    
+    def __contains__(self, appointment_id: int) -> bool:
+        """Check whether a row exists."""
+        return self._locate(appointment_id) is not None
+    
+    def __getitem__(self, appointment_id: int) -> Appointment:
+        """Get a row by ID, raising KeyError if missing."""
+        found = self._locate(appointment_id)
+        if found is None:
+            raise KeyError(appointment_id)
+        return self._blocks[found[0]].row(found[1])
+    
+    def get(self, appointment_id: int, default: Optional[Appointment] = None) -> Optional[Appointment]:
+        """Get a row by ID, or default if missing."""
+        found = self._locate(appointment_id)
+        if found is None:
+            return default
+        return self._blocks[found[0]].row(found[1])
+    
+    def _locate(self, appointment_id: int) -> Optional[Tuple[int, int]]:
+        """Get the (block, row) position of an ID, or None if missing."""
+        pos = bisect_left(self._maxes, appointment_id)
+        if pos == len(self._maxes):
+            return None
+        ids = self._blocks[pos].ids
+        # ids[-1] >= appointment_id, so index is in range
+        index = bisect_left(ids, appointment_id)
+        if ids[index] != appointment_id:
+            return None
+        return pos, index
+    
+    def append(self, appointment_id: int, patient_id: int, ordinal: int, description: str) -> None:
+        """
+        Add a row after all existing rows.
+        
+        Args:
+            appointment_id: Appointment ID, larger than every stored ID
+            patient_id: ID of the patient
+            ordinal: Appointment date as a date ordinal
+            description: Appointment description
+        
+        Raises:
+            ValueError: If appointment_id is not larger than every stored ID
+        """
+        if self._maxes and appointment_id <= self._maxes[-1]:
+            raise ValueError("Appointment IDs must be appended in increasing order")
+        if not self._blocks or len(self._blocks[-1].ids) >= BLOCK_SIZE:
+            self._blocks.append(_Block())
+            self._maxes.append(appointment_id)
+        block = self._blocks[-1]
+        block.ids.append(appointment_id)
+        block.patient_ids.append(patient_id)
+        block.dates.append(ordinal)
+        block.descriptions.append(self._strings.setdefault(description, description))
+        self._maxes[-1] = appointment_id
+        self._len += 1
+    
+    def pop(self, appointment_id: int) -> Appointment:
+        """
+        Remove a row by ID.
+        
+        Args:
+            appointment_id: ID of the row to remove
+        
+        Returns:
+            The removed Appointment
+        
+        Raises:
+            KeyError: If there is no such row
+        """
+        found = self._locate(appointment_id)
+        if found is None:
+            raise KeyError(appointment_id)
+        pos, index = found
+        block = self._blocks[pos]
+        appointment = block.row(index)
+        block.delete(index)
+        if not block.ids:
+            del self._blocks[pos]
+            del self._maxes[pos]
+        elif index == len(block.ids):
+            self._maxes[pos] = block.ids[-1]
+        self._len -= 1
+        return appointment
+    
+    def values(self) -> Iterator[Appointment]:
+        """Iterate over all rows in ID order."""
+        for block in self._blocks:
+            for index in range(len(block.ids)):
+                yield block.row(index)
+    
+    def window(self, after_id: Optional[int], offset: int, limit: int) -> List[Appointment]:
+        """
+        Get consecutive rows in ID order.
+        
+        Args:
+            after_id: Only consider rows with a larger ID, or None for all
+            offset: Number of rows to skip
+            limit: Maximum number of rows to return
+        
+        Returns:
+            List of at most limit Appointments
+        """
+        pos, index = 0, 0
+        if after_id is not None:
+            pos = bisect_right(self._maxes, after_id)
+            if pos == len(self._maxes):
+                return []
+            index = bisect_right(self._blocks[pos].ids, after_id)
+        index += offset
+        while pos < len(self._blocks) and index >= len(self._blocks[pos].ids):
+            index -= len(self._blocks[pos].ids)
+            pos += 1
+        rows: List[Appointment] = []
+        while pos < len(self._blocks) and len(rows) < limit:
+            block = self._blocks[pos]
+            stop = min(len(block.ids), index + limit - len(rows))
+            rows.extend(block.row(i) for i in range(index, stop))
+            pos, index = pos + 1, 0
+        return rows
+    
+    def newest(self, limit: int) -> List[Appointment]:
+        """Get up to limit rows with the largest IDs, largest first."""
+        rows: List[Appointment] = []
+        for block in reversed(self._blocks):
+            for index in range(len(block.ids) - 1, -1, -1):
+                if len(rows) >= limit:
+                    return rows
+                rows.append(block.row(index))
+        return rows
+    
+    def clear(self) -> None:
+        """Remove all rows."""
+        self._blocks.clear()
+        self._maxes.clear()
+        self._strings.clear()
+        self._len = 0
+
+
+class ColumnarAppointmentRepository(AppointmentRepository):
+    """
+    AppointmentRepository keeping rows in an AppointmentTable.
+    
+    Same interface and results as AppointmentRepository, with two
+    differences: dates must be YYYY-MM-DD, and every read returns a new
+    Appointment object built from the columns.
+    """
+    
+    def __init__(self, change_log_size: int = CHANGE_LOG_SIZE):
+        """
+        Initialize the repository with empty storage.
+        
+        Args:
+            change_log_size: Number of recent changes kept for changes_since()
+        """
+        # Same locking scheme as AppointmentRepository, except that
+        # find_by_id also locks: a table lookup is several steps
+        self._lock = ReadWriteLock()
+        # Rows are kept in ID order, so the table doubles as the ID index
+        self._appointments = AppointmentTable()
+        # Secondary index: patient_id -> array of appointment ids
+        self._by_patient: Dict[int, array] = {}
+        # Sorted date keys: date ordinal << ID_BITS | appointment id
+        self._by_date = SortedList()
+        self._text_index = InvertedIndex()
+        self._sequence = IdSequence()
+        self._changes = ChangeLog(change_log_size)
+        self._journal: Optional[WriteAheadLog] = None
+    
+    @durable
+    @writer
+    def create(self, patient_id: int, date: str, description: str) -> Appointment:
+        """
+        Create a new appointment.
+        
+        Args:
+            patient_id: ID of the patient
+            date: Appointment date (YYYY-MM-DD)
+            description: Appointment description
+        
+        Returns:
+            Created Appointment object
+        
+        Raises:
+            ValueError: If date is not a valid YYYY-MM-DD date
+        """
+        # Validate before taking an ID
+        ordinal = date_ordinal(date)
+        appointment_id = self._sequence.next()
+        self._append(appointment_id, patient_id, ordinal, description)
+        appointment = Appointment(appointment_id, patient_id, date, description)
+        self._changes.record('create', (appointment_id,))
+        self._log('create', [_appointment_row(appointment)])
+        return appointment
+    
+    @durable
+    @writer
+    def create_many(self, records: Iterable[Tuple[int, str, str]]) -> List[Appointment]:
+        """
+        Create many appointments in one step.
+        
+        Args:
+            records: (patient_id, date, description) tuples
+            
+        Returns:
+            Created Appointment objects, in input order
+            
+        Raises:
+            ValueError: If any date is not a valid YYYY-MM-DD date; nothing
+                        is created in that case
+        """
+        records = list(records)
+        if not records:
+            return []
+        ordinals = [date_ordinal(date) for _, date, _ in records]
+        # Allocated under the write lock, so the block follows every stored row
+        ids = self._sequence.allocate(len(records))
+        appointments = []
+        for appointment_id, ordinal, (patient_id, date, description) in zip(ids, ordinals, records):
+            self._append(appointment_id, patient_id, ordinal, description)
+            appointments.append(Appointment(appointment_id, patient_id, date, description))
+        self._changes.record('create', ids)
+        self._log('create', [_appointment_row(appointment) for appointment in appointments])
+        return appointments
+    
+    def _append(self, appointment_id: int, patient_id: int, ordinal: int,
+                description: str) -> None:
+        """Store and index a row with the largest ID yet; the caller holds the write lock."""
+        self._appointments.append(appointment_id, patient_id, ordinal, description)
+        self._by_patient.setdefault(patient_id, array('q')).append(appointment_id)
+        self._by_date.add(ordinal << ID_BITS | appointment_id)
+        self._text_index.add(appointment_id, description)
+    
+    def _insert(self, appointment: Appointment) -> None:
+        """Store and index a replayed appointment; the caller holds the write lock."""
+        self._append(appointment.id, appointment.patient_id, date_ordinal(appointment.date),
+                     appointment.description)
+    
+    @reader
+    def find_by_id(self, appointment_id: int) -> Optional[Appointment]:
+        """
+        Find an appointment by ID.
+        
+        Args:
+            appointment_id: Appointment ID to search for
+        
+        Returns:
+            Appointment object if found, None otherwise
+        """
+        return self._appointments.get(appointment_id)
+    
+    @reader
+    def get_page(self, limit: int, offset: int = 0,
+                 after_id: Optional[int] = None) -> List[Appointment]:
+        """
+        Get one page of appointments ordered by ID.
+        
+        Args:
+            limit: Maximum number of appointments to return
+            offset: Number of appointments to skip
+            after_id: Keyset cursor; start after this ID when given
+        
+        Returns:
+            List of Appointment objects
+        """
+        return self._appointments.window(after_id, offset, limit)
+    
+    @reader
+    def get_recent(self, limit: int) -> List[Appointment]:
+        """
+        Get the most recently created appointments.
+        
+        Args:
+            limit: Maximum number of appointments to return
+        
+        Returns:
+            List of Appointment objects, newest first
+        """
+        return self._appointments.newest(limit)
+    
+    @durable
+    @writer
+    def delete_by_patient_id(self, patient_id: int) -> int:
+        """
+        Delete all appointments for a specific patient.
+        
+        Args:
+            patient_id: Patient ID whose appointments should be deleted
+        
+        Returns:
+            Number of appointments deleted
+        """
+        doomed = self._delete_by_patient_id(patient_id)
+        if doomed:
+            self._changes.record('delete', doomed)
+            self._log('delete_by_patient', [(patient_id,)])
+        return len(doomed)
+    
+    def _delete_by_patient_id(self, patient_id: int) -> array:
+        """Drop a patient's appointments and return their IDs; the caller holds the write lock."""
+        doomed = self._by_patient.pop(patient_id, array('q'))
+        for appointment_id in doomed:
+            appointment = self._appointments.pop(appointment_id)
+            self._by_date.discard(date_ordinal(appointment.date) << ID_BITS | appointment_id)
+            self._text_index.remove(appointment_id, appointment.description)
+        return doomed
+    
+    def _find_by_date_range(self, date_from: Optional[str],
+                            date_to: Optional[str]) -> List[Appointment]:
+        """find_by_date_range without locking, for callers already holding the lock."""
+        minimum = date_ordinal(date_from) << ID_BITS if date_from else None
+        maximum = date_ordinal(date_to) << ID_BITS | ID_MASK if date_to else None
+        return [self._appointments[key & ID_MASK]
+                for key in self._by_date.irange(minimum, maximum)]
+    
+    def _clear(self) -> None:
+        """Drop every appointment; the caller holds the write lock."""
+        self._appointments.clear()
+        self._by_patient.clear()
+        self._by_date.clear()
+        self._text_index.clear()
@@ -0,0 +1,42 @@
+"""
+Batch duplicate detection over existing patients.
+Groups patients by their identity key (phone digits plus normalized
+name) in one hashing pass, so a whole dataset is checked in linear time.
+"""
+
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from app.models import Patient
+from app.patient_index import identity_key
+
+
+class DuplicateCluster(NamedTuple):
+    """Patients sharing one identity key."""
+    phone: str
+    name: str
+    patients: List[Patient]
+
+    def to_dict(self) -> dict:
+        """Convert the cluster to a dictionary."""
+        return {'phone': self.phone, 'name': self.name,
+                'patients': [patient.to_dict() for patient in self.patients]}
+
+
+def find_duplicate_clusters(patients: Iterable[Patient]) -> List[DuplicateCluster]:
+    """
+    Find groups of patients that are probably the same person.
+
+    Args:
+        patients: Patients to check, e.g. read page by page
+
+    Returns:
+        Clusters of two or more patients, each ordered by ID; clusters are
+        ordered by their first patient's ID
+    """
+    groups: Dict[Tuple[str, str], List[Patient]] = {}
+    for patient in patients:
+        groups.setdefault(identity_key(patient.name, patient.phone), []).append(patient)
+    clusters = [DuplicateCluster(phone, name, sorted(group, key=lambda p: p.id))
+                for (phone, name), group in groups.items() if len(group) > 1]
+    clusters.sort(key=lambda cluster: cluster.patients[0].id)
+    return clusters
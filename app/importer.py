@@ -0,0 +1,209 @@
+"""
+Bulk import of patients and appointments from CSV or JSON Lines.
+Records are read as a stream and validated and inserted in batches, so
+memory use depends on the batch size rather than the file size.
+"""
+
+import csv
+import json
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+from app import repositories
+from app.services import (
+    create_valid_patients, validate_many, validate_patient_record, validate_appointment_record
+)
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+# Records validated and inserted per repository call
+IMPORT_BATCH_SIZE = 1000
+
+# Row errors kept in a report; further failures are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# (row number, record or None, parse error or None)
+RawRecord = Tuple[int, Optional[Dict[str, str]], Optional[str]]
+
+
+class ImportReport:
+    """Outcome of a bulk import."""
+    
+    def __init__(self):
+        """Initialize an empty report."""
+        self.imported = 0
+        # Duplicate rows folded into an existing patient under the 'merge' policy
+        self.merged = 0
+        self.failed = 0
+        # (row number, error message) for the first MAX_REPORTED_ERRORS failures
+        self.errors: List[Tuple[int, str]] = []
+    
+    def add_error(self, row: int, message: str) -> None:
+        """
+        Record a rejected row.
+        
+        Args:
+            row: Line number of the row in the input
+            message: Why the row was rejected
+        """
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row, message))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the report to dictionary format."""
+        return {
+            'imported': self.imported,
+            'merged': self.merged,
+            'failed': self.failed,
+            'errors': [{'row': row, 'error': message} for row, message in self.errors]
+        }
+
+
+def _field_name(header: str) -> str:
+    """Normalize a column header, so 'Patient ID' matches 'patient_id'."""
+    return header.strip().lower().replace(' ', '_')
+
+
+def read_records(stream: TextIO, fmt: str) -> Iterator[RawRecord]:
+    """
+    Read records one at a time from a CSV or JSON Lines stream.
+    
+    CSV input needs a header row; JSON Lines input has one object per line.
+    Field names are matched case-insensitively, with spaces read as
+    underscores, so files written by the CSV exports can be imported.
+    
+    Args:
+        stream: Text stream to read
+        fmt: 'csv' or 'jsonl'
+        
+    Returns:
+        Iterator of (row number, record, error) tuples; exactly one of
+        record and error is None
+        
+    Raises:
+        ValueError: If fmt is not a supported format
+    """
+    if fmt == 'csv':
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        fields = [_field_name(name) for name in header]
+        for row in reader:
+            if row:
+                yield reader.line_num, dict(zip(fields, row)), None
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "Each line must be a JSON object"
+                continue
+            yield line_number, {_field_name(key): '' if value is None else str(value)
+                                for key, value in record.items()}, None
+    else:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+
+def _import(records: Iterator[RawRecord], batch_size: int,
+            to_values: Callable[[Dict[str, str]], Tuple[Optional[tuple], Optional[str]]],
+            insert: Callable[[List[Tuple[int, tuple]], ImportReport], None]) -> ImportReport:
+    """Validate records in batches and pass the valid (row, values) pairs to insert."""
+    report = ImportReport()
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return report
+        parsed = []
+        for row, record, error in batch:
+            if error:
+                report.add_error(row, error)
+            else:
+                parsed.append((row, record))
+        values, errors = validate_many((record for _, record in parsed), to_values)
+        valid = []
+        for (row, _), item_values, error in zip(parsed, values, errors):
+            if error:
+                report.add_error(row, error)
+            else:
+                valid.append((row, item_values))
+        if valid:
+            insert(valid, report)
+
+
+def _insert_patients(valid: List[Tuple[int, tuple]], report: ImportReport) -> None:
+    """Insert validated patient rows, handling duplicates by the duplicate policy."""
+    rows = [row for row, _ in valid]
+    created, errors = create_valid_patients([values for _, values in valid], rows=rows)
+    for row, patient, error in zip(rows, created, errors):
+        if error:
+            report.add_error(row, error)
+        elif patient:
+            report.imported += 1
+        else:
+            report.merged += 1
+
+
+def _insert_appointments(valid: List[Tuple[int, tuple]], report: ImportReport) -> None:
+    """Insert validated appointment rows whose patient exists."""
+    existing = repositories.patient_repository.find_by_ids(values[0] for _, values in valid)
+    insertable = []
+    for row, values in valid:
+        if values[0] in existing:
+            insertable.append(values)
+        else:
+            report.add_error(row, "Patient not found")
+    created = repositories.appointment_repository.create_many(insertable)
+    report.imported += len(created)
+
+
+def import_patients(stream: TextIO, fmt: str = 'csv',
+                    batch_size: int = IMPORT_BATCH_SIZE) -> ImportReport:
+    """
+    Import patients with name, age, phone and optional notes fields.
+    
+    Valid rows are imported even when others fail. Rows duplicating an
+    existing patient or an earlier row are handled by the duplicate
+    policy: rejected as failed rows, merged, or imported anyway.
+    
+    Args:
+        stream: Text stream of CSV or JSON Lines records
+        fmt: 'csv' or 'jsonl'
+        batch_size: Records validated and inserted per repository call
+        
+    Returns:
+        ImportReport with the numbers imported and merged and the per-row
+        errors
+        
+    Raises:
+        ValueError: If fmt is not a supported format
+    """
+    return _import(read_records(stream, fmt), batch_size, validate_patient_record,
+                   _insert_patients)
+
+
+def import_appointments(stream: TextIO, fmt: str = 'csv',
+                        batch_size: int = IMPORT_BATCH_SIZE) -> ImportReport:
+    """
+    Import appointments with patient_id, date and description fields.
+    
+    Rows referring to a patient that does not exist are rejected.
+    
+    Args:
+        stream: Text stream of CSV or JSON Lines records
+        fmt: 'csv' or 'jsonl'
+        batch_size: Records validated and inserted per repository call
+        
+    Returns:
+        ImportReport with the number imported and the per-row errors
+        
+    Raises:
+        ValueError: If fmt is not a supported format
+    """
+    return _import(read_records(stream, fmt), batch_size, validate_appointment_record,
+                   _insert_appointments)
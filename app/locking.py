@@ -0,0 +1,90 @@
+"""
+Reader-writer locking for repositories shared between threads.
+"""
+
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+class ReadWriteLock:
+    """
+    A lock allowing many concurrent readers or a single writer.
+
+    Writers take priority: once a writer is waiting, new readers wait
+    until it has finished, so a steady stream of reads cannot starve
+    writes. The lock is not reentrant.
+    """
+
+    def __init__(self):
+        """Initialize an unlocked lock."""
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self) -> None:
+        """Block until the lock can be shared with other readers."""
+        with self._condition:
+            while self._writer or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        """Release a shared hold on the lock."""
+        with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self) -> None:
+        """Block until the lock is held exclusively."""
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self) -> None:
+        """Release an exclusive hold on the lock."""
+        with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+    @contextmanager
+    def read_locked(self) -> Iterator[None]:
+        """Hold the lock shared for the duration of a block."""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self) -> Iterator[None]:
+        """Hold the lock exclusively for the duration of a block."""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+def reader(method: Callable) -> Callable:
+    """Decorate a method to run while holding self._lock shared."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.read_locked():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def writer(method: Callable) -> Callable:
+    """Decorate a method to run while holding self._lock exclusively."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.write_locked():
+            return method(self, *args, **kwargs)
+    return wrapper
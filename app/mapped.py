@@ -0,0 +1,504 @@
+"""
+In-memory repositories backed by a memory-mapped snapshot.
+Records stay in the mapped file until read, with writes made since the
+snapshot layered on top, so startup does not depend on the data size.
+Secondary indexes are built on first use.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.changelog import CHANGE_LOG_SIZE
+from app.locking import reader, writer
+from app.models import Appointment, Patient
+from app.patient_index import PatientSearchIndex
+from app.repositories import AppointmentRepository, PatientRepository
+from app.snapshot import MappedTable
+from app.sorted_list import SortedList
+from app.text_index import InvertedIndex
+
+
+class LayeredRecords:
+    """
+    id -> record mapping over snapshot rows plus later changes.
+
+    Supports the mapping operations the repositories perform on their
+    id -> record dicts. Rows still only in the snapshot are decoded on
+    every read, so reads return a new object for them; an updated
+    record must be stored back with self[id] = record.
+    """
+
+    def __init__(self, table: MappedTable, factory: Callable[..., Any]):
+        """
+        Layer changes over a snapshot table.
+
+        Args:
+            table: Snapshot rows
+            factory: Builds a record from a row's fields
+        """
+        self._table = table
+        self._factory = factory
+        # Records created since the snapshot, in ID order
+        self._created: Dict[int, Any] = {}
+        # Snapshot rows replaced by an update
+        self._replaced: Dict[int, Any] = {}
+        # Sorted IDs of deleted snapshot rows
+        self._deleted: List[int] = []
+        self._len = len(table)
+
+    def _in_snapshot(self, record_id: int) -> bool:
+        """Check whether an ID is a snapshot row that was not deleted."""
+        if self._table.find(record_id) < 0:
+            return False
+        position = bisect_left(self._deleted, record_id)
+        return position == len(self._deleted) or self._deleted[position] != record_id
+
+    def __len__(self) -> int:
+        """Get the number of records."""
+        return self._len
+
+    def __contains__(self, record_id: int) -> bool:
+        """Check whether a record exists."""
+        return record_id in self._created or self._in_snapshot(record_id)
+
+    def __getitem__(self, record_id: int) -> Any:
+        """Get a record by ID, raising KeyError if missing."""
+        record = self.get(record_id)
+        if record is None:
+            raise KeyError(record_id)
+        return record
+
+    def get(self, record_id: int, default: Any = None) -> Any:
+        """Get a record by ID, or default if missing."""
+        record = self._created.get(record_id)
+        if record is None:
+            record = self._replaced.get(record_id)
+        if record is not None:
+            return record
+        if not self._in_snapshot(record_id):
+            return default
+        return self._factory(*self._table.row(self._table.find(record_id)))
+
+    def __setitem__(self, record_id: int, record: Any) -> None:
+        """Store a new record, or the updated version of an existing one."""
+        if record_id in self._created:
+            self._created[record_id] = record
+        elif self._in_snapshot(record_id):
+            self._replaced[record_id] = record
+        else:
+            self._created[record_id] = record
+            self._len += 1
+
+    def pop(self, record_id: int, default: Any = None) -> Any:
+        """Remove a record and return it, or default if missing."""
+        record = self._created.pop(record_id, None)
+        if record is None:
+            record = self.get(record_id)
+            if record is None:
+                return default
+            self._replaced.pop(record_id, None)
+            insort(self._deleted, record_id)
+        self._len -= 1
+        return record
+
+    @property
+    def table(self) -> MappedTable:
+        """The snapshot rows the changes are layered over."""
+        return self._table
+
+    def changed_rows(self) -> Iterator[tuple]:
+        """Fields of the snapshot rows deleted or replaced since the snapshot."""
+        table = self._table
+        for record_id in chain(self._deleted, self._replaced):
+            yield table.row(table.find(record_id))
+
+    def changed_records(self) -> Iterator[Any]:
+        """Records replacing snapshot rows or created since the snapshot."""
+        yield from self._replaced.values()
+        yield from self._created.values()
+
+    def values(self) -> Iterator[Any]:
+        """Iterate over records in ID order."""
+        replaced, deleted, factory = self._replaced, set(self._deleted), self._factory
+        for index, record_id in enumerate(self._table.ids):
+            if record_id in replaced:
+                yield replaced[record_id]
+            elif record_id not in deleted:
+                yield factory(*self._table.row(index))
+        yield from self._created.values()
+
+    def clear(self) -> None:
+        """Remove every record, including the snapshot rows."""
+        self._table = _EMPTY_TABLE
+        self._created.clear()
+        self._replaced.clear()
+        self._deleted.clear()
+        self._len = 0
+
+
+class _EmptyTable:
+    """Stands in for a snapshot table after clear()."""
+
+    ids: List[int] = []
+
+    def __len__(self) -> int:
+        """Get the number of rows."""
+        return 0
+
+    def find(self, record_id: int) -> int:
+        """Locate a row by ID; there are none."""
+        return -1
+
+
+_EMPTY_TABLE = _EmptyTable()
+
+
+class LayeredIds:
+    """
+    Sorted IDs of snapshot rows plus records created since.
+
+    Supports the SortedList operations the repositories perform on
+    their ID index. Relies on IDs only ever growing: every ID added is
+    larger than any snapshot row's.
+    """
+
+    def __init__(self, ids: Any):
+        """
+        Layer changes over a snapshot's ID column.
+
+        Args:
+            ids: Sorted snapshot IDs (a mapped column)
+        """
+        self._base = ids
+        # Sorted IDs of deleted snapshot rows
+        self._deleted: List[int] = []
+        # IDs added since the snapshot
+        self._added = SortedList()
+
+    def __len__(self) -> int:
+        """Get the number of IDs."""
+        return len(self._base) - len(self._deleted) + len(self._added)
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over IDs in ascending order."""
+        deleted = set(self._deleted)
+        for record_id in self._base:
+            if record_id not in deleted:
+                yield record_id
+        yield from self._added
+
+    def __reversed__(self) -> Iterator[int]:
+        """Iterate over IDs in descending order."""
+        yield from reversed(self._added)
+        deleted = set(self._deleted)
+        for index in range(len(self._base) - 1, -1, -1):
+            record_id = self._base[index]
+            if record_id not in deleted:
+                yield record_id
+
+    def add(self, record_id: int) -> None:
+        """Add a new ID."""
+        self._added.add(record_id)
+
+    def discard(self, record_id: int) -> bool:
+        """Remove an ID if present; return True if it was."""
+        if self._added.discard(record_id):
+            return True
+        index = bisect_left(self._base, record_id)
+        if index == len(self._base) or self._base[index] != record_id:
+            return False
+        position = bisect_left(self._deleted, record_id)
+        if position < len(self._deleted) and self._deleted[position] == record_id:
+            return False
+        self._deleted.insert(position, record_id)
+        return True
+
+    def clear(self) -> None:
+        """Remove every ID, including the snapshot's."""
+        self._base = []
+        self._deleted.clear()
+        self._added.clear()
+
+    def _deleted_between(self, low: int, high: int) -> int:
+        """Count deleted snapshot IDs in [low, high]."""
+        return bisect_right(self._deleted, high) - bisect_left(self._deleted, low)
+
+    def islice_after(self, minimum: Optional[int], offset: int, limit: int) -> List[int]:
+        """
+        Get a window of IDs, as SortedList.islice_after.
+
+        Args:
+            minimum: Only consider IDs greater than this, or None for all
+            offset: Number of qualifying IDs to skip
+            limit: Maximum number of IDs to return
+
+        Returns:
+            List of at most limit IDs in ascending order
+        """
+        base = self._base
+        position = 0 if minimum is None else bisect_right(base, minimum)
+        # Skip offset live IDs, jumping over runs of snapshot rows
+        while offset > 0 and position < len(base):
+            end = min(len(base), position + offset)
+            offset -= end - position - self._deleted_between(base[position], base[end - 1])
+            position = end
+        result: List[int] = []
+        deleted = self._deleted
+        while position < len(base) and len(result) < limit:
+            record_id = base[position]
+            index = bisect_left(deleted, record_id)
+            if index == len(deleted) or deleted[index] != record_id:
+                result.append(record_id)
+            position += 1
+        if len(result) < limit:
+            result.extend(self._added.islice_after(minimum, offset, limit - len(result)))
+        return result
+
+
+class MappedPatientRepository(PatientRepository):
+    """
+    PatientRepository that can start from a memory-mapped snapshot.
+
+    load_snapshot() takes constant time: patients are decoded from the
+    mapped file when read, and the search index is built the first time
+    search() or find_duplicates() needs it. Like the columnar engine,
+    reads of patients not changed since the snapshot return new objects.
+    """
+
+    def __init__(self, change_log_size: int = CHANGE_LOG_SIZE):
+        """
+        Initialize the repository with empty storage.
+
+        Args:
+            change_log_size: Number of recent changes kept for changes_since()
+        """
+        super().__init__(change_log_size)
+        # Set while the search index does not cover the snapshot rows
+        self._index_pending = False
+        self._index_lock = threading.Lock()
+
+    @writer
+    def load_snapshot(self, table: MappedTable) -> None:
+        """
+        Replace the stored patients with a snapshot table's, without decoding them.
+
+        Args:
+            table: Mapped table of (id, name, age, phone, notes) rows
+        """
+        self._patients = LayeredRecords(table, Patient)
+        self._ids = LayeredIds(table.ids)
+        self._search_index = PatientSearchIndex()
+        self._index_pending = len(table) > 0
+        self._sequence.advance_to(table.high_water_mark)
+
+    def _ensure_indexed(self) -> None:
+        """
+        Build the search index over every patient if it is still pending.
+
+        The snapshot rows never change, so they are indexed without the
+        repository lock and writes carry on meanwhile. Only folding in the
+        changes made since the snapshot and swapping the index in take the
+        write lock.
+        """
+        if not self._index_pending:
+            return
+        with self._index_lock:
+            while self._index_pending:
+                records = self._patients
+                table = records.table
+                index = PatientSearchIndex()
+                for patient_id, name, _, phone, _ in table.rows():
+                    index.add(patient_id, name, phone)
+                with self._lock.write_locked():
+                    # Retry if another snapshot was loaded meanwhile
+                    if not self._index_pending or self._patients is not records \
+                            or records.table is not table:
+                        continue
+                    for patient_id, name, _, phone, _ in records.changed_rows():
+                        index.remove(patient_id, name, phone)
+                    for patient in records.changed_records():
+                        index.add(patient.id, patient.name, patient.phone)
+                    self._search_index = index
+                    self._index_pending = False
+
+    def _insert(self, patient: Patient) -> None:
+        """Store a new patient, leaving a pending index to be built later."""
+        if self._index_pending:
+            self._patients[patient.id] = patient
+            self._ids.add(patient.id)
+        else:
+            super()._insert(patient)
+
+    def _update(self, patient: Patient, name: Optional[str], age: Optional[str],
+                phone: Optional[str], notes: Optional[str]) -> None:
+        """Apply an update and store the patient back over its snapshot row."""
+        super()._update(patient, name, age, phone, notes)
+        self._patients[patient.id] = patient
+
+    def _clear(self) -> None:
+        """Drop every patient, snapshot rows included."""
+        super()._clear()
+        self._index_pending = False
+
+    @reader
+    def find_by_id(self, patient_id: int) -> Optional[Patient]:
+        """
+        Find a patient by ID.
+
+        Args:
+            patient_id: Patient ID to search for
+
+        Returns:
+            Patient object if found, None otherwise
+        """
+        return self._patients.get(patient_id)
+
+    def search(self, query: str, limit: int = 10) -> List[Patient]:
+        """Find patients by partial name or phone number, as PatientRepository.search."""
+        self._ensure_indexed()
+        return super().search(query, limit)
+
+    def find_duplicates(self, name: str, phone: str) -> List[Patient]:
+        """Find probable duplicates, as PatientRepository.find_duplicates."""
+        self._ensure_indexed()
+        return super().find_duplicates(name, phone)
+
+
+class MappedAppointmentRepository(AppointmentRepository):
+    """
+    AppointmentRepository that can start from a memory-mapped snapshot.
+
+    load_snapshot() takes constant time: appointments are decoded from
+    the mapped file when read, and the patient, date and description
+    indexes are built the first time a method needs them.
+    """
+
+    def __init__(self, change_log_size: int = CHANGE_LOG_SIZE):
+        """
+        Initialize the repository with empty storage.
+
+        Args:
+            change_log_size: Number of recent changes kept for changes_since()
+        """
+        super().__init__(change_log_size)
+        # Set while the secondary indexes do not cover the snapshot rows
+        self._index_pending = False
+        self._index_lock = threading.Lock()
+
+    @writer
+    def load_snapshot(self, table: MappedTable) -> None:
+        """
+        Replace the stored appointments with a snapshot table's, without decoding them.
+
+        Args:
+            table: Mapped table of (id, patient_id, date, description) rows
+        """
+        self._appointments = LayeredRecords(table, Appointment)
+        self._ids = LayeredIds(table.ids)
+        self._by_patient = {}
+        self._by_date = SortedList()
+        self._text_index = InvertedIndex()
+        self._index_pending = len(table) > 0
+        self._sequence.advance_to(table.high_water_mark)
+
+    def _ensure_indexed(self) -> None:
+        """
+        Build the secondary indexes over every appointment if still pending.
+
+        As for patients, the snapshot rows are indexed without the
+        repository lock, which is only taken to fold in later changes and
+        swap the indexes in.
+        """
+        if not self._index_pending:
+            return
+        with self._index_lock:
+            while self._index_pending:
+                records = self._appointments
+                table = records.table
+                by_patient: Dict[int, List[int]] = {}
+                dates = []
+                text_index = InvertedIndex()
+                for appointment_id, patient_id, date, description in table.rows():
+                    by_patient.setdefault(patient_id, []).append(appointment_id)
+                    dates.append((date, appointment_id))
+                    text_index.add(appointment_id, description)
+                dates.sort()
+                by_date = SortedList()
+                for key in dates:
+                    by_date.add(key)
+                with self._lock.write_locked():
+                    # Retry if another snapshot was loaded meanwhile
+                    if not self._index_pending or self._appointments is not records \
+                            or records.table is not table:
+                        continue
+                    for appointment_id, patient_id, date, description in records.changed_rows():
+                        by_patient[patient_id].remove(appointment_id)
+                        by_date.discard((date, appointment_id))
+                        text_index.remove(appointment_id, description)
+                    for appointment in records.changed_records():
+                        by_patient.setdefault(appointment.patient_id, []).append(appointment.id)
+                        by_date.add((appointment.date, appointment.id))
+                        text_index.add(appointment.id, appointment.description)
+                    self._by_patient, self._by_date = by_patient, by_date
+                    self._text_index = text_index
+                    self._index_pending = False
+
+    def _insert(self, appointment: Appointment) -> None:
+        """Store a new appointment, leaving pending indexes to be built later."""
+        if self._index_pending:
+            self._appointments[appointment.id] = appointment
+            self._ids.add(appointment.id)
+        else:
+            super()._insert(appointment)
+
+    def _clear(self) -> None:
+        """Drop every appointment, snapshot rows included."""
+        super()._clear()
+        self._index_pending = False
+
+    @reader
+    def find_by_id(self, appointment_id: int) -> Optional[Appointment]:
+        """
+        Find an appointment by ID.
+
+        Args:
+            appointment_id: Appointment ID to search for
+
+        Returns:
+            Appointment object if found, None otherwise
+        """
+        return self._appointments.get(appointment_id)
+
+    def find_by_patient_id(self, patient_id: int) -> List[Appointment]:
+        """Find a patient's appointments, as AppointmentRepository.find_by_patient_id."""
+        self._ensure_indexed()
+        return super().find_by_patient_id(patient_id)
+
+    def delete_by_patient_id(self, patient_id: int) -> int:
+        """Delete a patient's appointments, as AppointmentRepository.delete_by_patient_id."""
+        self._ensure_indexed()
+        return super().delete_by_patient_id(patient_id)
+
+    def find_by_date_range(self, date_from: Optional[str] = None,
+                           date_to: Optional[str] = None) -> List[Appointment]:
+        """Find appointments in a date range, as AppointmentRepository.find_by_date_range."""
+        self._ensure_indexed()
+        return super().find_by_date_range(date_from, date_to)
+
+    def search(self, query: Optional[str] = None,
+               patient_id: Optional[int] = None,
+               date: Optional[str] = None,
+               date_from: Optional[str] = None,
+               date_to: Optional[str] = None,
+               match: str = 'prefix') -> List[Appointment]:
+        """Search appointments, as AppointmentRepository.search."""
+        self._ensure_indexed()
+        return super().search(query, patient_id, date, date_from, date_to, match)
+
+    def replay(self, op: str, rows: List[tuple]) -> None:
+        """Re-apply a logged write, as AppointmentRepository.replay."""
+        if op == 'delete_by_patient':
+            self._ensure_indexed()
+        super().replay(op, rows)
@@ -8,6 +8,9 @@ from typing import Optional, Dict, Any
 class Patient:
     """Represents a patient in the clinic system."""
     
+    # No per-instance __dict__: saves roughly 100 bytes per record
+    __slots__ = ('id', 'name', 'age', 'phone', 'notes')
+    
     def __init__(self, patient_id: int, name: str, age: str, phone: str, notes: str = ''):
         """
         Initialize a Patient object.
@@ -50,6 +53,8 @@ class Patient:
 class Appointment:
     """Represents an appointment in the clinic system."""
     
+    __slots__ = ('id', 'patient_id', 'date', 'description')
+    
     def __init__(self, appointment_id: int, patient_id: int, date: str, description: str):
         """
         Initialize an Appointment object.
@@ -0,0 +1,418 @@
+"""
+Search indexes for looking patients up by partial name or phone number.
+Name words are indexed for prefix matching, with a trigram index over
+the distinct words for typo-tolerant (fuzzy) matching; phone numbers are
+indexed by their digits. A patient's normalized name and phone also form
+an identity key, indexed to find duplicate records.
+"""
+
+import re
+from bisect import bisect_left, insort
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Set, Tuple
+
+from app.sorted_list import SortedList
+from app.text_index import tokenize
+
+# Minimum trigram similarity for a fuzzy word match (pg_trgm's default)
+FUZZY_THRESHOLD = 0.3
+
+# Query words shorter than this are only prefix-matched
+FUZZY_MIN_LENGTH = 3
+
+# A query of digits (and phone separators) at least this long searches phones
+PHONE_MIN_DIGITS = 4
+
+# Phone numbers are also indexed by this many trailing digits
+PHONE_SUFFIX_LENGTH = 4
+
+# Upper bound on candidates checked for a multi-word query
+MAX_CANDIDATES = 10_000
+
+_NON_DIGITS = re.compile(r'\D')
+_PHONE_QUERY = re.compile(r'[\d\s\-\(\)\+\.]+')
+
+
+def normalize_phone(phone: str) -> str:
+    """
+    Reduce a phone number to its digits, so '091-111 222' matches '091111222'.
+
+    Args:
+        phone: Phone number as entered
+
+    Returns:
+        String of the digits in phone
+    """
+    return _NON_DIGITS.sub('', phone)
+
+
+def phone_query(query: str) -> str:
+    """
+    Get the digits of a query that should search phone numbers.
+
+    Args:
+        query: Search text
+
+    Returns:
+        The query's digits, or '' if the query is a name search
+    """
+    if not _PHONE_QUERY.fullmatch(query):
+        return ''
+    digits = normalize_phone(query)
+    return digits if len(digits) >= PHONE_MIN_DIGITS else ''
+
+
+def normalize_name(name: str) -> str:
+    """
+    Reduce a name to its lowercase words in sorted order, so 'Smith, Anna'
+    and 'anna  smith' normalize alike.
+
+    Args:
+        name: Name as entered
+
+    Returns:
+        Space-separated words
+    """
+    return ' '.join(sorted(tokenize(name)))
+
+
+def identity_key(name: str, phone: str) -> Tuple[str, str]:
+    """
+    Key shared by patients that are probably the same person.
+
+    Args:
+        name: Patient's name
+        phone: Patient's phone number
+
+    Returns:
+        Tuple of (phone digits, normalized name)
+    """
+    return normalize_phone(phone), normalize_name(name)
+
+
+def trigrams(word: str) -> Set[str]:
+    """
+    Get the trigrams of a word, padded like pg_trgm so word starts weigh more.
+
+    Args:
+        word: Lowercase word
+
+    Returns:
+        Set of three-character strings
+    """
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(first: Set[str], second: Set[str]) -> float:
+    """
+    Trigram similarity of two words: shared trigrams over all trigrams.
+
+    Args:
+        first: Trigrams of one word
+        second: Trigrams of the other word
+
+    Returns:
+        Value between 0 (nothing shared) and 1 (same trigrams)
+    """
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared) if shared else 0.0
+
+
+def trigram_index(words: Iterable[str]) -> Dict[str, Set[str]]:
+    """
+    Index words by their trigrams, for similar_words().
+
+    Args:
+        words: Distinct lowercase words
+
+    Returns:
+        Dict of trigram -> words containing it
+    """
+    by_trigram: Dict[str, Set[str]] = {}
+    for word in words:
+        for trigram in trigrams(word):
+            by_trigram.setdefault(trigram, set()).add(word)
+    return by_trigram
+
+
+def similar_words(word: str, by_trigram: Dict[str, Set[str]]) -> Dict[str, float]:
+    """
+    Find indexed words similar to a query word.
+
+    Only words sharing enough trigrams with the query are compared, so the
+    cost depends on the matching words rather than the whole vocabulary.
+
+    Args:
+        word: Lowercase query word
+        by_trigram: Trigram index, as built by trigram_index()
+
+    Returns:
+        Dict of similar word -> similarity of at least FUZZY_THRESHOLD
+    """
+    query_trigrams = trigrams(word)
+    shared: Dict[str, int] = {}
+    for trigram in query_trigrams:
+        for candidate in by_trigram.get(trigram, ()):
+            shared[candidate] = shared.get(candidate, 0) + 1
+    similar = {}
+    for candidate, count in shared.items():
+        # Similarity can be at most count / len(query_trigrams)
+        if count < FUZZY_THRESHOLD * len(query_trigrams):
+            continue
+        score = similarity(query_trigrams, trigrams(candidate))
+        if score >= FUZZY_THRESHOLD:
+            similar[candidate] = score
+    return similar
+
+
+def _add_posting(index: Dict[Any, List[int]], key: Any, record_id: int) -> bool:
+    """Add an ID to a key's sorted postings; return True if the key is new."""
+    postings = index.get(key)
+    if postings is None:
+        index[key] = [record_id]
+        return True
+    insort(postings, record_id)
+    return False
+
+
+def _remove_posting(index: Dict[Any, List[int]], key: Any, record_id: int) -> bool:
+    """Remove an ID from a key's postings; return True if the key is now gone."""
+    postings = index.get(key)
+    if postings is None:
+        return False
+    position = bisect_left(postings, record_id)
+    if position < len(postings) and postings[position] == record_id:
+        del postings[position]
+    if postings:
+        return False
+    del index[key]
+    return True
+
+
+class PatientSearchIndex:
+    """
+    Name and phone indexes over patients.
+
+    Not thread-safe on its own: the repository updates it while holding
+    its write lock and searches it while holding the read lock.
+    """
+
+    def __init__(self):
+        """Initialize empty indexes."""
+        # name word -> sorted patient ids
+        self._by_word: Dict[str, List[int]] = {}
+        # Sorted distinct name words, for prefix expansion
+        self._words = SortedList()
+        # trigram -> distinct name words containing it, for fuzzy matching
+        self._by_trigram: Dict[str, Set[str]] = {}
+        # phone digits -> sorted patient ids
+        self._by_phone: Dict[str, List[int]] = {}
+        # last PHONE_SUFFIX_LENGTH phone digits -> sorted patient ids
+        self._by_phone_suffix: Dict[str, List[int]] = {}
+        # identity_key -> sorted patient ids, for duplicate checks
+        self._by_identity: Dict[Tuple[str, str], List[int]] = {}
+
+    def add(self, patient_id: int, name: str, phone: str) -> None:
+        """
+        Index a patient.
+
+        Args:
+            patient_id: Patient ID
+            name: Patient's name
+            phone: Patient's phone number
+        """
+        for word in set(tokenize(name)):
+            if _add_posting(self._by_word, word, patient_id):
+                self._words.add(word)
+                if not word.isdigit():
+                    for trigram in trigrams(word):
+                        self._by_trigram.setdefault(trigram, set()).add(word)
+        digits = normalize_phone(phone)
+        if digits:
+            _add_posting(self._by_phone, digits, patient_id)
+            _add_posting(self._by_phone_suffix, digits[-PHONE_SUFFIX_LENGTH:], patient_id)
+        _add_posting(self._by_identity, identity_key(name, phone), patient_id)
+
+    def remove(self, patient_id: int, name: str, phone: str) -> None:
+        """
+        Remove a patient from the indexes.
+
+        Args:
+            patient_id: Patient ID
+            name: Name the patient was indexed with
+            phone: Phone number the patient was indexed with
+        """
+        for word in set(tokenize(name)):
+            if _remove_posting(self._by_word, word, patient_id):
+                self._words.discard(word)
+                if not word.isdigit():
+                    for trigram in trigrams(word):
+                        words = self._by_trigram[trigram]
+                        words.discard(word)
+                        if not words:
+                            del self._by_trigram[trigram]
+        digits = normalize_phone(phone)
+        if digits:
+            _remove_posting(self._by_phone, digits, patient_id)
+            _remove_posting(self._by_phone_suffix, digits[-PHONE_SUFFIX_LENGTH:], patient_id)
+        _remove_posting(self._by_identity, identity_key(name, phone), patient_id)
+
+    def clear(self) -> None:
+        """Remove every patient."""
+        self._by_word.clear()
+        self._words.clear()
+        self._by_trigram.clear()
+        self._by_phone.clear()
+        self._by_phone_suffix.clear()
+        self._by_identity.clear()
+
+    def find_duplicates(self, name: str, phone: str) -> List[int]:
+        """
+        Find patients with the same identity key as a name and phone.
+
+        Args:
+            name: Name to check
+            phone: Phone number to check
+
+        Returns:
+            Sorted IDs of the matching patients
+        """
+        return list(self._by_identity.get(identity_key(name, phone), ()))
+
+    def search(self, query: str, limit: int, name_of: Callable[[int], str],
+               phone_of: Callable[[int], str]) -> List[int]:
+        """
+        Find the best matching patients.
+
+        A query of at least PHONE_MIN_DIGITS digits searches phone numbers:
+        exact matches first, then numbers ending with the digits. Any
+        other query searches names: patients with a name word starting
+        with every query word come first, then fuzzy matches, where each
+        query word may instead be a near miss of a name word, ranked by
+        similarity.
+
+        Args:
+            query: Search text
+            limit: Maximum number of results
+            name_of: Returns an indexed patient's name
+            phone_of: Returns an indexed patient's phone number
+
+        Returns:
+            Matching patient IDs, best first
+        """
+        if limit <= 0:
+            return []
+        digits = phone_query(query)
+        if digits:
+            return self._search_phone(digits, limit, phone_of)
+        words = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not words:
+            return []
+        found = self._search_prefix(words, limit, name_of)
+        if len(found) < limit and any(len(word) >= FUZZY_MIN_LENGTH for word in words):
+            seen = set(found)
+            found.extend(patient_id for patient_id in self._search_fuzzy(words, limit, name_of)
+                         if patient_id not in seen)
+        return found[:limit]
+
+    def _search_phone(self, digits: str, limit: int, phone_of: Callable[[int], str]) -> List[int]:
+        """Exact phone matches, then phones ending with the digits."""
+        found = list(self._by_phone.get(digits, ()))[:limit]
+        if len(found) < limit:
+            seen = set(found)
+            for patient_id in self._by_phone_suffix.get(digits[-PHONE_SUFFIX_LENGTH:], ()):
+                if patient_id not in seen and normalize_phone(phone_of(patient_id)).endswith(digits):
+                    found.append(patient_id)
+                    if len(found) == limit:
+                        break
+        return found
+
+    def _expand(self, prefix: str) -> Iterator[str]:
+        """Indexed words starting with prefix, in sorted order."""
+        for word in self._words.irange(prefix):
+            if not word.startswith(prefix):
+                return
+            yield word
+
+    def _search_prefix(self, words: List[str], limit: int,
+                       name_of: Callable[[int], str]) -> List[int]:
+        """Patients with a name word starting with every query word."""
+        # The longest word drives the scan; it is usually the most selective
+        driver, others = words[0], words[1:]
+        found: List[int] = []
+        checked = 0
+        for word in self._expand(driver):
+            for patient_id in self._by_word[word]:
+                if others:
+                    checked += 1
+                    if checked > MAX_CANDIDATES:
+                        return found
+                    name_words = tokenize(name_of(patient_id))
+                    if not all(any(name_word.startswith(other) for name_word in name_words)
+                               for other in others):
+                        continue
+                if patient_id not in found:
+                    found.append(patient_id)
+                    if len(found) == limit:
+                        return found
+        return found
+
+    def _similar_words(self, word: str) -> Dict[str, float]:
+        """Indexed words similar to a query word, with their similarity."""
+        return similar_words(word, self._by_trigram)
+
+    def _search_fuzzy(self, words: List[str], limit: int,
+                      name_of: Callable[[int], str]) -> List[int]:
+        """Patients whose name words match every query word by prefix or similarity."""
+        matches: List[Dict[str, float]] = []
+        for word in words:
+            scores = self._similar_words(word) if len(word) >= FUZZY_MIN_LENGTH else {}
+            for name_word in self._expand(word):
+                scores[name_word] = 1.0
+            if not scores:
+                return []
+            matches.append(scores)
+        # Candidates come from the query word with the fewest matching
+        # patients, best scoring name words first. With a single query word
+        # the patient's score is its word's, so the first few words suffice;
+        # twice the limit leaves room for patients already found by prefix.
+        fewest = min(matches, key=lambda scores: sum(len(self._by_word[w]) for w in scores))
+        wanted = 2 * limit if len(matches) == 1 else MAX_CANDIDATES
+        candidates: Set[int] = set()
+        for name_word in sorted(fewest, key=fewest.get, reverse=True):
+            candidates.update(self._by_word[name_word])
+            if len(candidates) >= wanted:
+                break
+        return rank_matches(((patient_id, name_of(patient_id)) for patient_id in candidates),
+                            matches)
+
+
+def rank_matches(candidates: Iterable[Tuple[int, str]],
+                 matches: List[Dict[str, float]]) -> List[int]:
+    """
+    Rank candidate patients for a fuzzy name search.
+
+    Each query word scores the best score of any of the patient's name
+    words for it; a patient missing a match for any query word is dropped.
+
+    Args:
+        candidates: (patient ID, name) pairs
+        matches: For each query word, the name words that match it and
+                 their scores (1 for a prefix match, else the similarity)
+
+    Returns:
+        Matching patient IDs, highest total score first, then by ID
+    """
+    ranked = []
+    for patient_id, name in candidates:
+        name_words = tokenize(name)
+        total = 0.0
+        for scores in matches:
+            best = max((scores.get(name_word, 0.0) for name_word in name_words), default=0.0)
+            if not best:
+                break
+            total += best
+        else:
+            ranked.append((-total, patient_id))
+    ranked.sort()
+    return [patient_id for _, patient_id in ranked]
@@ -3,18 +3,140 @@ Repository pattern implementation for data access.
 Encapsulates all data storage and retrieval logic.
 """
 
-from typing import List, Optional, Dict, Any
+import sys
+from contextlib import contextmanager
+from itertools import islice
+from typing import (
+    List, Optional, Dict, Any, Iterable, Iterator, Tuple, Callable, Mapping, Protocol,
+    runtime_checkable
+)
+from app.changelog import CHANGE_LOG_SIZE, Change, ChangeLog
+from app.locking import ReadWriteLock, reader, writer
 from app.models import Patient, Appointment
+from app.patient_index import PatientSearchIndex
+from app.sequence import IdSequence
+from app.snapshot import MappedTable
+from app.sorted_list import SortedList
+from app.text_index import InvertedIndex, tokenize
+from app.wal import (
+    DEFAULT_FSYNC_POLICY, SNAPSHOT_EVERY, WAL_FSYNC_INTERVAL, DurableStore, WriteAheadLog, durable
+)
+
+# Description matching modes accepted by AppointmentRepository.search
+SEARCH_MODES = ('term', 'prefix', 'substring')
+
+
+@runtime_checkable
+class PatientRepositoryProtocol(Protocol):
+    """Interface every patient storage engine implements."""
+    
+    def create(self, name: str, age: str, phone: str, notes: str = '') -> Patient: ...
+    
+    def create_many(self, records: Iterable[Tuple[str, str, str, str]]) -> List[Patient]: ...
+    
+    def find_by_id(self, patient_id: int) -> Optional[Patient]: ...
+    
+    def find_by_ids(self, patient_ids: Iterable[int]) -> Dict[int, Patient]: ...
+    
+    def get_all(self) -> List[Patient]: ...
+    
+    def get_page(self, limit: int, offset: int = 0,
+                 after_id: Optional[int] = None) -> List[Patient]: ...
+    
+    def get_recent(self, limit: int) -> List[Patient]: ...
+    
+    def update(self, patient_id: int, name: Optional[str] = None,
+               age: Optional[str] = None, phone: Optional[str] = None,
+               notes: Optional[str] = None) -> Optional[Patient]: ...
+    
+    def delete(self, patient_id: int) -> bool: ...
+    
+    def search(self, query: str, limit: int = 10) -> List[Patient]: ...
+    
+    def find_duplicates(self, name: str, phone: str) -> List[Patient]: ...
+    
+    def allocate_ids(self, count: int) -> range: ...
+    
+    def count(self) -> int: ...
+    
+    @property
+    def version(self) -> int: ...
+    
+    def changes_since(self, version: int) -> Optional[List[Change]]: ...
+    
+    def clear(self) -> None: ...
+
+
+@runtime_checkable
+class AppointmentRepositoryProtocol(Protocol):
+    """Interface every appointment storage engine implements."""
+    
+    def create(self, patient_id: int, date: str, description: str) -> Appointment: ...
+    
+    def create_many(self, records: Iterable[Tuple[int, str, str]]) -> List[Appointment]: ...
+    
+    def find_by_id(self, appointment_id: int) -> Optional[Appointment]: ...
+    
+    def get_all(self) -> List[Appointment]: ...
+    
+    def get_page(self, limit: int, offset: int = 0,
+                 after_id: Optional[int] = None) -> List[Appointment]: ...
+    
+    def get_recent(self, limit: int) -> List[Appointment]: ...
+    
+    def find_by_patient_id(self, patient_id: int) -> List[Appointment]: ...
+    
+    def delete_by_patient_id(self, patient_id: int) -> int: ...
+    
+    def find_by_date_range(self, date_from: Optional[str] = None,
+                           date_to: Optional[str] = None) -> List[Appointment]: ...
+    
+    def search(self, query: Optional[str] = None,
+               patient_id: Optional[int] = None,
+               date: Optional[str] = None,
+               date_from: Optional[str] = None,
+               date_to: Optional[str] = None,
+               match: str = 'prefix') -> List[Appointment]: ...
+    
+    def allocate_ids(self, count: int) -> range: ...
+    
+    def count(self) -> int: ...
+    
+    @property
+    def version(self) -> int: ...
+    
+    def changes_since(self, version: int) -> Optional[List[Change]]: ...
+    
+    def clear(self) -> None: ...
 
 
 class PatientRepository:
     """Repository for patient data operations."""
     
-    def __init__(self):
-        """Initialize the repository with empty storage."""
-        self._patients: List[Patient] = []
-        self._next_id: int = 1
+    def __init__(self, change_log_size: int = CHANGE_LOG_SIZE):
+        """
+        Initialize the repository with empty storage.
+        
+        Args:
+            change_log_size: Number of recent changes kept for changes_since()
+        """
+        # Writers hold the lock exclusively; multi-structure reads hold it
+        # shared. Single dict lookups (find_by_id, count) are atomic and skip it.
+        self._lock = ReadWriteLock()
+        # Keyed by id for O(1) lookups; dicts preserve insertion order for get_all()
+        self._patients: Dict[int, Patient] = {}
+        # Sorted ids for offset and keyset pagination
+        self._ids = SortedList()
+        # Name and phone indexes for search()
+        self._search_index = PatientSearchIndex()
+        # Never reset, so a deleted patient's ID is never handed out again
+        self._sequence = IdSequence()
+        self._changes = ChangeLog(change_log_size)
+        # Write-ahead log every write is appended to, when durable
+        self._journal: Optional[WriteAheadLog] = None
     
+    @durable
+    @writer
     def create(self, name: str, age: str, phone: str, notes: str = '') -> Patient:
         """
         Create a new patient record.
@@ -29,16 +151,51 @@ class PatientRepository:
             Created Patient object
         """
         patient = Patient(
-            patient_id=self._next_id,
+            patient_id=self._sequence.next(),
             name=name,
             age=age,
             phone=phone,
             notes=notes
         )
-        self._patients.append(patient)
-        self._next_id += 1
+        self._insert(patient)
+        self._changes.record('create', (patient.id,))
+        self._log('create', [_patient_row(patient)])
         return patient
     
+    @durable
+    @writer
+    def create_many(self, records: Iterable[Tuple[str, str, str, str]]) -> List[Patient]:
+        """
+        Create many patients in one step.
+        
+        The IDs are allocated as one block and the lock is taken once,
+        which makes this much cheaper than repeated create() calls.
+        
+        Args:
+            records: (name, age, phone, notes) tuples
+            
+        Returns:
+            Created Patient objects, in input order
+        """
+        records = list(records)
+        if not records:
+            # Nothing changed: keep the version, and so the caches, as they are
+            return []
+        ids = self._sequence.allocate(len(records))
+        patients = [Patient(patient_id, name, age, phone, notes)
+                    for patient_id, (name, age, phone, notes) in zip(ids, records)]
+        for patient in patients:
+            self._insert(patient)
+        self._changes.record('create', ids)
+        self._log('create', [_patient_row(patient) for patient in patients])
+        return patients
+    
+    def _insert(self, patient: Patient) -> None:
+        """Store and index a new patient; the caller holds the write lock."""
+        self._patients[patient.id] = patient
+        self._ids.add(patient.id)
+        self._search_index.add(patient.id, patient.name, patient.phone)
+    
     def find_by_id(self, patient_id: int) -> Optional[Patient]:
         """
         Find a patient by ID.
@@ -49,20 +206,70 @@ class PatientRepository:
         Returns:
             Patient object if found, None otherwise
         """
-        for patient in self._patients:
-            if patient.id == patient_id:
-                return patient
-        return None
+        return self._patients.get(patient_id)
     
+    @reader
+    def find_by_ids(self, patient_ids: Iterable[int]) -> Dict[int, Patient]:
+        """
+        Find many patients in one call.
+        
+        Args:
+            patient_ids: Patient IDs to look up; duplicates are allowed
+            
+        Returns:
+            Dictionary mapping each found ID to its Patient object
+        """
+        patients = self._patients
+        return {patient_id: patients[patient_id]
+                for patient_id in set(patient_ids) if patient_id in patients}
+    
+    @reader
     def get_all(self) -> List[Patient]:
         """
         Get all patients.
         
         Returns:
-            List of all Patient objects
+            List of all Patient objects, in insertion order
+        """
+        return list(self._patients.values())
+    
+    @reader
+    def get_page(self, limit: int, offset: int = 0,
+                 after_id: Optional[int] = None) -> List[Patient]:
+        """
+        Get one page of patients ordered by ID.
+        
+        Only the requested slice is materialized, so the cost is
+        proportional to the page size rather than the table size.
+        
+        Args:
+            limit: Maximum number of patients to return
+            offset: Number of patients to skip
+            after_id: Keyset cursor; start after this ID when given
+            
+        Returns:
+            List of Patient objects
+        """
+        return [self._patients[patient_id]
+                for patient_id in self._ids.islice_after(after_id, offset, limit)]
+    
+    @reader
+    def get_recent(self, limit: int) -> List[Patient]:
+        """
+        Get the most recently created patients.
+        
+        Args:
+            limit: Maximum number of patients to return
+            
+        Returns:
+            List of Patient objects, newest first
         """
-        return self._patients.copy()
+        if limit <= 0:
+            return []
+        return [self._patients[patient_id] for patient_id in islice(reversed(self._ids), limit)]
     
+    @durable
+    @writer
     def update(self, patient_id: int, name: Optional[str] = None, 
                age: Optional[str] = None, phone: Optional[str] = None,
                notes: Optional[str] = None) -> Optional[Patient]:
@@ -79,10 +286,22 @@ class PatientRepository:
         Returns:
             Updated Patient object if found, None otherwise
         """
-        patient = self.find_by_id(patient_id)
+        patient = self._patients.get(patient_id)
         if not patient:
             return None
         
+        self._update(patient, name, age, phone, notes)
+        self._changes.record('update', (patient_id,))
+        self._log('update', [_patient_row(patient)])
+        return patient
+    
+    def _update(self, patient: Patient, name: Optional[str], age: Optional[str],
+                phone: Optional[str], notes: Optional[str]) -> None:
+        """Apply update() to a stored patient; the caller holds the write lock."""
+        reindex = ((name is not None and name != patient.name) or
+                   (phone is not None and phone != patient.phone))
+        if reindex:
+            self._search_index.remove(patient.id, patient.name, patient.phone)
         if name is not None:
             patient.name = name
         if age is not None:
@@ -91,9 +310,11 @@ class PatientRepository:
             patient.phone = phone
         if notes is not None:
             patient.notes = notes
-        
-        return patient
+        if reindex:
+            self._search_index.add(patient.id, patient.name, patient.phone)
     
+    @durable
+    @writer
     def delete(self, patient_id: int) -> bool:
         """
         Delete a patient by ID.
@@ -104,24 +325,217 @@ class PatientRepository:
         Returns:
             True if patient was deleted, False if not found
         """
-        patient = self.find_by_id(patient_id)
-        if patient:
-            self._patients.remove(patient)
-            return True
-        return False
+        if not self._remove(patient_id):
+            return False
+        self._changes.record('delete', (patient_id,))
+        self._log('delete', [(patient_id,)])
+        return True
+    
+    def _remove(self, patient_id: int) -> bool:
+        """Drop a patient and its index entries; the caller holds the write lock."""
+        patient = self._patients.pop(patient_id, None)
+        if patient is None:
+            return False
+        self._ids.discard(patient_id)
+        self._search_index.remove(patient_id, patient.name, patient.phone)
+        return True
+    
+    @reader
+    def search(self, query: str, limit: int = 10) -> List[Patient]:
+        """
+        Find patients by partial name or phone number, for typeahead.
+        
+        A query of four or more digits (phone separators allowed) matches
+        phone numbers, exact numbers first and then numbers ending with
+        the digits. Any other query matches names: patients with a name
+        word starting with every query word come first, then patients
+        whose name words are close misspellings, most similar first.
+        
+        Args:
+            query: Search text
+            limit: Maximum number of patients to return
+            
+        Returns:
+            List of matching Patient objects, best match first
+        """
+        patients = self._patients
+        ids = self._search_index.search(query, limit,
+                                        name_of=lambda patient_id: patients[patient_id].name,
+                                        phone_of=lambda patient_id: patients[patient_id].phone)
+        return [patients[patient_id] for patient_id in ids]
+    
+    @reader
+    def find_duplicates(self, name: str, phone: str) -> List[Patient]:
+        """
+        Find patients that are probably the same person as a name and phone.
+        
+        Names match ignoring case, punctuation and word order; phone
+        numbers match on their digits. This is a hash lookup.
+        
+        Args:
+            name: Name to check
+            phone: Phone number to check
+            
+        Returns:
+            List of matching Patient objects, ordered by ID
+        """
+        return [self._patients[patient_id]
+                for patient_id in self._search_index.find_duplicates(name, phone)]
+    
+    @durable
+    @writer
+    def allocate_ids(self, count: int) -> range:
+        """
+        Reserve a block of patient IDs for a bulk insert.
+        
+        Args:
+            count: Number of IDs to reserve
+            
+        Returns:
+            Range of IDs no other record will be given
+        """
+        ids = self._sequence.allocate(count)
+        if ids:
+            self._log('reserve', [(ids[-1],)])
+        return ids
     
     def count(self) -> int:
         """Get total number of patients."""
         return len(self._patients)
+    
+    @property
+    def version(self) -> int:
+        """Number that changes whenever the stored patients change."""
+        return self._changes.version
+    
+    @reader
+    def changes_since(self, version: int) -> Optional[List[Change]]:
+        """
+        Get the patient changes made after a version.
+        
+        Args:
+            version: Version the caller last synced to
+            
+        Returns:
+            Changes in the order they were made, or None if the change
+            log no longer reaches back to that version
+        """
+        return self._changes.since(version)
+    
+    @durable
+    @writer
+    def clear(self) -> None:
+        """Remove all patients; the ID sequence keeps counting."""
+        self._clear()
+        self._changes.reset()
+        self._log('clear', [])
+    
+    def _clear(self) -> None:
+        """Drop every patient; the caller holds the write lock."""
+        self._patients.clear()
+        self._ids.clear()
+        self._search_index.clear()
+    
+    def attach_journal(self, journal: Optional[WriteAheadLog]) -> None:
+        """
+        Append every later write to a write-ahead log.
+        
+        Args:
+            journal: Log to write to, or None to stop logging
+        """
+        self._journal = journal
+    
+    def _log(self, op: str, rows: List[tuple]) -> None:
+        """Append a write to the journal, if any; called under the write lock."""
+        if self._journal is not None:
+            self._journal.append('patients', op, rows)
+    
+    @writer
+    def replay(self, op: str, rows: List[tuple]) -> None:
+        """
+        Re-apply a logged write while recovering; nothing is logged again.
+        
+        Args:
+            op: Logged operation: create, update, delete, clear or reserve
+            rows: Logged rows; (id, name, age, phone, notes) for create
+                  and update, (id,) for delete, (high-water mark,) for
+                  reserve
+        """
+        if op == 'create':
+            for row in rows:
+                self._insert(Patient(*row))
+            if rows:
+                self._sequence.advance_to(rows[-1][0])
+        elif op == 'update':
+            for patient_id, name, age, phone, notes in rows:
+                self._update(self._patients[patient_id], name, age, phone, notes)
+        elif op == 'delete':
+            for (patient_id,) in rows:
+                self._remove(patient_id)
+        elif op == 'clear':
+            self._clear()
+        elif op == 'reserve':
+            self._sequence.advance_to(rows[0][0])
+        else:
+            raise ValueError(f"Unknown patient journal op: {op}")
+    
+    @writer
+    def load_snapshot(self, table: MappedTable) -> None:
+        """
+        Replace the stored patients with a snapshot table's rows.
+        
+        Args:
+            table: Mapped table of (id, name, age, phone, notes) rows
+        """
+        self._clear()
+        for row in table.rows():
+            self._insert(Patient(*row))
+        self._sequence.advance_to(table.high_water_mark)
+    
+    @contextmanager
+    def snapshot_state(self) -> Iterator[Tuple[int, List[tuple]]]:
+        """
+        Hold off writers while yielding a copy of the stored patients.
+        
+        Returns:
+            Context manager yielding (ID high-water mark, rows), with
+            rows as logged by create
+        """
+        with self._lock.read_locked():
+            yield (self._sequence.high_water_mark,
+                   [_patient_row(patient) for patient in self._patients.values()])
 
 
 class AppointmentRepository:
     """Repository for appointment data operations."""
     
-    def __init__(self):
-        """Initialize the repository with empty storage."""
-        self._appointments: List[Appointment] = []
+    def __init__(self, change_log_size: int = CHANGE_LOG_SIZE):
+        """
+        Initialize the repository with empty storage.
+        
+        Args:
+            change_log_size: Number of recent changes kept for changes_since()
+        """
+        # Same locking scheme as PatientRepository
+        self._lock = ReadWriteLock()
+        # Keyed by id for O(1) lookups; dicts preserve insertion order for get_all()
+        self._appointments: Dict[int, Appointment] = {}
+        # Sorted ids for offset and keyset pagination
+        self._ids = SortedList()
+        # Secondary index: patient_id -> appointment ids, in insertion order
+        self._by_patient: Dict[int, List[int]] = {}
+        # Sorted (date, id) pairs; ISO dates (YYYY-MM-DD) sort chronologically
+        self._by_date = SortedList()
+        # Full-text index over descriptions
+        self._text_index = InvertedIndex()
+        # Never reset, so a deleted appointment's ID is never handed out again
+        self._sequence = IdSequence()
+        self._changes = ChangeLog(change_log_size)
+        # Write-ahead log every write is appended to, when durable
+        self._journal: Optional[WriteAheadLog] = None
     
+    @durable
+    @writer
     def create(self, patient_id: int, date: str, description: str) -> Appointment:
         """
         Create a new appointment.
@@ -134,16 +548,49 @@ class AppointmentRepository:
         Returns:
             Created Appointment object
         """
-        appointment_id = len(self._appointments) + 1
         appointment = Appointment(
-            appointment_id=appointment_id,
+            appointment_id=self._sequence.next(),
             patient_id=patient_id,
             date=date,
             description=description
         )
-        self._appointments.append(appointment)
+        self._insert(appointment)
+        self._changes.record('create', (appointment.id,))
+        self._log('create', [_appointment_row(appointment)])
         return appointment
     
+    @durable
+    @writer
+    def create_many(self, records: Iterable[Tuple[int, str, str]]) -> List[Appointment]:
+        """
+        Create many appointments in one step.
+        
+        Args:
+            records: (patient_id, date, description) tuples
+            
+        Returns:
+            Created Appointment objects, in input order
+        """
+        records = list(records)
+        if not records:
+            return []
+        ids = self._sequence.allocate(len(records))
+        appointments = [Appointment(appointment_id, patient_id, date, description)
+                        for appointment_id, (patient_id, date, description) in zip(ids, records)]
+        for appointment in appointments:
+            self._insert(appointment)
+        self._changes.record('create', ids)
+        self._log('create', [_appointment_row(appointment) for appointment in appointments])
+        return appointments
+    
+    def _insert(self, appointment: Appointment) -> None:
+        """Store and index a new appointment; the caller holds the write lock."""
+        self._appointments[appointment.id] = appointment
+        self._ids.add(appointment.id)
+        self._by_patient.setdefault(appointment.patient_id, []).append(appointment.id)
+        self._by_date.add((appointment.date, appointment.id))
+        self._text_index.add(appointment.id, appointment.description)
+    
     def find_by_id(self, appointment_id: int) -> Optional[Appointment]:
         """
         Find an appointment by ID.
@@ -154,20 +601,55 @@ class AppointmentRepository:
         Returns:
             Appointment object if found, None otherwise
         """
-        for appointment in self._appointments:
-            if appointment.id == appointment_id:
-                return appointment
-        return None
+        return self._appointments.get(appointment_id)
     
+    @reader
     def get_all(self) -> List[Appointment]:
         """
         Get all appointments.
         
         Returns:
-            List of all Appointment objects
+            List of all Appointment objects, in insertion order
         """
-        return self._appointments.copy()
+        return list(self._appointments.values())
     
+    @reader
+    def get_page(self, limit: int, offset: int = 0,
+                 after_id: Optional[int] = None) -> List[Appointment]:
+        """
+        Get one page of appointments ordered by ID.
+        
+        Only the requested slice is materialized, so the cost is
+        proportional to the page size rather than the table size.
+        
+        Args:
+            limit: Maximum number of appointments to return
+            offset: Number of appointments to skip
+            after_id: Keyset cursor; start after this ID when given
+            
+        Returns:
+            List of Appointment objects
+        """
+        return [self._appointments[appointment_id]
+                for appointment_id in self._ids.islice_after(after_id, offset, limit)]
+    
+    @reader
+    def get_recent(self, limit: int) -> List[Appointment]:
+        """
+        Get the most recently created appointments.
+        
+        Args:
+            limit: Maximum number of appointments to return
+            
+        Returns:
+            List of Appointment objects, newest first
+        """
+        if limit <= 0:
+            return []
+        return [self._appointments[appointment_id]
+                for appointment_id in islice(reversed(self._ids), limit)]
+    
+    @reader
     def find_by_patient_id(self, patient_id: int) -> List[Appointment]:
         """
         Find all appointments for a specific patient.
@@ -178,8 +660,15 @@ class AppointmentRepository:
         Returns:
             List of Appointment objects for the patient
         """
-        return [apt for apt in self._appointments if apt.patient_id == patient_id]
+        return self._find_by_patient_id(patient_id)
     
+    def _find_by_patient_id(self, patient_id: int) -> List[Appointment]:
+        """find_by_patient_id without locking, for callers already holding the lock."""
+        ids = self._by_patient.get(patient_id, ())
+        return [self._appointments[appointment_id] for appointment_id in ids]
+    
+    @durable
+    @writer
     def delete_by_patient_id(self, patient_id: int) -> int:
         """
         Delete all appointments for a specific patient.
@@ -190,31 +679,99 @@ class AppointmentRepository:
         Returns:
             Number of appointments deleted
         """
-        initial_count = len(self._appointments)
-        self._appointments = [apt for apt in self._appointments if apt.patient_id != patient_id]
-        return initial_count - len(self._appointments)
+        doomed = self._delete_by_patient_id(patient_id)
+        if doomed:
+            self._changes.record('delete', doomed)
+            self._log('delete_by_patient', [(patient_id,)])
+        return len(doomed)
+    
+    def _delete_by_patient_id(self, patient_id: int) -> List[int]:
+        """Drop a patient's appointments and return their IDs; the caller holds the write lock."""
+        doomed = self._by_patient.pop(patient_id, [])
+        for appointment_id in doomed:
+            appointment = self._appointments.pop(appointment_id)
+            self._ids.discard(appointment_id)
+            self._by_date.discard((appointment.date, appointment_id))
+            self._text_index.remove(appointment_id, appointment.description)
+        return doomed
+    
+    @reader
+    def find_by_date_range(self, date_from: Optional[str] = None,
+                           date_to: Optional[str] = None) -> List[Appointment]:
+        """
+        Find appointments whose date falls within an inclusive range.
+        
+        Args:
+            date_from: Earliest date (YYYY-MM-DD), or None for no lower bound
+            date_to: Latest date (YYYY-MM-DD), or None for no upper bound
+            
+        Returns:
+            List of matching Appointment objects, ordered by date
+        """
+        return self._find_by_date_range(date_from, date_to)
     
+    def _find_by_date_range(self, date_from: Optional[str],
+                            date_to: Optional[str]) -> List[Appointment]:
+        """find_by_date_range without locking, for callers already holding the lock."""
+        minimum = (date_from, 0) if date_from else None
+        maximum = (date_to, sys.maxsize) if date_to else None
+        return [self._appointments[appointment_id]
+                for _, appointment_id in self._by_date.irange(minimum, maximum)]
+    
+    @reader
     def search(self, query: Optional[str] = None, 
                patient_id: Optional[int] = None,
-               date: Optional[str] = None) -> List[Appointment]:
+               date: Optional[str] = None,
+               date_from: Optional[str] = None,
+               date_to: Optional[str] = None,
+               match: str = 'prefix') -> List[Appointment]:
         """
         Search appointments by various criteria.
         
         Args:
             query: Search term for description
             patient_id: Filter by patient ID
-            date: Filter by date
+            date: Filter by exact date
+            date_from: Filter by earliest date (inclusive)
+            date_to: Filter by latest date (inclusive)
+            match: How query matches descriptions: 'term' (whole words),
+                   'prefix' (words starting with each query word) or
+                   'substring' (legacy case-insensitive substring scan)
             
         Returns:
-            List of matching Appointment objects
+            List of matching Appointment objects. Indexed 'term' and
+            'prefix' queries are ordered by relevance.
         """
-        results = self._appointments.copy()
+        if match not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {match}")
+        
+        # An exact date is just a one-day range
+        if date:
+            date_from = max(date, date_from) if date_from else date
+            date_to = min(date, date_to) if date_to else date
         
         if patient_id is not None:
-            results = [apt for apt in results if apt.patient_id == patient_id]
+            results = self._find_by_patient_id(patient_id)
+            if date_from:
+                results = [apt for apt in results if apt.date >= date_from]
+            if date_to:
+                results = [apt for apt in results if apt.date <= date_to]
+        elif date_from or date_to:
+            results = self._find_by_date_range(date_from, date_to)
+        else:
+            results = None
         
-        if date:
-            results = [apt for apt in results if apt.date == date]
+        # Queries without word characters cannot use the index
+        if query and match != 'substring' and tokenize(query):
+            ranked = self._text_index.search(query, prefix=(match == 'prefix'))
+            if results is None:
+                return [self._appointments[appointment_id] for appointment_id in ranked]
+            allowed = {apt.id for apt in results}
+            return [self._appointments[appointment_id]
+                    for appointment_id in ranked if appointment_id in allowed]
+        
+        if results is None:
+            results = list(self._appointments.values())
         
         if query:
             query_lower = query.lower()
@@ -222,12 +779,274 @@ class AppointmentRepository:
         
         return results
     
+    @durable
+    @writer
+    def allocate_ids(self, count: int) -> range:
+        """
+        Reserve a block of appointment IDs for a bulk insert.
+        
+        Args:
+            count: Number of IDs to reserve
+            
+        Returns:
+            Range of IDs no other record will be given
+        """
+        ids = self._sequence.allocate(count)
+        if ids:
+            self._log('reserve', [(ids[-1],)])
+        return ids
+    
     def count(self) -> int:
         """Get total number of appointments."""
         return len(self._appointments)
+    
+    @property
+    def version(self) -> int:
+        """Number that changes whenever the stored appointments change."""
+        return self._changes.version
+    
+    @reader
+    def changes_since(self, version: int) -> Optional[List[Change]]:
+        """
+        Get the appointment changes made after a version.
+        
+        Args:
+            version: Version the caller last synced to
+            
+        Returns:
+            Changes in the order they were made, or None if the change
+            log no longer reaches back to that version
+        """
+        return self._changes.since(version)
+    
+    @durable
+    @writer
+    def clear(self) -> None:
+        """Remove all appointments; the ID sequence keeps counting."""
+        self._clear()
+        self._changes.reset()
+        self._log('clear', [])
+    
+    def _clear(self) -> None:
+        """Drop every appointment; the caller holds the write lock."""
+        self._appointments.clear()
+        self._ids.clear()
+        self._by_patient.clear()
+        self._by_date.clear()
+        self._text_index.clear()
+    
+    def attach_journal(self, journal: Optional[WriteAheadLog]) -> None:
+        """
+        Append every later write to a write-ahead log.
+        
+        Args:
+            journal: Log to write to, or None to stop logging
+        """
+        self._journal = journal
+    
+    def _log(self, op: str, rows: List[tuple]) -> None:
+        """Append a write to the journal, if any; called under the write lock."""
+        if self._journal is not None:
+            self._journal.append('appointments', op, rows)
+    
+    @writer
+    def replay(self, op: str, rows: List[tuple]) -> None:
+        """
+        Re-apply a logged write while recovering; nothing is logged again.
+        
+        Args:
+            op: Logged operation: create, delete_by_patient, clear or reserve
+            rows: Logged rows; (id, patient_id, date, description) for
+                  create, (patient_id,) for delete_by_patient,
+                  (high-water mark,) for reserve
+        """
+        if op == 'create':
+            for row in rows:
+                self._insert(Appointment(*row))
+            if rows:
+                self._sequence.advance_to(rows[-1][0])
+        elif op == 'delete_by_patient':
+            for (patient_id,) in rows:
+                self._delete_by_patient_id(patient_id)
+        elif op == 'clear':
+            self._clear()
+        elif op == 'reserve':
+            self._sequence.advance_to(rows[0][0])
+        else:
+            raise ValueError(f"Unknown appointment journal op: {op}")
+    
+    @writer
+    def load_snapshot(self, table: MappedTable) -> None:
+        """
+        Replace the stored appointments with a snapshot table's rows.
+        
+        Args:
+            table: Mapped table of (id, patient_id, date, description) rows
+        """
+        self._clear()
+        for row in table.rows():
+            self._insert(Appointment(*row))
+        self._sequence.advance_to(table.high_water_mark)
+    
+    @contextmanager
+    def snapshot_state(self) -> Iterator[Tuple[int, List[tuple]]]:
+        """
+        Hold off writers while yielding a copy of the stored appointments.
+        
+        Returns:
+            Context manager yielding (ID high-water mark, rows), with
+            rows as logged by create
+        """
+        with self._lock.read_locked():
+            yield (self._sequence.high_water_mark,
+                   [_appointment_row(appointment) for appointment in self._appointments.values()])
+
+
+def _patient_row(patient: Patient) -> tuple:
+    """Fields of a patient as logged, in Patient() argument order."""
+    return patient.id, patient.name, patient.age, patient.phone, patient.notes
+
 
+def _appointment_row(appointment: Appointment) -> tuple:
+    """Fields of an appointment as logged, in Appointment() argument order."""
+    return appointment.id, appointment.patient_id, appointment.date, appointment.description
 
-# Global repository instances (will be replaced with dependency injection in future)
-patient_repository = PatientRepository()
-appointment_repository = AppointmentRepository()
 
+# Factories building a (patient, appointment) repository pair from app config
+EngineFactory = Callable[[Mapping[str, Any]],
+                         Tuple[PatientRepositoryProtocol, AppointmentRepositoryProtocol]]
+_engines: Dict[str, EngineFactory] = {}
+
+
+def register_engine(name: str, factory: EngineFactory) -> None:
+    """
+    Register a storage engine that create_app can select by name.
+    
+    Args:
+        name: Engine name used in the REPOSITORY_ENGINE setting
+        factory: Callable taking the app config and returning a
+                 (patient repository, appointment repository) pair
+    """
+    _engines[name] = factory
+
+
+def registered_engines() -> List[str]:
+    """Get the names of all registered storage engines."""
+    return list(_engines)
+
+
+def create_repositories(engine: str, config: Optional[Mapping[str, Any]] = None
+                        ) -> Tuple[PatientRepositoryProtocol, AppointmentRepositoryProtocol]:
+    """
+    Build a new repository pair for a registered engine.
+    
+    Args:
+        engine: Registered engine name
+        config: Engine settings, usually the Flask app config
+        
+    Returns:
+        Tuple of (patient repository, appointment repository)
+        
+    Raises:
+        ValueError: If the engine is unknown or misconfigured
+    """
+    factory = _engines.get(engine)
+    if factory is None:
+        raise ValueError(f"Unknown repository engine: {engine}")
+    return factory(config or {})
+
+
+# Store logging the in-process repositories' writes, when DURABILITY_PATH is set
+durable_store: Optional[DurableStore] = None
+
+
+def _make_durable(config: Mapping[str, Any], patients: PatientRepository,
+                  appointments: AppointmentRepository):
+    """Recover in-process repositories from DURABILITY_PATH and log their writes there."""
+    global durable_store
+    # Only one store may append to a directory; replace the previous one
+    if durable_store is not None:
+        durable_store.close()
+        durable_store = None
+    durable_store = DurableStore(
+        config['DURABILITY_PATH'], {'patients': patients, 'appointments': appointments},
+        fsync=config.get('WAL_FSYNC', DEFAULT_FSYNC_POLICY),
+        fsync_interval=config.get('WAL_FSYNC_INTERVAL', WAL_FSYNC_INTERVAL),
+        snapshot_every=config.get('SNAPSHOT_EVERY', SNAPSHOT_EVERY)
+    )
+    return patients, appointments
+
+
+def _memory_engine(config: Mapping[str, Any]):
+    """Build in-process repositories."""
+    log_size = config.get('CHANGE_LOG_SIZE', CHANGE_LOG_SIZE)
+    if config.get('DURABILITY_PATH'):
+        # Imported here because the mapped module depends on this one
+        from app.mapped import MappedAppointmentRepository, MappedPatientRepository
+        return _make_durable(config, MappedPatientRepository(log_size),
+                             MappedAppointmentRepository(log_size))
+    return PatientRepository(log_size), AppointmentRepository(log_size)
+
+
+def _sqlite_engine(config: Mapping[str, Any]):
+    """Build repositories sharing one SQLite database file."""
+    path = config.get('SQLITE_PATH')
+    if not path:
+        raise ValueError("SQLITE_PATH is required for the sqlite engine")
+    # Imported here because the SQLite module depends on this one
+    from app.sqlite_repositories import (
+        SqliteDatabase, SqlitePatientRepository, SqliteAppointmentRepository
+    )
+    database = SqliteDatabase(path, config.get('CHANGE_LOG_SIZE', CHANGE_LOG_SIZE))
+    return SqlitePatientRepository(database), SqliteAppointmentRepository(database)
+
+
+def _columnar_engine(config: Mapping[str, Any]):
+    """Build in-process repositories with column-oriented appointment storage."""
+    # Imported here because the columnar module depends on this one
+    from app.columnar import ColumnarAppointmentRepository
+    log_size = config.get('CHANGE_LOG_SIZE', CHANGE_LOG_SIZE)
+    if config.get('DURABILITY_PATH'):
+        from app.mapped import MappedPatientRepository
+        return _make_durable(config, MappedPatientRepository(log_size),
+                             ColumnarAppointmentRepository(log_size))
+    return PatientRepository(log_size), ColumnarAppointmentRepository(log_size)
+
+
+register_engine('memory', _memory_engine)
+register_engine('sqlite', _sqlite_engine)
+register_engine('columnar', _columnar_engine)
+
+# Active repository instances, used by services and routes. Always look them
+# up through this module so set_repositories() replacements take effect.
+patient_repository: PatientRepositoryProtocol = PatientRepository()
+appointment_repository: AppointmentRepositoryProtocol = AppointmentRepository()
+
+
+def set_repositories(patients: PatientRepositoryProtocol,
+                     appointments: AppointmentRepositoryProtocol) -> None:
+    """
+    Inject the repositories used by services and routes.
+    
+    Args:
+        patients: Patient repository to activate
+        appointments: Appointment repository to activate
+    """
+    global patient_repository, appointment_repository
+    patient_repository = patients
+    appointment_repository = appointments
+
+
+def configure_repositories(engine: str = 'memory',
+                           config: Optional[Mapping[str, Any]] = None) -> None:
+    """
+    Build repositories for an engine and make them the active ones.
+    
+    Args:
+        engine: Registered engine name
+        config: Engine settings, usually the Flask app config
+        
+    Raises:
+        ValueError: If the engine is unknown or misconfigured
+    """
+    set_repositories(*create_repositories(engine, config))
@@ -3,17 +3,176 @@ Route handlers for the Clinic Management System.
 Contains all Flask route definitions.
 """
 
-from flask import render_template, request, redirect, url_for, flash, jsonify
+import datetime
+import functools
+import hashlib
+from flask import (
+    render_template, request, redirect, url_for, flash, jsonify,
+    Response, stream_with_context, session, make_response
+)
 from app.services import (
     create_patient, update_patient, delete_patient,
-    create_appointment, get_appointments_with_patients, search_appointments
+    create_appointment, get_appointments_with_patients, search_appointments,
+    validate_date, get_patients_page, get_appointments_page, get_dashboard_summary,
+    iter_patients_csv, iter_appointments_csv, ValidationError, DEFAULT_PAGE_SIZE,
+    create_patients_batch, create_appointments_batch, get_changes, patients_for,
+    search_patients, DEFAULT_SEARCH_LIMIT, find_duplicate_patients,
+    find_patient_duplicate_clusters
 )
-from app.repositories import patient_repository, appointment_repository
+from app.serialization import appointment_encoder, encode_patients, json_array_response
+from app import cache, repositories
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _paging_args():
+    """
+    Read pagination query arguments from the current request.
+    
+    Returns:
+        Tuple of (limit, offset, cursor), or None if the request asks for
+        no pagination at all
+        
+    Raises:
+        ValidationError: If limit or offset is not an integer
+    """
+    args = request.args
+    if not any(name in args for name in ('limit', 'offset', 'cursor')):
+        return None
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+        offset = int(args.get('offset', 0))
+    except ValueError:
+        raise ValidationError("Limit and offset must be integers")
+    return limit, offset, args.get('cursor') or None
+
+
+# Data a view can depend on -> attribute of the active repository in app.repositories
+_SOURCES = {'patients': 'patient_repository', 'appointments': 'appointment_repository'}
+
+
+def _data_version(sources=tuple(_SOURCES)):
+    """
+    Get a token that changes whenever the given repositories' data changes.
+    
+    Args:
+        sources: Names from _SOURCES; all repositories by default
+        
+    Returns:
+        Tuple of repository versions
+    """
+    return tuple(getattr(repositories, _SOURCES[source]).version for source in sources)
+
+
+def _request_key():
+    """Identify the current request by path and order-independent query arguments."""
+    return request.path, tuple(sorted(request.args.items(multi=True)))
+
+
+def conditional_view(*sources):
+    """
+    Give a GET view a strong ETag and answer If-None-Match with 304.
+    
+    The ETag is a hash of the request path, query arguments and the
+    versions of the repositories the view reads, so checking it never
+    runs the view or serializes anything.
+    
+    Args:
+        *sources: Names of the data the view reads ('patients',
+                  'appointments')
+        
+    Returns:
+        Decorator for a view function
+    """
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # Read before the view runs, so a concurrent write can only make
+            # the tag older than the body, never newer
+            digest = hashlib.blake2b(repr((_request_key(), _data_version(sources))).encode(),
+                                     digest_size=16)
+            etag = digest.hexdigest()
+            if etag in request.if_none_match:
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Let clients keep the body but revalidate on every use
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorate
+
+
+def cached_view(vary=None):
+    """
+    Cache a GET view's response until the repositories change.
+    
+    Responses are keyed on the request path and query arguments (plus
+    vary(), if given) and served from cache.response_cache while the
+    data version is unchanged. Requests with pending flash messages are
+    never served from or stored in the cache, and only complete 200
+    responses are stored.
+    
+    Args:
+        vary: Optional callable returning extra key data, for views whose
+              output depends on more than the stored data
+        
+    Returns:
+        Decorator for a view function
+    """
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            response_cache = cache.response_cache
+            if not response_cache.enabled or '_flashes' in session:
+                return view(*args, **kwargs)
+            key = (_request_key(), vary() if vary else None)
+            # Read before rendering, so a write during rendering makes the entry stale
+            version = _data_version()
+            cached = response_cache.get(key, version)
+            if cached is not None:
+                body, content_type = cached
+                return Response(body, content_type=content_type)
+            response = make_response(view(*args, **kwargs))
+            # A flash during rendering means an error page; don't keep it
+            if response.status_code == 200 and not response.is_streamed and not session.modified:
+                response_cache.put(key, version, (response.get_data(), response.content_type))
+            return response
+        return wrapper
+    return decorate
+
+
+def _batch_response(create_batch):
+    """
+    Run a batch create service on the JSON request body.
+    
+    Args:
+        create_batch: create_patients_batch or create_appointments_batch
+        
+    Returns:
+        JSON response: 201 with per-item results when every item was
+        created, 422 with per-item errors when the batch was rejected, or
+        400 when the body is not an acceptable JSON array
+    """
+    items = request.get_json(silent=True)
+    if items is None:
+        raise ValidationError("Request body must be a JSON array")
+    created, results = create_batch(items)
+    count = sum(result['status'] == 'created' for result in results) if created else 0
+    return jsonify({'created': count, 'results': results}), 201 if created else 422
+
+
+def _flash_duplicates(duplicates):
+    """Warn that a saved patient looks like the same person as other patients."""
+    if duplicates:
+        ids = ', '.join(f'#{patient.id}' for patient in duplicates)
+        flash(f"Possible duplicate: patient {ids} has the same name and phone number.", "warning")
+
+
 def register_routes(app):
     """
     Register all routes with the Flask application.
@@ -23,22 +182,28 @@ def register_routes(app):
     """
     
     @app.route('/')
+    @cached_view()
     def index():
         """Display the main dashboard."""
         try:
-            patients = patient_repository.get_all()
-            appointments = get_appointments_with_patients()
-            return render_template('index.html', patients=patients, appointments=appointments)
+            summary = get_dashboard_summary()
+            return render_template('index.html',
+                                 patients=summary['recent_patients'],
+                                 appointments=summary['recent_appointments'],
+                                 patient_count=summary['patient_count'],
+                                 appointment_count=summary['appointment_count'])
         except Exception as e:
             logger.error(f"Error loading dashboard: {e}", exc_info=True)
             flash("An error occurred while loading the dashboard.", "error")
-            return render_template('index.html', patients=[], appointments=[])
+            return render_template('index.html', patients=[], appointments=[],
+                                 patient_count=0, appointment_count=0)
     
     @app.route('/patients')
+    @cached_view()
     def list_patients():
         """Display list of all patients."""
         try:
-            patients = patient_repository.get_all()
+            patients = repositories.patient_repository.get_all()
             return render_template('patients.html', patients=patients)
         except Exception as e:
             logger.error(f"Error loading patients: {e}", exc_info=True)
@@ -54,6 +219,7 @@ def register_routes(app):
             phone = request.form.get('phone', '').strip()
             notes = request.form.get('notes', '').strip()
             
+            duplicates = find_duplicate_patients(name, phone)
             patient, error = create_patient(name, age, phone, notes)
             
             if error:
@@ -61,7 +227,14 @@ def register_routes(app):
                 return render_template('patient_add.html', 
                                      name=name, age=age, phone=phone, notes=notes)
             
+            if duplicates and patient.id == duplicates[0].id:
+                flash(f"Patient '{patient.name}' already exists (#{patient.id}); "
+                      "the new details were merged into that record.", "info")
+                logger.info(f"Patient merged: ID={patient.id}")
+                return redirect(url_for('list_patients'))
+            
             flash(f"Patient '{patient.name}' added successfully!", "success")
+            _flash_duplicates(duplicates)
             logger.info(f"Patient created: ID={patient.id}, Name={patient.name}")
             return redirect(url_for('list_patients'))
         
@@ -70,7 +243,7 @@ def register_routes(app):
     @app.route('/patients/<int:patient_id>/edit', methods=['GET', 'POST'])
     def patient_edit(patient_id):
         """Edit an existing patient."""
-        patient = patient_repository.find_by_id(patient_id)
+        patient = repositories.patient_repository.find_by_id(patient_id)
         
         if not patient:
             flash("Patient not found.", "error")
@@ -89,6 +262,8 @@ def register_routes(app):
                 return render_template('patient_edit.html', patient=patient)
             
             flash(f"Patient '{updated_patient.name}' updated successfully!", "success")
+            _flash_duplicates(find_duplicate_patients(updated_patient.name, updated_patient.phone,
+                                                      exclude_id=patient_id))
             logger.info(f"Patient updated: ID={patient_id}")
             return redirect(url_for('list_patients'))
         
@@ -97,7 +272,7 @@ def register_routes(app):
     @app.route('/patients/<int:patient_id>/delete', methods=['POST'])
     def patient_delete(patient_id):
         """Delete a patient."""
-        patient = patient_repository.find_by_id(patient_id)
+        patient = repositories.patient_repository.find_by_id(patient_id)
         
         if not patient:
             flash("Patient not found.", "error")
@@ -114,36 +289,67 @@ def register_routes(app):
         return redirect(url_for('list_patients'))
     
     @app.route('/appointments')
+    @cached_view(vary=datetime.date.today)
     def list_appointments():
         """Display list of all appointments with optional search."""
+        today = datetime.date.today()
+        week_start = today - datetime.timedelta(days=today.weekday())
+        periods = {
+            'today': today.isoformat(),
+            'week_start': week_start.isoformat(),
+            'week_end': (week_start + datetime.timedelta(days=6)).isoformat(),
+        }
         try:
             query = request.args.get('search', '').strip()
             date_filter = request.args.get('date', '').strip()
+            date_from = request.args.get('date_from', '').strip()
+            date_to = request.args.get('date_to', '').strip()
             
-            if query or date_filter:
+            for value in (date_filter, date_from, date_to):
+                if value:
+                    valid, error = validate_date(value)
+                    if not valid:
+                        flash(error, "error")
+                        return render_template('appointments.html', appointments=[],
+                                            search_query=query, date_filter=date_filter,
+                                            date_from=date_from, date_to=date_to,
+                                            **periods)
+            
+            if query or date_filter or date_from or date_to:
+                # The search box finds any part of a description, e.g. "eckup"
                 appointments = search_appointments(query=query if query else None,
-                                                 date=date_filter if date_filter else None)
+                                                 date=date_filter if date_filter else None,
+                                                 date_from=date_from if date_from else None,
+                                                 date_to=date_to if date_to else None,
+                                                 match='substring')
             else:
                 appointments = get_appointments_with_patients()
             
             return render_template('appointments.html', appointments=appointments, 
-                                search_query=query, date_filter=date_filter)
+                                search_query=query, date_filter=date_filter,
+                                date_from=date_from, date_to=date_to, **periods)
         except Exception as e:
             logger.error(f"Error loading appointments: {e}", exc_info=True)
             flash("An error occurred while loading appointments.", "error")
-            return render_template('appointments.html', appointments=[])
+            return render_template('appointments.html', appointments=[], **periods)
     
     @app.route('/appointments/create', methods=['GET', 'POST'])
     def appointment_create():
-        """Create a new appointment."""
-        patients = patient_repository.get_all()
+        """
+        Create a new appointment.
+        
+        The form picks the patient through /api/patients/search, so only
+        the patient count and, when the form is shown again, the chosen
+        patient are read here.
+        """
+        has_patients = repositories.patient_repository.count() > 0
         
         if request.method == 'POST':
             try:
                 patient_id = int(request.form.get('patient_id', 0))
             except (ValueError, TypeError):
                 flash("Invalid patient selected.", "error")
-                return render_template('appointment_create.html', patients=patients)
+                return render_template('appointment_create.html', has_patients=has_patients)
             
             date = request.form.get('date', '').strip()
             description = request.form.get('description', '').strip()
@@ -152,56 +358,159 @@ def register_routes(app):
             
             if error:
                 flash(error, "error")
-                return render_template('appointment_create.html', patients=patients,
-                                    patient_id=patient_id, date=date, description=description)
+                return render_template('appointment_create.html', has_patients=has_patients,
+                                    patient=repositories.patient_repository.find_by_id(patient_id),
+                                    date=date, description=description)
             
             flash(f"Appointment created successfully!", "success")
             logger.info(f"Appointment created: ID={appointment.id}, Patient ID={patient_id}")
             return redirect(url_for('list_appointments'))
         
-        return render_template('appointment_create.html', patients=patients)
+        return render_template('appointment_create.html', has_patients=has_patients)
     
     @app.route('/api/patients', methods=['GET'])
+    @conditional_view('patients')
+    @cached_view()
     def api_get_patients():
-        """API endpoint to get all patients."""
+        """
+        API endpoint to get patients.
+        
+        Returns every patient as a list, or a page envelope when limit,
+        offset or cursor is given.
+        """
         try:
-            patients = patient_repository.get_all()
-            return jsonify([p.to_dict() for p in patients])
+            paging = _paging_args()
+            if paging:
+                return jsonify(get_patients_page(*paging))
+            patients = repositories.patient_repository.get_all()
+            return json_array_response(patients, encode_patients)
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             logger.error(f"API error getting patients: {e}", exc_info=True)
             return jsonify({'error': 'Internal server error'}), 500
     
+    @app.route('/api/patients/search', methods=['GET'])
+    @conditional_view('patients')
+    def api_search_patients():
+        """
+        API endpoint for patient typeahead.
+        
+        Returns up to `limit` patients whose name matches the `q` prefix
+        (or a close misspelling of it) or whose phone number matches its
+        digits, best match first.
+        """
+        try:
+            try:
+                limit = int(request.args.get('limit', DEFAULT_SEARCH_LIMIT))
+            except ValueError:
+                raise ValidationError("Limit must be an integer")
+            return jsonify(search_patients(request.args.get('q', ''), limit))
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"API error searching patients: {e}", exc_info=True)
+            return jsonify({'error': 'Internal server error'}), 500
+    
+    @app.route('/api/patients/duplicates', methods=['GET'])
+    @conditional_view('patients')
+    def api_patient_duplicates():
+        """
+        API endpoint for the dedupe report.
+        
+        Returns every group of patients sharing a name and phone number
+        (ignoring case, punctuation, word order and phone formatting).
+        """
+        try:
+            return jsonify([cluster.to_dict() for cluster in find_patient_duplicate_clusters()])
+        except Exception as e:
+            logger.error(f"API error finding duplicate patients: {e}", exc_info=True)
+            return jsonify({'error': 'Internal server error'}), 500
+    
     @app.route('/api/appointments', methods=['GET'])
+    @conditional_view('patients', 'appointments')
+    @cached_view()
     def api_get_appointments():
-        """API endpoint to get all appointments."""
+        """
+        API endpoint to get appointments.
+        
+        Returns every appointment as a list, or a page envelope when limit,
+        offset or cursor is given.
+        """
         try:
-            appointments = get_appointments_with_patients()
-            return jsonify(appointments)
+            paging = _paging_args()
+            if paging:
+                return jsonify(get_appointments_page(*paging))
+            appointments = repositories.appointment_repository.get_all()
+            return json_array_response(appointments, appointment_encoder(patients_for(appointments)))
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             logger.error(f"API error getting appointments: {e}", exc_info=True)
             return jsonify({'error': 'Internal server error'}), 500
     
+    @app.route('/api/changes', methods=['GET'])
+    def api_get_changes():
+        """
+        API endpoint for delta sync.
+        
+        Returns the patients and appointments created, updated or deleted
+        since the `since` token, or full snapshots when no token is given
+        or it is older than the change log. Pass the returned `version`
+        as `since` on the next call.
+        """
+        try:
+            return jsonify(get_changes(request.args.get('since') or None))
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"API error getting changes: {e}", exc_info=True)
+            return jsonify({'error': 'Internal server error'}), 500
+    
+    @app.route('/api/cache', methods=['GET'])
+    def api_cache_stats():
+        """API endpoint reporting response cache hits, misses and size."""
+        return jsonify(cache.response_cache.stats())
+    
+    @app.route('/api/patients:batch', methods=['POST'])
+    def api_create_patients_batch():
+        """
+        API endpoint to create many patients in one request.
+        
+        Expects a JSON array of patient objects. Either all are created
+        or, if any is invalid, none are.
+        """
+        try:
+            return _batch_response(create_patients_batch)
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"API error creating patients: {e}", exc_info=True)
+            return jsonify({'error': 'Internal server error'}), 500
+    
+    @app.route('/api/appointments:batch', methods=['POST'])
+    def api_create_appointments_batch():
+        """
+        API endpoint to create many appointments in one request.
+        
+        Expects a JSON array of appointment objects. Either all are
+        created or, if any is invalid, none are.
+        """
+        try:
+            return _batch_response(create_appointments_batch)
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"API error creating appointments: {e}", exc_info=True)
+            return jsonify({'error': 'Internal server error'}), 500
+    
     @app.route('/patients/export', methods=['GET'])
+    @conditional_view('patients')
     def export_patients():
-        """Export patients to CSV."""
+        """Export patients to CSV, streamed in chunks."""
         try:
-            import csv
-            from io import StringIO
-            from flask import Response
-            
-            patients = patient_repository.get_all()
-            
-            output = StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['ID', 'Name', 'Age', 'Phone', 'Notes'])
-            
-            for patient in patients:
-                writer.writerow([patient.id, patient.name, patient.age, patient.phone, patient.notes])
-            
-            output.seek(0)
-            
             return Response(
-                output.getvalue(),
+                stream_with_context(iter_patients_csv()),
                 mimetype='text/csv',
                 headers={'Content-Disposition': 'attachment; filename=patients.csv'}
             )
@@ -209,4 +518,18 @@ def register_routes(app):
             logger.error(f"Error exporting patients: {e}", exc_info=True)
             flash("An error occurred while exporting patients.", "error")
             return redirect(url_for('list_patients'))
-
+    
+    @app.route('/appointments/export', methods=['GET'])
+    @conditional_view('patients', 'appointments')
+    def export_appointments():
+        """Export appointments with patient details to CSV, streamed in chunks."""
+        try:
+            return Response(
+                stream_with_context(iter_appointments_csv()),
+                mimetype='text/csv',
+                headers={'Content-Disposition': 'attachment; filename=appointments.csv'}
+            )
+        except Exception as e:
+            logger.error(f"Error exporting appointments: {e}", exc_info=True)
+            flash("An error occurred while exporting appointments.", "error")
+            return redirect(url_for('list_appointments'))
@@ -0,0 +1,69 @@
+"""
+Monotonic ID allocation for the in-memory repositories.
+"""
+
+import threading
+
+
+class IdSequence:
+    """
+    Hands out increasing integer IDs, never reusing one.
+
+    The high-water mark only moves forward: deleting or clearing records
+    does not release their IDs, so anything keyed on an ID (indexes,
+    caches, clients) can never see it refer to a different record.
+    """
+
+    def __init__(self, start: int = 1):
+        """
+        Initialize the sequence.
+
+        Args:
+            start: First ID to hand out
+        """
+        self._next = start
+        self._lock = threading.Lock()
+
+    def next(self) -> int:
+        """Get the next ID."""
+        with self._lock:
+            value = self._next
+            self._next += 1
+            return value
+
+    def allocate(self, count: int) -> range:
+        """
+        Reserve a contiguous block of IDs in one step.
+
+        Args:
+            count: Number of IDs to reserve
+
+        Returns:
+            Range of the reserved IDs
+
+        Raises:
+            ValueError: If count is negative
+        """
+        if count < 0:
+            raise ValueError("count must not be negative")
+        with self._lock:
+            start = self._next
+            self._next += count
+            return range(start, start + count)
+
+    @property
+    def high_water_mark(self) -> int:
+        """Get the largest ID handed out so far, or 0 if none."""
+        return self._next - 1
+
+    def advance_to(self, high_water_mark: int) -> None:
+        """
+        Make sure IDs up to high_water_mark are never handed out.
+
+        Used when restoring persisted state; never moves the sequence back.
+
+        Args:
+            high_water_mark: Largest ID already in use
+        """
+        with self._lock:
+            self._next = max(self._next, high_water_mark + 1)
@@ -0,0 +1,154 @@
+"""
+Fast JSON encoding for list API responses.
+Patients and appointments are encoded straight from their attributes
+instead of going through to_dict(), and large arrays are streamed in
+chunks. orjson is used when installed; otherwise rows are written from
+string templates with the standard library's C string escaper.
+"""
+
+from itertools import islice
+from json.encoder import encode_basestring_ascii as _quote
+from typing import Callable, Dict, Iterator, Mapping, Optional, Sequence
+
+from flask import Response
+
+from app.models import Patient, Appointment
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+# Rows encoded per chunk
+JSON_CHUNK_SIZE = 1000
+
+# Arrays with more rows than this are streamed rather than built in memory
+STREAM_THRESHOLD = 5000
+
+# Encodes a sequence of rows as comma-separated JSON objects, without brackets
+ChunkEncoder = Callable[[Sequence], bytes]
+
+_PATIENT_TEMPLATE = '{"id":%d,"name":%s,"age":%s,"phone":%s,"notes":%s}'
+_APPOINTMENT_TEMPLATE = '{"id":%d,"patient_id":%d,"date":%s,"description":%s%s}'
+
+
+def _patient_fields(patient: Patient) -> dict:
+    """Build the to_dict() mapping inline, for orjson."""
+    return {'id': patient.id, 'name': patient.name, 'age': patient.age,
+            'phone': patient.phone, 'notes': patient.notes}
+
+
+def _encode_patient(patient: Patient) -> str:
+    """Encode one patient as a JSON object with the stdlib escaper."""
+    return _PATIENT_TEMPLATE % (patient.id, _quote(patient.name), _quote(patient.age),
+                                _quote(patient.phone), _quote(patient.notes))
+
+
+def encode_patients(patients: Sequence[Patient]) -> bytes:
+    """
+    Encode patients as comma-separated JSON objects.
+
+    Args:
+        patients: Patients to encode
+
+    Returns:
+        UTF-8 JSON text without the surrounding brackets
+    """
+    if orjson is not None:
+        return orjson.dumps([_patient_fields(patient) for patient in patients])[1:-1]
+    return ','.join([_encode_patient(patient) for patient in patients]).encode()
+
+
+def appointment_encoder(patients: Mapping[int, Patient]) -> ChunkEncoder:
+    """
+    Build an encoder for appointments that embeds each one's patient.
+
+    Produces the same objects as Appointment.to_dict(patient); each
+    distinct patient is encoded once.
+
+    Args:
+        patients: Patients by ID; appointments whose patient is missing
+                  are encoded without a 'patient' key
+
+    Returns:
+        Function encoding a sequence of appointments
+    """
+    if orjson is not None:
+        patient_fields: Dict[int, Optional[dict]] = {}
+
+        def encode(appointments: Sequence[Appointment]) -> bytes:
+            rows = []
+            for appointment in appointments:
+                row = {'id': appointment.id, 'patient_id': appointment.patient_id,
+                       'date': appointment.date, 'description': appointment.description}
+                patient_id = appointment.patient_id
+                if patient_id not in patient_fields:
+                    patient = patients.get(patient_id)
+                    patient_fields[patient_id] = _patient_fields(patient) if patient else None
+                fields = patient_fields[patient_id]
+                if fields is not None:
+                    row['patient'] = fields
+                rows.append(row)
+            return orjson.dumps(rows)[1:-1]
+        return encode
+
+    patient_json: Dict[int, str] = {}
+
+    def encode(appointments: Sequence[Appointment]) -> bytes:
+        rows = []
+        for appointment in appointments:
+            patient_id = appointment.patient_id
+            embedded = patient_json.get(patient_id)
+            if embedded is None:
+                patient = patients.get(patient_id)
+                embedded = patient_json[patient_id] = (
+                    ',"patient":' + _encode_patient(patient) if patient else '')
+            rows.append(_APPOINTMENT_TEMPLATE % (
+                appointment.id, patient_id, _quote(appointment.date),
+                _quote(appointment.description), embedded))
+        return ','.join(rows).encode()
+    return encode
+
+
+def iter_json_array(rows: Sequence, encode_chunk: ChunkEncoder,
+                    chunk_size: int = JSON_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Encode rows as a JSON array, chunk by chunk.
+
+    Args:
+        rows: Rows to encode
+        encode_chunk: Encodes a slice of rows without brackets
+        chunk_size: Rows per chunk
+
+    Returns:
+        Iterator of byte strings that together form one JSON array
+    """
+    yield b'['
+    iterator = iter(rows)
+    separator = b''
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+        yield separator + encode_chunk(chunk)
+        separator = b','
+    yield b']'
+
+
+def json_array_response(rows: Sequence, encode_chunk: ChunkEncoder) -> Response:
+    """
+    Build a JSON array response, streaming it when it is large.
+
+    Streamed responses have no Content-Length and are not kept by the
+    response cache; small ones are built in one piece.
+
+    Args:
+        rows: Rows to encode
+        encode_chunk: Encodes a slice of rows without brackets
+
+    Returns:
+        application/json response
+    """
+    if len(rows) > STREAM_THRESHOLD:
+        return Response(iter_json_array(rows, encode_chunk), mimetype='application/json')
+    return Response(b''.join(iter_json_array(rows, encode_chunk)), mimetype='application/json')
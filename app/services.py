@@ -3,17 +3,154 @@ Business logic layer for the Clinic Management System.
 Contains service functions that handle business rules and validation.
 """
 
-from typing import Tuple, Optional, List, Dict, Any
-from app.repositories import patient_repository, appointment_repository
+from typing import Tuple, Optional, List, Dict, Any, Iterator, Iterable, Mapping, Callable
+from app import repositories
+from app.dedupe import DuplicateCluster, find_duplicate_clusters
 from app.models import Patient, Appointment
+from app.patient_index import identity_key
+from functools import lru_cache
+from io import StringIO
+import base64
+import binascii
+import csv
+import datetime
 import re
 
+# Page size limits for paginated listings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# Rows read from the repository per chunk of a streamed CSV export
+EXPORT_CHUNK_SIZE = 1000
+
+# Most records accepted by one batch create request
+MAX_BATCH_SIZE = 1000
+
+# Result limits for patient search
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
+# What creating or updating a patient that duplicates another does:
+# 'reject' refuses it, 'warn' saves it anyway (callers report the
+# duplicates), 'merge' folds a new patient's details into the existing one
+DUPLICATE_POLICIES = ('reject', 'warn', 'merge')
+DEFAULT_DUPLICATE_POLICY = 'warn'
+
+# Patients read per page by the dedupe job
+DEDUPE_CHUNK_SIZE = 10_000
+
+# Characters allowed between phone number digits
+_PHONE_SEPARATORS = re.compile(r'[\s\-\(\)]')
+_DATE_FORMAT = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+# Shared result of every successful validate_* call
+_VALID = (True, "")
+
 
 class ValidationError(Exception):
     """Custom exception for validation errors."""
     pass
 
 
+# Active duplicate policy; set with configure_duplicate_policy()
+duplicate_policy = DEFAULT_DUPLICATE_POLICY
+
+
+def configure_duplicate_policy(policy: str = DEFAULT_DUPLICATE_POLICY) -> None:
+    """
+    Set what happens when a patient would duplicate another.
+    
+    Args:
+        policy: One of DUPLICATE_POLICIES
+        
+    Raises:
+        ValueError: If policy is unknown
+    """
+    global duplicate_policy
+    if policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicate policy: {policy}")
+    duplicate_policy = policy
+
+
+def _duplicate_error(duplicates: List[Patient]) -> str:
+    """Error message for a patient rejected as a duplicate."""
+    ids = ', '.join(f'#{patient.id}' for patient in duplicates)
+    return f"A patient with this name and phone number already exists ({ids})"
+
+
+def _clean(value: Optional[str]) -> str:
+    """Strip a form value once; None counts as empty."""
+    return value.strip() if value else ''
+
+
+# The _*_error checks take a stripped value and return the error message,
+# or None if it is valid, so batch validation allocates nothing per field.
+
+def _name_error(name: str) -> Optional[str]:
+    """Check a stripped patient name."""
+    if not name:
+        return "Patient name is required"
+    if len(name) < 2:
+        return "Patient name must be at least 2 characters"
+    if len(name) > 100:
+        return "Patient name must be less than 100 characters"
+    return None
+
+
+def _age_error(age: str) -> Optional[str]:
+    """Check a stripped age."""
+    if not age:
+        return "Age is required"
+    try:
+        age_int = int(age)
+    except ValueError:
+        return "Age must be a valid number"
+    if age_int < 0:
+        return "Age cannot be negative"
+    if age_int > 150:
+        return "Age must be less than 150"
+    return None
+
+
+def _phone_error(phone: str) -> Optional[str]:
+    """Check a stripped phone number; spaces, dashes and parentheses are allowed."""
+    digits = phone if phone.isdigit() else _PHONE_SEPARATORS.sub('', phone)
+    if not digits:
+        return "Phone number is required"
+    if not digits.isdigit():
+        return "Phone number must contain only digits"
+    if len(digits) < 7:
+        return "Phone number is too short"
+    if len(digits) > 15:
+        return "Phone number is too long"
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _date_error(date: str) -> Optional[str]:
+    """Check a stripped date; cached because imports repeat the same dates."""
+    if not date:
+        return "Date is required"
+    if not _DATE_FORMAT.fullmatch(date):
+        return "Date must be in YYYY-MM-DD format"
+    try:
+        datetime.date.fromisoformat(date)
+    except ValueError:
+        return "Invalid date"
+    return None
+
+
+def _description_error(description: str) -> Optional[str]:
+    """Check a stripped appointment description."""
+    if not description:
+        return "Description is required"
+    if len(description) < 3:
+        return "Description must be at least 3 characters"
+    if len(description) > 500:
+        return "Description must be less than 500 characters"
+    return None
+
+
 def validate_patient_name(name: str) -> Tuple[bool, str]:
     """
     Validate patient name.
@@ -24,13 +161,8 @@ def validate_patient_name(name: str) -> Tuple[bool, str]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    if not name or not name.strip():
-        return False, "Patient name is required"
-    if len(name.strip()) < 2:
-        return False, "Patient name must be at least 2 characters"
-    if len(name.strip()) > 100:
-        return False, "Patient name must be less than 100 characters"
-    return True, ""
+    error = _name_error(_clean(name))
+    return (False, error) if error else _VALID
 
 
 def validate_age(age: str) -> Tuple[bool, str]:
@@ -43,18 +175,8 @@ def validate_age(age: str) -> Tuple[bool, str]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    if not age or not age.strip():
-        return False, "Age is required"
-    
-    try:
-        age_int = int(age.strip())
-        if age_int < 0:
-            return False, "Age cannot be negative"
-        if age_int > 150:
-            return False, "Age must be less than 150"
-        return True, ""
-    except ValueError:
-        return False, "Age must be a valid number"
+    error = _age_error(_clean(age))
+    return (False, error) if error else _VALID
 
 
 def validate_phone(phone: str) -> Tuple[bool, str]:
@@ -67,23 +189,8 @@ def validate_phone(phone: str) -> Tuple[bool, str]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    if not phone or not phone.strip():
-        return False, "Phone number is required"
-    
-    # Allow various phone formats
-    phone_clean = re.sub(r'[\s\-\(\)]', '', phone.strip())
-    if not phone_clean:
-        return False, "Phone number is required"
-    
-    if len(phone_clean) < 7:
-        return False, "Phone number is too short"
-    if len(phone_clean) > 15:
-        return False, "Phone number is too long"
-    
-    if not phone_clean.isdigit():
-        return False, "Phone number must contain only digits"
-    
-    return True, ""
+    error = _phone_error(_clean(phone))
+    return (False, error) if error else _VALID
 
 
 def validate_date(date_str: str) -> Tuple[bool, str]:
@@ -96,21 +203,8 @@ def validate_date(date_str: str) -> Tuple[bool, str]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    if not date_str or not date_str.strip():
-        return False, "Date is required"
-    
-    # Check format YYYY-MM-DD
-    date_pattern = r'^\d{4}-\d{2}-\d{2}$'
-    if not re.match(date_pattern, date_str.strip()):
-        return False, "Date must be in YYYY-MM-DD format"
-    
-    # Try to parse the date
-    try:
-        from datetime import datetime
-        datetime.strptime(date_str.strip(), '%Y-%m-%d')
-        return True, ""
-    except ValueError:
-        return False, "Invalid date"
+    error = _date_error(_clean(date_str))
+    return (False, error) if error else _VALID
 
 
 def validate_appointment_description(description: str) -> Tuple[bool, str]:
@@ -123,88 +217,210 @@ def validate_appointment_description(description: str) -> Tuple[bool, str]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    if not description or not description.strip():
-        return False, "Description is required"
-    if len(description.strip()) < 3:
-        return False, "Description must be at least 3 characters"
-    if len(description.strip()) > 500:
-        return False, "Description must be less than 500 characters"
-    return True, ""
+    error = _description_error(_clean(description))
+    return (False, error) if error else _VALID
+
+
+def _field(record: Mapping[str, Any], key: str) -> str:
+    """Get a record field as stripped text; missing and null fields are empty."""
+    value = record.get(key)
+    if value is None:
+        return ''
+    return (value if type(value) is str else str(value)).strip()
+
+
+def validate_patient_record(record: Mapping[str, Any]) -> Tuple[Optional[tuple], Optional[str]]:
+    """
+    Validate a patient record with name, age, phone and optional notes.
+    
+    Args:
+        record: Mapping of field names to values
+        
+    Returns:
+        Tuple of ((name, age, phone, notes) ready for create_many, or None,
+        error_message or None)
+    """
+    name, age, phone = _field(record, 'name'), _field(record, 'age'), _field(record, 'phone')
+    error = _name_error(name) or _age_error(age) or _phone_error(phone)
+    if error:
+        return None, error
+    return (name, age, phone, _field(record, 'notes')), None
+
+
+def validate_appointment_record(record: Mapping[str, Any]) -> Tuple[Optional[tuple], Optional[str]]:
+    """
+    Validate an appointment record with patient_id, date and description.
+    
+    Whether the patient exists is not checked here.
+    
+    Args:
+        record: Mapping of field names to values
+        
+    Returns:
+        Tuple of ((patient_id, date, description) ready for create_many,
+        or None, error_message or None)
+    """
+    try:
+        patient_id = int(_field(record, 'patient_id'))
+    except ValueError:
+        return None, "Patient ID must be a number"
+    date, description = _field(record, 'date'), _field(record, 'description')
+    error = _date_error(date) or _description_error(description)
+    if error:
+        return None, error
+    return (patient_id, date, description), None
+
+
+def validate_many(records: Iterable[Any],
+                  validate_record: Callable[[Mapping[str, Any]], Tuple[Optional[tuple], Optional[str]]]
+                  ) -> Tuple[List[Optional[tuple]], List[Optional[str]]]:
+    """
+    Validate many records in one pass.
+    
+    Shared by bulk import and the batch API.
+    
+    Args:
+        records: Records to validate; anything but a dict is invalid
+        validate_record: validate_patient_record or validate_appointment_record
+        
+    Returns:
+        Tuple of (values, errors) aligned with records: values[i] is the
+        normalized tuple or None, errors[i] the error message or None
+    """
+    values: List[Optional[tuple]] = []
+    errors: List[Optional[str]] = []
+    for record in records:
+        if type(record) is dict:
+            item_values, error = validate_record(record)
+        else:
+            item_values, error = None, "Record must be a JSON object"
+        values.append(item_values)
+        errors.append(error)
+    return values, errors
 
 
-def create_patient(name: str, age: str, phone: str, notes: str = '') -> Tuple[Optional[Patient], Optional[str]]:
+def find_duplicate_patients(name: str, phone: str,
+                            exclude_id: Optional[int] = None) -> List[Patient]:
+    """
+    Find patients that are probably the same person as a name and phone.
+    
+    Args:
+        name: Name to check
+        phone: Phone number to check
+        exclude_id: ID of a patient to leave out, e.g. the one being edited
+        
+    Returns:
+        List of matching Patient objects, ordered by ID
+    """
+    return [patient for patient in repositories.patient_repository.find_duplicates(name, phone)
+            if patient.id != exclude_id]
+
+
+def _merge_patient(existing: Patient, age: str, notes: str) -> Patient:
+    """Fold a duplicate's age and notes into an existing patient."""
+    existing = repositories.patient_repository.find_by_id(existing.id) or existing
+    if notes and notes not in existing.notes:
+        notes = f"{existing.notes}\n{notes}" if existing.notes else notes
+    else:
+        notes = None
+    return repositories.patient_repository.update(existing.id, age=age, notes=notes) or existing
+
+
+def create_patient(name: str, age: str, phone: str, notes: str = '',
+                   policy: Optional[str] = None) -> Tuple[Optional[Patient], Optional[str]]:
     """
     Create a new patient with validation.
     
+    A patient with the same normalized name and phone number as an
+    existing one is handled by the duplicate policy: 'reject' returns an
+    error, 'merge' updates and returns the oldest existing patient
+    instead, and 'warn' creates the patient anyway.
+    
     Args:
         name: Patient name
         age: Patient age
         phone: Patient phone
         notes: Optional notes
+        policy: Duplicate policy; defaults to the configured one
         
     Returns:
         Tuple of (Patient object or None, error_message or None)
     """
     # Validate inputs
-    valid, error = validate_patient_name(name)
-    if not valid:
+    name, age, phone, notes = _clean(name), _clean(age), _clean(phone), _clean(notes)
+    error = _name_error(name) or _age_error(age) or _phone_error(phone)
+    if error:
         return None, error
     
-    valid, error = validate_age(age)
-    if not valid:
-        return None, error
-    
-    valid, error = validate_phone(phone)
-    if not valid:
-        return None, error
+    policy = policy or duplicate_policy
+    if policy != 'warn':
+        duplicates = repositories.patient_repository.find_duplicates(name, phone)
+        if duplicates:
+            if policy == 'reject':
+                return None, _duplicate_error(duplicates)
+            return _merge_patient(duplicates[0], age, notes), None
     
     # Create patient
-    patient = patient_repository.create(name.strip(), age.strip(), phone.strip(), notes.strip())
+    patient = repositories.patient_repository.create(name, age, phone, notes)
     return patient, None
 
 
 def update_patient(patient_id: int, name: Optional[str] = None,
                    age: Optional[str] = None, phone: Optional[str] = None,
-                   notes: Optional[str] = None) -> Tuple[Optional[Patient], Optional[str]]:
+                   notes: Optional[str] = None,
+                   policy: Optional[str] = None) -> Tuple[Optional[Patient], Optional[str]]:
     """
     Update a patient with validation.
     
+    If the new name and phone number would duplicate another patient,
+    the 'reject' and 'merge' policies refuse the update (two existing
+    records are never merged automatically); 'warn' allows it.
+    
     Args:
         patient_id: ID of patient to update
         name: New name (optional)
         age: New age (optional)
         phone: New phone (optional)
         notes: New notes (optional)
+        policy: Duplicate policy; defaults to the configured one
         
     Returns:
         Tuple of (Patient object or None, error_message or None)
     """
     # Check if patient exists
-    patient = patient_repository.find_by_id(patient_id)
+    patient = repositories.patient_repository.find_by_id(patient_id)
     if not patient:
         return None, "Patient not found"
     
     # Validate inputs if provided
     if name is not None:
-        valid, error = validate_patient_name(name)
-        if not valid:
+        name = _clean(name)
+        error = _name_error(name)
+        if error:
             return None, error
-        name = name.strip()
     
     if age is not None:
-        valid, error = validate_age(age)
-        if not valid:
+        age = _clean(age)
+        error = _age_error(age)
+        if error:
             return None, error
-        age = age.strip()
     
     if phone is not None:
-        valid, error = validate_phone(phone)
-        if not valid:
+        phone = _clean(phone)
+        error = _phone_error(phone)
+        if error:
             return None, error
-        phone = phone.strip()
+    
+    policy = policy or duplicate_policy
+    if policy != 'warn' and (name is not None or phone is not None):
+        duplicates = find_duplicate_patients(patient.name if name is None else name,
+                                             patient.phone if phone is None else phone,
+                                             exclude_id=patient_id)
+        if duplicates:
+            return None, _duplicate_error(duplicates)
     
     # Update patient
-    updated_patient = patient_repository.update(patient_id, name, age, phone, notes)
+    updated_patient = repositories.patient_repository.update(patient_id, name, age, phone, notes)
     return updated_patient, None
 
 
@@ -219,15 +435,15 @@ def delete_patient(patient_id: int) -> Tuple[bool, Optional[str]]:
         Tuple of (success, error_message or None)
     """
     # Check if patient exists
-    patient = patient_repository.find_by_id(patient_id)
+    patient = repositories.patient_repository.find_by_id(patient_id)
     if not patient:
         return False, "Patient not found"
     
     # Delete associated appointments
-    appointment_repository.delete_by_patient_id(patient_id)
+    repositories.appointment_repository.delete_by_patient_id(patient_id)
     
     # Delete patient
-    success = patient_repository.delete(patient_id)
+    success = repositories.patient_repository.delete(patient_id)
     return success, None
 
 
@@ -244,24 +460,234 @@ def create_appointment(patient_id: int, date: str, description: str) -> Tuple[Op
         Tuple of (Appointment object or None, error_message or None)
     """
     # Validate patient exists
-    patient = patient_repository.find_by_id(patient_id)
+    patient = repositories.patient_repository.find_by_id(patient_id)
     if not patient:
         return None, "Patient not found"
     
     # Validate inputs
-    valid, error = validate_date(date)
-    if not valid:
-        return None, error
-    
-    valid, error = validate_appointment_description(description)
-    if not valid:
+    date, description = _clean(date), _clean(description)
+    error = _date_error(date) or _description_error(description)
+    if error:
         return None, error
     
     # Create appointment
-    appointment = appointment_repository.create(patient_id, date.strip(), description.strip())
+    appointment = repositories.appointment_repository.create(patient_id, date, description)
     return appointment, None
 
 
+def _validate_batch(items: Any, validate) -> Tuple[List[tuple], List[Optional[str]]]:
+    """Validate every item of a batch, returning the values and per-item errors."""
+    if not isinstance(items, list):
+        raise ValidationError("Request body must be a JSON array")
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValidationError(f"A batch may contain at most {MAX_BATCH_SIZE} items")
+    return validate_many(items, validate)
+
+
+def _batch_results(errors: List[Optional[str]]) -> List[Dict[str, Any]]:
+    """Per-item results for a rejected batch."""
+    return [{'index': index, 'status': 'invalid', 'error': error} if error
+            else {'index': index, 'status': 'valid'}
+            for index, error in enumerate(errors)]
+
+
+def _find_batch_duplicates(values: List[Optional[tuple]]
+                           ) -> Tuple[Dict[int, List[Patient]], Dict[int, int]]:
+    """
+    Find the duplicates of each validated patient item of a batch.
+    
+    Returns:
+        Tuple of (existing patients each item duplicates, by item index;
+        index of the first earlier item with the same identity key, by item
+        index). Items that are None are skipped.
+    """
+    existing: Dict[int, List[Patient]] = {}
+    first_item: Dict[Tuple[str, str], int] = {}
+    repeats: Dict[int, int] = {}
+    for index, item in enumerate(values):
+        if item is None:
+            continue
+        duplicates = repositories.patient_repository.find_duplicates(item[0], item[2])
+        if duplicates:
+            existing[index] = duplicates
+        key = identity_key(item[0], item[2])
+        if key in first_item:
+            repeats[index] = first_item[key]
+        else:
+            first_item[key] = index
+    return existing, repeats
+
+
+def create_patients_batch(items: Any, policy: Optional[str] = None) -> Tuple[bool, List[Dict[str, Any]]]:
+    """
+    Create many patients, all or none.
+    
+    Every item is validated first. Only if all are valid are they
+    created, in one create_many call.
+    
+    Items that duplicate an existing patient, or an earlier item, are
+    handled by the duplicate policy: under 'reject' they are invalid,
+    under 'merge' they are folded into that patient (status 'merged')
+    instead of being created, and under 'warn' they are created with the
+    IDs of the patients they duplicate in 'duplicates'.
+    
+    Args:
+        items: List of patient records (name, age, phone, notes)
+        policy: Duplicate policy; defaults to the configured one
+        
+    Returns:
+        Tuple of (whether the patients were created, per-item results in
+        input order). Created items carry the new patient; when the batch
+        is rejected, each item is marked valid or invalid with its error.
+        
+    Raises:
+        ValidationError: If items is not a list or is too long
+    """
+    policy = policy or duplicate_policy
+    values, errors = _validate_batch(items, validate_patient_record)
+    existing, repeats = _find_batch_duplicates(values)
+    
+    if policy == 'reject':
+        for index in existing:
+            errors[index] = _duplicate_error(existing[index])
+        for index, first in repeats.items():
+            errors[index] = errors[index] or f"Duplicates item {first} of this batch"
+    if any(errors):
+        return False, _batch_results(errors)
+    
+    if policy == 'merge':
+        # Only the first item of each identity key that is new gets created
+        to_create = [index for index in range(len(values))
+                     if index not in existing and index not in repeats]
+    else:
+        to_create = list(range(len(values)))
+    created = dict(zip(to_create, repositories.patient_repository.create_many(
+        [values[index] for index in to_create])))
+    
+    results = []
+    for index, (name, age, phone, notes) in enumerate(values):
+        if index in created:
+            result = {'index': index, 'status': 'created', 'patient': created[index].to_dict()}
+            duplicate_ids = [patient.id for patient in existing.get(index, ())]
+            if index in repeats:
+                duplicate_ids.append(created[repeats[index]].id)
+            if duplicate_ids:
+                result['duplicates'] = duplicate_ids
+        else:
+            target = existing[index][0] if index in existing else created[repeats[index]]
+            merged = _merge_patient(target, age, notes)
+            result = {'index': index, 'status': 'merged', 'patient': merged.to_dict()}
+        results.append(result)
+    return True, results
+
+
+def create_valid_patients(values: List[tuple], policy: Optional[str] = None,
+                          rows: Optional[List[int]] = None
+                          ) -> Tuple[List[Optional[Patient]], List[Optional[str]]]:
+    """
+    Create validated patients, handling duplicates item by item.
+    
+    Duplicates of an existing patient or an earlier item are handled as in
+    create_patients_batch, except that under 'reject' only the duplicate
+    is left out and the other items are still created.
+    
+    Args:
+        values: (name, age, phone, notes) of each patient, already validated
+        policy: Duplicate policy; defaults to the configured one
+        rows: Input line number of each item, used in place of the item
+              index in errors
+        
+    Returns:
+        Tuple of (per item, the patient created, or None if the item was
+        merged or rejected; per item, why it was rejected, or None)
+    """
+    policy = policy or duplicate_policy
+    existing, repeats = _find_batch_duplicates(values)
+    errors: List[Optional[str]] = [None] * len(values)
+    if policy == 'reject':
+        for index in existing:
+            errors[index] = _duplicate_error(existing[index])
+        for index, first in repeats.items():
+            errors[index] = errors[index] or (f"Duplicates row {rows[first]}" if rows
+                                              else f"Duplicates item {first} of this batch")
+        to_create = [index for index in range(len(values)) if errors[index] is None]
+    elif policy == 'merge':
+        to_create = [index for index in range(len(values))
+                     if index not in existing and index not in repeats]
+    else:
+        to_create = list(range(len(values)))
+    
+    patients: List[Optional[Patient]] = [None] * len(values)
+    for index, patient in zip(to_create, repositories.patient_repository.create_many(
+            [values[index] for index in to_create])):
+        patients[index] = patient
+    if policy == 'merge':
+        for index, (_, age, _, notes) in enumerate(values):
+            if patients[index] is None:
+                target = existing[index][0] if index in existing else patients[repeats[index]]
+                _merge_patient(target, age, notes)
+    return patients, errors
+
+
+def create_appointments_batch(items: Any) -> Tuple[bool, List[Dict[str, Any]]]:
+    """
+    Create many appointments, all or none.
+    
+    Like create_patients_batch; items whose patient does not exist are
+    invalid.
+    
+    Args:
+        items: List of appointment records (patient_id, date, description)
+        
+    Returns:
+        Tuple of (whether the appointments were created, per-item results)
+        
+    Raises:
+        ValidationError: If items is not a list or is too long
+    """
+    values, errors = _validate_batch(items, validate_appointment_record)
+    patients = repositories.patient_repository.find_by_ids(
+        item[0] for item in values if item is not None)
+    for index, item in enumerate(values):
+        if item is not None and item[0] not in patients:
+            errors[index] = "Patient not found"
+    if any(errors):
+        return False, _batch_results(errors)
+    appointments = repositories.appointment_repository.create_many(values)
+    return True, [{'index': index, 'status': 'created', 'appointment': appointment.to_dict()}
+                  for index, appointment in enumerate(appointments)]
+
+
+def patients_for(appointments: List[Appointment]) -> Dict[int, Patient]:
+    """
+    Fetch the patients of some appointments in a single batched lookup.
+    
+    Args:
+        appointments: Appointments whose patients are needed
+        
+    Returns:
+        Dictionary mapping patient ID to Patient for the patients that exist
+    """
+    return repositories.patient_repository.find_by_ids(apt.patient_id for apt in appointments)
+
+
+def join_patients(appointments: List[Appointment]) -> List[Dict[str, Any]]:
+    """
+    Attach patient information to appointments.
+    
+    Patients are fetched in a single batched lookup, so the cost is linear
+    in the number of appointments.
+    
+    Args:
+        appointments: Appointments to convert
+        
+    Returns:
+        List of appointment dictionaries with patient data
+    """
+    patients = patients_for(appointments)
+    return [apt.to_dict(patients.get(apt.patient_id)) for apt in appointments]
+
+
 def get_appointments_with_patients() -> List[Dict[str, Any]]:
     """
     Get all appointments with patient information included.
@@ -269,36 +695,384 @@ def get_appointments_with_patients() -> List[Dict[str, Any]]:
     Returns:
         List of appointment dictionaries with patient data
     """
-    appointments = appointment_repository.get_all()
-    result = []
+    return join_patients(repositories.appointment_repository.get_all())
+
+
+def get_dashboard_summary(limit: int = 5) -> Dict[str, Any]:
+    """
+    Get the counts and recent items shown on the dashboard.
     
-    for appointment in appointments:
-        patient = patient_repository.find_by_id(appointment.patient_id)
-        result.append(appointment.to_dict(patient))
+    Only the displayed items are loaded, so the cost does not grow with
+    the number of stored records.
     
-    return result
+    Args:
+        limit: Number of recent patients and appointments to include
+        
+    Returns:
+        Dictionary with patient_count, appointment_count, recent_patients
+        and recent_appointments (with patient data)
+    """
+    return {
+        'patient_count': repositories.patient_repository.count(),
+        'appointment_count': repositories.appointment_repository.count(),
+        'recent_patients': repositories.patient_repository.get_recent(limit),
+        'recent_appointments': join_patients(repositories.appointment_repository.get_recent(limit))
+    }
 
 
 def search_appointments(query: Optional[str] = None,
                        patient_id: Optional[int] = None,
-                       date: Optional[str] = None) -> List[Dict[str, Any]]:
+                       date: Optional[str] = None,
+                       date_from: Optional[str] = None,
+                       date_to: Optional[str] = None,
+                       match: str = 'prefix') -> List[Dict[str, Any]]:
     """
     Search appointments with patient information.
     
     Args:
         query: Search term for description
         patient_id: Filter by patient ID
-        date: Filter by date
+        date: Filter by exact date
+        date_from: Filter by earliest date (inclusive)
+        date_to: Filter by latest date (inclusive)
+        match: Description matching mode ('term', 'prefix' or 'substring')
         
     Returns:
         List of appointment dictionaries with patient data
     """
-    appointments = appointment_repository.search(query, patient_id, date)
-    result = []
+    appointments = repositories.appointment_repository.search(query, patient_id, date,
+                                                 date_from, date_to, match)
+    return join_patients(appointments)
+
+
+def search_patients(query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[Dict[str, Any]]:
+    """
+    Find patients by partial name or phone number, for typeahead.
+    
+    Args:
+        query: Name prefix, misspelled name or phone digits
+        limit: Maximum number of patients to return
+        
+    Returns:
+        List of patient dictionaries, best match first
+        
+    Raises:
+        ValidationError: If limit is out of range
+    """
+    if limit < 1 or limit > MAX_SEARCH_LIMIT:
+        raise ValidationError(f"Limit must be between 1 and {MAX_SEARCH_LIMIT}")
+    query = _clean(query)
+    if not query:
+        return []
+    return [p.to_dict() for p in repositories.patient_repository.search(query, limit)]
+
+
+def encode_cursor(last_id: int) -> str:
+    """
+    Encode a keyset position as an opaque cursor string.
+    
+    Args:
+        last_id: ID of the last record on the current page
+        
+    Returns:
+        URL-safe cursor string
+    """
+    return base64.urlsafe_b64encode(f'id:{last_id}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode a cursor produced by encode_cursor.
+    
+    Args:
+        cursor: Cursor string from a previous page
+        
+    Returns:
+        ID of the last record on the previous page
+        
+    Raises:
+        ValidationError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded).decode().partition(':')
+        if prefix != 'id':
+            raise ValueError(cursor)
+        return int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValidationError("Invalid cursor")
+
+
+def _paginate(repository, limit: int, offset: int,
+              cursor: Optional[str]) -> Tuple[list, Optional[str]]:
+    """Fetch one page from a repository and compute the next cursor."""
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValidationError(f"Limit must be between 1 and {MAX_PAGE_SIZE}")
+    if offset < 0:
+        raise ValidationError("Offset cannot be negative")
+    after_id = decode_cursor(cursor) if cursor else None
+    
+    # Fetch one extra row to learn whether another page exists
+    items = repository.get_page(limit + 1, offset, after_id)
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].id)
+    return items, next_cursor
+
+
+def get_patients_page(limit: int = DEFAULT_PAGE_SIZE, offset: int = 0,
+                      cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get one page of patients.
+    
+    Args:
+        limit: Maximum number of patients to return
+        offset: Number of patients to skip (after the cursor, if any)
+        cursor: Opaque cursor returned as next_cursor by a previous page
+        
+    Returns:
+        Dictionary with the page items, total count and next cursor
+        
+    Raises:
+        ValidationError: If the paging arguments are invalid
+    """
+    patients, next_cursor = _paginate(repositories.patient_repository, limit, offset, cursor)
+    return {
+        'items': [p.to_dict() for p in patients],
+        'total': repositories.patient_repository.count(),
+        'limit': limit,
+        'offset': offset,
+        'next_cursor': next_cursor
+    }
+
+
+def get_appointments_page(limit: int = DEFAULT_PAGE_SIZE, offset: int = 0,
+                          cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get one page of appointments with patient information included.
+    
+    Args:
+        limit: Maximum number of appointments to return
+        offset: Number of appointments to skip (after the cursor, if any)
+        cursor: Opaque cursor returned as next_cursor by a previous page
+        
+    Returns:
+        Dictionary with the page items, total count and next cursor
+        
+    Raises:
+        ValidationError: If the paging arguments are invalid
+    """
+    appointments, next_cursor = _paginate(repositories.appointment_repository, limit, offset, cursor)
+    return {
+        'items': join_patients(appointments),
+        'total': repositories.appointment_repository.count(),
+        'limit': limit,
+        'offset': offset,
+        'next_cursor': next_cursor
+    }
+
+
+def encode_sync_token(patients_version: int, appointments_version: int) -> str:
+    """
+    Encode repository versions as an opaque sync token.
+    
+    Args:
+        patients_version: Patient repository version the client is synced to
+        appointments_version: Appointment repository version the client is synced to
+        
+    Returns:
+        URL-safe token string
+    """
+    raw = f'v:{patients_version}:{appointments_version}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_sync_token(token: str) -> Tuple[int, int]:
+    """
+    Decode a token produced by encode_sync_token.
+    
+    Args:
+        token: Token from a previous sync
+        
+    Returns:
+        Tuple of (patients version, appointments version)
+        
+    Raises:
+        ValidationError: If the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        prefix, patients_version, appointments_version = (
+            base64.urlsafe_b64decode(padded).decode().split(':'))
+        if prefix != 'v':
+            raise ValueError(token)
+        return int(patients_version), int(appointments_version)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValidationError("Invalid sync token")
+
+
+def _collection_changes(repository, since: Optional[int],
+                        find_by_ids: Callable[[List[int]], Dict[int, Any]]) -> Tuple[int, Dict[str, Any]]:
+    """
+    Compute one repository's part of a sync response.
+    
+    Args:
+        repository: Patient or appointment repository
+        since: Version the client has, or None for a first sync
+        find_by_ids: Fetches the current records for a list of IDs
+        
+    Returns:
+        Tuple of (version the client is synced to afterwards, delta dict)
+    """
+    # Read first: anything written after this is sent again next time
+    version = repository.version
+    changes = repository.changes_since(since) if since is not None else None
+    if changes is None:
+        return version, {'snapshot': True,
+                         'upserted': [record.to_dict() for record in repository.get_all()],
+                         'deleted': []}
+    # IDs are never reused, so the last change to a record decides its state
+    latest = {change.record_id: change.op for change in changes}
+    records = find_by_ids([record_id for record_id, op in latest.items() if op != 'delete'])
+    delta = {'snapshot': False, 'upserted': [], 'deleted': []}
+    for record_id, op in latest.items():
+        record = records.get(record_id)
+        if record is None:
+            delta['deleted'].append(record_id)
+        else:
+            delta['upserted'].append(record.to_dict())
+    if changes:
+        version = max(version, changes[-1].version)
+    return version, delta
+
+
+def _find_appointments_by_ids(appointment_ids: List[int]) -> Dict[int, Appointment]:
+    """Look up appointments one by one; deltas are small."""
+    found = {}
+    for appointment_id in appointment_ids:
+        appointment = repositories.appointment_repository.find_by_id(appointment_id)
+        if appointment is not None:
+            found[appointment_id] = appointment
+    return found
+
+
+def get_changes(since: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get the patient and appointment changes made after a sync token.
     
-    for appointment in appointments:
-        patient = patient_repository.find_by_id(appointment.patient_id)
-        result.append(appointment.to_dict(patient))
+    Each collection holds the records created or updated since the token
+    ('upserted') and the IDs deleted since then ('deleted'). When there
+    is no token, or the change log no longer reaches back to it, the
+    collection is a full snapshot instead ('snapshot': true) and the
+    client should replace its copy. Applying the same delta twice is
+    harmless.
     
-    return result
+    Args:
+        since: Token from the previous sync, or None for a first sync
+        
+    Returns:
+        Dictionary with 'version' (the token for the next sync),
+        'patients' and 'appointments'
+        
+    Raises:
+        ValidationError: If the token is malformed
+    """
+    patients_since, appointments_since = decode_sync_token(since) if since else (None, None)
+    patients_version, patients = _collection_changes(
+        repositories.patient_repository, patients_since,
+        repositories.patient_repository.find_by_ids)
+    appointments_version, appointments = _collection_changes(
+        repositories.appointment_repository, appointments_since, _find_appointments_by_ids)
+    return {
+        'version': encode_sync_token(patients_version, appointments_version),
+        'patients': patients,
+        'appointments': appointments
+    }
+
+
+def _iter_pages(repository, chunk_size: int) -> Iterator[list]:
+    """Yield successive keyset pages of a repository until it is exhausted."""
+    after_id = None
+    while True:
+        page = repository.get_page(chunk_size, after_id=after_id)
+        if not page:
+            return
+        yield page
+        after_id = page[-1].id
+
+
+def find_patient_duplicate_clusters(chunk_size: int = DEDUPE_CHUNK_SIZE) -> List[DuplicateCluster]:
+    """
+    Find every group of patients that are probably the same person.
+    
+    Reads the patients page by page and groups them by identity key in
+    one pass.
+    
+    Args:
+        chunk_size: Patients read per page
+        
+    Returns:
+        Clusters of two or more patients, ordered by their first patient's ID
+    """
+    pages = _iter_pages(repositories.patient_repository, chunk_size)
+    return find_duplicate_clusters(patient for page in pages for patient in page)
+
+
+def _iter_csv(header: List[str], row_chunks: Iterator[List[list]]) -> Iterator[str]:
+    """Encode a header and chunks of rows as CSV text, one string per chunk."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for rows in row_chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
 
+
+def iter_patients_csv(chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Stream all patients as CSV.
+    
+    Patients are read from the repository one page at a time, so memory
+    use stays flat regardless of the number of patients.
+    
+    Args:
+        chunk_size: Number of patients encoded per yielded chunk
+        
+    Returns:
+        Iterator of CSV text chunks, starting with the header row
+    """
+    rows = ([[p.id, p.name, p.age, p.phone, p.notes] for p in page]
+            for page in _iter_pages(repositories.patient_repository, chunk_size))
+    return _iter_csv(['ID', 'Name', 'Age', 'Phone', 'Notes'], rows)
+
+
+def iter_appointments_csv(chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Stream all appointments, joined with their patients, as CSV.
+    
+    Args:
+        chunk_size: Number of appointments encoded per yielded chunk
+        
+    Returns:
+        Iterator of CSV text chunks, starting with the header row
+    """
+    def rows():
+        for page in _iter_pages(repositories.appointment_repository, chunk_size):
+            patients = repositories.patient_repository.find_by_ids(apt.patient_id for apt in page)
+            chunk = []
+            for apt in page:
+                patient = patients.get(apt.patient_id)
+                if patient:
+                    chunk.append([apt.id, apt.date, apt.description, apt.patient_id,
+                                  patient.name, patient.age, patient.phone])
+                else:
+                    chunk.append([apt.id, apt.date, apt.description, apt.patient_id,
+                                  '', '', ''])
+            yield chunk
+    
+    return _iter_csv(['ID', 'Date', 'Description', 'Patient ID', 'Patient Name',
+                      'Patient Age', 'Patient Phone'], rows())
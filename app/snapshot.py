@@ -0,0 +1,224 @@
+"""
+Versioned binary snapshot format that is read by memory-mapping.
+Each table is stored column by column in 8-byte aligned sections, so a
+snapshot opens in constant time and rows are decoded only when read.
+Processes mapping the same file share its pages through the page cache.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import BinaryIO, Callable, Dict, Iterator, List, Sequence, Tuple
+
+SNAPSHOT_MAGIC = b'CLINSNAP'
+
+# Bumped whenever the layout changes; readers reject other versions
+SNAPSHOT_FORMAT_VERSION = 1
+
+# magic, format version, table count, log segment the snapshot continues
+# from, total file size
+_HEADER = struct.Struct('<8sIIQQ')
+# table name, field types ('i' int, 's' text), rows, ID high-water mark
+_TABLE = struct.Struct('<16s8sQQ')
+# column section offset; for text, also the offset and length of its bytes
+_COLUMN = struct.Struct('<QQQ')
+_ALIGNMENT = 8
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+
+class SnapshotFormatError(ValueError):
+    """A file is not a snapshot this version can read."""
+
+
+def is_snapshot(path: str) -> bool:
+    """
+    Check whether a file starts like a memory-mapped snapshot.
+
+    Args:
+        path: File to check
+
+    Returns:
+        True if the file has the snapshot magic number
+    """
+    with open(path, 'rb') as stream:
+        return stream.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+def _padding(size: int) -> bytes:
+    """Zero bytes that align a section ending at size."""
+    return bytes(-size % _ALIGNMENT)
+
+
+def _int_bytes(typecode: str, values) -> bytes:
+    """Little-endian bytes of an int array."""
+    column = array(typecode, values)
+    if _BIG_ENDIAN:
+        column.byteswap()
+    return column.tobytes()
+
+
+def write_snapshot(stream: BinaryIO, segment: int,
+                   tables: Dict[str, Tuple[str, int, Sequence[tuple]]]) -> None:
+    """
+    Write a snapshot to a seekable binary stream.
+
+    Args:
+        stream: File opened for writing at position 0
+        segment: First log segment holding writes made after the snapshot
+        tables: Table name -> (field types, ID high-water mark, rows); the
+                first field must be an int ID and rows must be sorted by it
+    """
+    directory_size = _HEADER.size + sum(_TABLE.size + _COLUMN.size * len(schema)
+                                        for schema, _, _ in tables.values())
+    stream.write(bytes(directory_size))
+    position = directory_size
+    entries = []
+    for name, (schema, high_water_mark, rows) in tables.items():
+        columns = []
+        for kind, column in zip(schema, zip(*rows) if rows else [()] * len(schema)):
+            if kind == 'i':
+                data, blob = _int_bytes('q', column), b''
+            else:
+                # Text fields such as Patient.age are sometimes given as numbers
+                encoded = [(value if type(value) is str else str(value))
+                           .encode('utf-8', 'surrogatepass') for value in column]
+                data = _int_bytes('Q', [0, *accumulate(map(len, encoded))])
+                blob = b''.join(encoded)
+            data += _padding(len(data))
+            blob_offset = position + len(data)
+            stream.write(data)
+            stream.write(blob)
+            stream.write(_padding(len(blob)))
+            columns.append((position, blob_offset if blob else 0, len(blob)))
+            position = blob_offset + len(blob) + len(_padding(len(blob)))
+        entries.append((name, schema, len(rows), high_water_mark, columns))
+
+    stream.seek(0)
+    stream.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, len(entries),
+                              segment, position))
+    for name, schema, count, high_water_mark, columns in entries:
+        stream.write(_TABLE.pack(name.encode('ascii'), schema.encode('ascii'), count,
+                                 high_water_mark))
+        for column in columns:
+            stream.write(_COLUMN.pack(*column))
+    stream.seek(position)
+
+
+def _text_column(offsets: memoryview, data: memoryview) -> Callable[[int], str]:
+    """Getter decoding one value of a text column."""
+    def get(index: int) -> str:
+        return str(data[offsets[index]:offsets[index + 1]], 'utf-8', 'surrogatepass')
+    return get
+
+
+class MappedTable:
+    """
+    Read-only rows of one snapshot table, decoded on access.
+
+    Rows are ordered by ID, the first field, so find() is a binary search
+    over the mapped ID column.
+    """
+
+    def __init__(self, view: memoryview, name: str, schema: str, rows: int,
+                 high_water_mark: int, columns: List[Tuple[int, int, int]]):
+        """
+        Wrap the sections of one table.
+
+        Args:
+            view: View of the whole mapped file
+            name: Table name
+            schema: Field types, 'i' for int and 's' for text
+            rows: Number of rows
+            high_water_mark: Largest ID handed out when the snapshot was taken
+            columns: (offset, text offset, text length) of each column
+        """
+        self.name = name
+        self.schema = schema
+        self.high_water_mark = high_water_mark
+        self._len = rows
+        self._getters: List[Callable[[int], object]] = []
+        for kind, (offset, blob_offset, blob_length) in zip(schema, columns):
+            if kind == 'i':
+                values = view[offset:offset + 8 * rows].cast('q')
+                self._getters.append(values.__getitem__)
+            else:
+                offsets = view[offset:offset + 8 * (rows + 1)].cast('Q')
+                data = view[blob_offset:blob_offset + blob_length]
+                self._getters.append(_text_column(offsets, data))
+        # Sorted IDs, usable with bisect
+        self.ids = view[columns[0][0]:columns[0][0] + 8 * rows].cast('q')
+
+    def __len__(self) -> int:
+        """Get the number of rows."""
+        return self._len
+
+    def find(self, record_id: int) -> int:
+        """
+        Locate a row by ID.
+
+        Args:
+            record_id: ID to look for
+
+        Returns:
+            Row index, or -1 if no row has the ID
+        """
+        index = bisect_left(self.ids, record_id)
+        if index < self._len and self.ids[index] == record_id:
+            return index
+        return -1
+
+    def row(self, index: int) -> tuple:
+        """Decode the fields of the row at an index."""
+        return tuple([get(index) for get in self._getters])
+
+    def rows(self) -> Iterator[tuple]:
+        """Decode every row, in ID order."""
+        for index in range(self._len):
+            yield self.row(index)
+
+
+class MappedSnapshot:
+    """A snapshot file mapped read-only into memory."""
+
+    def __init__(self, path: str):
+        """
+        Map a snapshot and read its table directory.
+
+        Args:
+            path: Snapshot file
+
+        Raises:
+            SnapshotFormatError: If the file is not a snapshot, is of an
+                                 unsupported version or is truncated
+        """
+        if _BIG_ENDIAN:
+            raise SnapshotFormatError("Mapped snapshots need a little-endian host")
+        with open(path, 'rb') as stream:
+            size = os.fstat(stream.fileno()).st_size
+            if size < _HEADER.size:
+                raise SnapshotFormatError(f"Not a snapshot: {path}")
+            # The mapping stays valid after the file is closed or replaced
+            self._mmap = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, version, count, segment, expected_size = _HEADER.unpack_from(view, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotFormatError(f"Not a snapshot: {path}")
+        if version != SNAPSHOT_FORMAT_VERSION:
+            raise SnapshotFormatError(f"Unsupported snapshot version {version}: {path}")
+        if size != expected_size:
+            raise SnapshotFormatError(f"Snapshot is {size} bytes, expected {expected_size}: {path}")
+        self.segment = segment
+        self.tables: Dict[str, MappedTable] = {}
+        position = _HEADER.size
+        for _ in range(count):
+            name, schema, rows, high_water_mark = _TABLE.unpack_from(view, position)
+            position += _TABLE.size
+            name, schema = name.rstrip(b'\0').decode('ascii'), schema.rstrip(b'\0').decode('ascii')
+            columns = [_COLUMN.unpack_from(view, position + _COLUMN.size * i)
+                       for i in range(len(schema))]
+            position += _COLUMN.size * len(schema)
+            self.tables[name] = MappedTable(view, name, schema, rows, high_water_mark, columns)
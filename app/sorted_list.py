@@ -0,0 +1,159 @@
+"""
+Sorted sequence for repository indexes.
+Stores values in bounded sorted sublists, so inserts and removals move
+at most a few thousand references instead of shifting one huge list.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Iterator, List, Optional
+
+
+class SortedList:
+    """
+    A sorted collection with O(log n) inserts and removals.
+
+    Values live in sublists of at most 2 * LOAD items. A parallel list of
+    each sublist's maximum locates the sublist for a value by bisection.
+    """
+
+    LOAD = 1000
+
+    def __init__(self):
+        """Initialize an empty list."""
+        self._lists: List[list] = []
+        self._maxes: list = []
+        self._len = 0
+
+    def __len__(self) -> int:
+        """Get the number of values."""
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        """Iterate over values in ascending order."""
+        for sublist in self._lists:
+            yield from sublist
+
+    def __reversed__(self) -> Iterator[Any]:
+        """Iterate over values in descending order."""
+        for sublist in reversed(self._lists):
+            yield from reversed(sublist)
+
+    def clear(self) -> None:
+        """Remove all values."""
+        self._lists.clear()
+        self._maxes.clear()
+        self._len = 0
+
+    def add(self, value: Any) -> None:
+        """
+        Insert a value, keeping the list sorted.
+
+        Args:
+            value: Value to insert
+        """
+        if not self._maxes:
+            self._lists.append([value])
+            self._maxes.append(value)
+        else:
+            pos = bisect_right(self._maxes, value)
+            if pos == len(self._maxes):
+                # Larger than everything: the common case for increasing ids
+                pos -= 1
+                self._lists[pos].append(value)
+                self._maxes[pos] = value
+            else:
+                insort(self._lists[pos], value)
+            sublist = self._lists[pos]
+            if len(sublist) > 2 * self.LOAD:
+                half = sublist[self.LOAD:]
+                del sublist[self.LOAD:]
+                self._maxes[pos] = sublist[-1]
+                self._lists.insert(pos + 1, half)
+                self._maxes.insert(pos + 1, half[-1])
+        self._len += 1
+
+    def discard(self, value: Any) -> bool:
+        """
+        Remove a value if present.
+
+        Args:
+            value: Value to remove
+
+        Returns:
+            True if the value was removed, False if it was not present
+        """
+        pos = bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            return False
+        sublist = self._lists[pos]
+        index = bisect_left(sublist, value)
+        if sublist[index] != value:
+            return False
+        del sublist[index]
+        self._len -= 1
+        if not sublist:
+            del self._lists[pos]
+            del self._maxes[pos]
+        elif index == len(sublist):
+            self._maxes[pos] = sublist[-1]
+        return True
+
+    def irange(self, minimum: Optional[Any] = None, maximum: Optional[Any] = None,
+               exclusive_minimum: bool = False) -> Iterator[Any]:
+        """
+        Iterate over values between two bounds in ascending order.
+
+        Args:
+            minimum: Lowest value to include, or None for no lower bound
+            maximum: Highest value to include, or None for no upper bound
+            exclusive_minimum: If True, skip values equal to minimum
+
+        Returns:
+            Iterator over the matching values
+        """
+        if minimum is None:
+            pos, index = 0, 0
+        else:
+            find = bisect_right if exclusive_minimum else bisect_left
+            pos = find(self._maxes, minimum)
+            if pos == len(self._maxes):
+                return
+            index = find(self._lists[pos], minimum)
+        for sublist in self._lists[pos:]:
+            for i in range(index, len(sublist)):
+                value = sublist[i]
+                if maximum is not None and value > maximum:
+                    return
+                yield value
+            index = 0
+
+    def islice_after(self, minimum: Optional[Any], offset: int, limit: int) -> List[Any]:
+        """
+        Get a window of values, skipping whole sublists where possible.
+
+        Args:
+            minimum: Only consider values greater than this, or None for all
+            offset: Number of qualifying values to skip
+            limit: Maximum number of values to return
+
+        Returns:
+            List of at most limit values in ascending order
+        """
+        if minimum is None:
+            pos, index = 0, 0
+        else:
+            pos = bisect_right(self._maxes, minimum)
+            if pos == len(self._maxes):
+                return []
+            index = bisect_right(self._lists[pos], minimum)
+        index += offset
+        # Skip sublists entirely covered by the offset
+        while pos < len(self._lists) and index >= len(self._lists[pos]):
+            index -= len(self._lists[pos])
+            pos += 1
+        result: List[Any] = []
+        while pos < len(self._lists) and len(result) < limit:
+            sublist = self._lists[pos]
+            result.extend(sublist[index:index + limit - len(result)])
+            pos, index = pos + 1, 0
+        return result
@@ -0,0 +1,698 @@
+"""
+SQLite-backed repository implementations.
+Provide the same interface as the in-memory repositories, but persist
+data to a database file shared by all worker processes.
+"""
+
+import json
+import sqlite3
+from bisect import bisect_left
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Dict, Iterable, Iterator, Set, Tuple
+from app.changelog import CHANGE_LOG_SIZE, Change
+from app.models import Patient, Appointment
+from app.patient_index import (
+    FUZZY_MIN_LENGTH, MAX_CANDIDATES, identity_key, normalize_name, normalize_phone,
+    phone_query, rank_matches, similar_words, trigram_index
+)
+from app.repositories import SEARCH_MODES
+from app.text_index import tokenize
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    age TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    notes TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_patients_phone ON patients (phone);
+-- Phone digits and their last four, for phone search; phone_digits and
+-- name_key are registered on every connection, so only this module can
+-- write the table
+CREATE INDEX IF NOT EXISTS idx_patients_phone_digits ON patients (phone_digits(phone), id);
+CREATE INDEX IF NOT EXISTS idx_patients_phone_suffix ON patients (substr(phone_digits(phone), -4), id);
+-- Identity key (phone digits, normalized name) for duplicate checks
+CREATE INDEX IF NOT EXISTS idx_patients_identity ON patients (phone_digits(phone), name_key(name), id);
+
+-- Full-text index over names for prefix search, kept in sync by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5 (
+    name,
+    content='patients',
+    content_rowid='id',
+    tokenize="unicode61 remove_diacritics 0 tokenchars '_'",
+    prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS patients_fts_insert AFTER INSERT ON patients BEGIN
+    INSERT INTO patients_fts (rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS patients_fts_delete AFTER DELETE ON patients BEGIN
+    INSERT INTO patients_fts (patients_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS patients_fts_update AFTER UPDATE OF name ON patients BEGIN
+    INSERT INTO patients_fts (patients_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    INSERT INTO patients_fts (rowid, name) VALUES (new.id, new.name);
+END;
+-- Distinct name words, for fuzzy matching
+CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts_words USING fts5vocab (patients_fts, 'row');
+
+CREATE TABLE IF NOT EXISTS appointments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_appointments_patient ON appointments (patient_id, id);
+CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments (date, id);
+
+-- Full-text index over descriptions, kept in sync by triggers.
+-- tokenchars '_' matches the \\w+ tokens of the in-memory index.
+CREATE VIRTUAL TABLE IF NOT EXISTS appointments_fts USING fts5 (
+    description,
+    content='appointments',
+    content_rowid='id',
+    tokenize="unicode61 remove_diacritics 0 tokenchars '_'"
+);
+CREATE TRIGGER IF NOT EXISTS appointments_fts_insert AFTER INSERT ON appointments BEGIN
+    INSERT INTO appointments_fts (rowid, description) VALUES (new.id, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS appointments_fts_delete AFTER DELETE ON appointments BEGIN
+    INSERT INTO appointments_fts (appointments_fts, rowid, description)
+    VALUES ('delete', old.id, old.description);
+END;
+
+-- Per-table version, bumped in the same transaction as every write, so
+-- all processes sharing the file see when a table has changed
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    -- Every change after this version is still in the table's change log
+    log_floor INTEGER NOT NULL
+);
+
+-- Bounded change logs, one per versioned table. seq has no gaps below the
+-- newest entry, so trimming to a size is a range delete on the primary key.
+CREATE TABLE IF NOT EXISTS patients_changes (
+    seq INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    op TEXT NOT NULL,
+    record_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_patients_changes_version ON patients_changes (version);
+CREATE TABLE IF NOT EXISTS appointments_changes (
+    seq INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    op TEXT NOT NULL,
+    record_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_appointments_changes_version ON appointments_changes (version);
+"""
+
+# Tables whose writes are counted in table_versions and logged in <table>_changes
+VERSIONED_TABLES = ('patients', 'appointments')
+
+PATIENT_COLUMNS = 'id, name, age, phone, notes'
+QUALIFIED_PATIENT_COLUMNS = 'p.id, p.name, p.age, p.phone, p.notes'
+APPOINTMENT_COLUMNS = 'a.id, a.patient_id, a.date, a.description'
+
+# Statement cache size per connection; every query below is a fixed
+# string, so repeated calls reuse the compiled statement
+STATEMENT_CACHE_SIZE = 256
+
+
+def _patient_from_row(row) -> Patient:
+    """Build a Patient from a (id, name, age, phone, notes) row."""
+    return Patient(patient_id=row[0], name=row[1], age=row[2], phone=row[3], notes=row[4])
+
+
+def _appointment_from_row(row) -> Appointment:
+    """Build an Appointment from a (id, patient_id, date, description) row."""
+    return Appointment(appointment_id=row[0], patient_id=row[1], date=row[2], description=row[3])
+
+
+class SqliteDatabase:
+    """
+    A SQLite database file with a per-thread connection pool.
+
+    Each thread lazily opens one connection and reuses it for all later
+    calls, so statements cached on that connection stay warm.
+    """
+
+    def __init__(self, path: str, change_log_size: int = CHANGE_LOG_SIZE):
+        """
+        Open the database and create the schema if needed.
+
+        Args:
+            path: Path to the database file
+            change_log_size: Number of recent changes kept per table
+
+        Raises:
+            ValueError: If change_log_size is less than 1
+        """
+        if change_log_size < 1:
+            raise ValueError("change_log_size must be at least 1")
+        self.path = path
+        self.change_log_size = change_log_size
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self.connection().executescript(SCHEMA)
+        # Versions start at the clock in nanoseconds, so two database files
+        # (or a recreated one) do not report the same versions
+        now = time.time_ns()
+        with self.transaction() as connection:
+            connection.executemany(
+                'INSERT OR IGNORE INTO table_versions (name, version, log_floor) VALUES (?, ?, ?)',
+                [(table, now, now) for table in VERSIONED_TABLES])
+
+    def connection(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, opening it on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False,
+                                         cached_statements=STATEMENT_CACHE_SIZE)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA busy_timeout=5000')
+            # Python's str.lower, so substring search matches the in-memory engine
+            connection.create_function('py_lower', 1, str.lower, deterministic=True)
+            connection.create_function('phone_digits', 1, normalize_phone, deterministic=True)
+            connection.create_function('name_key', 1, normalize_name, deterministic=True)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block in a transaction that commits on success and rolls back on error."""
+        connection = self.connection()
+        with connection:
+            yield connection
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def _allocate_ids(database: SqliteDatabase, table: str, count: int) -> range:
+    """
+    Reserve a block of IDs by advancing a table's AUTOINCREMENT counter.
+
+    The counter lives in sqlite_sequence, so the reservation is shared
+    with every process using the file and survives restarts.
+
+    Args:
+        database: Database holding the table
+        table: Table name
+        count: Number of IDs to reserve
+
+    Returns:
+        Range of the reserved IDs
+
+    Raises:
+        ValueError: If count is negative
+    """
+    if count < 0:
+        raise ValueError("count must not be negative")
+    with database.transaction() as connection:
+        return _reserve_ids(connection, table, count)
+
+
+def _reserve_ids(connection: sqlite3.Connection, table: str, count: int) -> range:
+    """
+    Advance a table's AUTOINCREMENT counter inside the caller's transaction.
+
+    Args:
+        connection: Connection holding the transaction
+        table: Table name
+        count: Number of IDs to reserve
+
+    Returns:
+        Range of the reserved IDs
+    """
+    # Writing first takes the write lock, so concurrent callers serialize
+    connection.execute(
+        'INSERT INTO sqlite_sequence (name, seq) SELECT ?, 0 '
+        'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)', (table, table))
+    connection.execute('UPDATE sqlite_sequence SET seq = seq + ? WHERE name = ?',
+                       (count, table))
+    end = connection.execute('SELECT seq FROM sqlite_sequence WHERE name = ?',
+                             (table,)).fetchone()[0]
+    return range(end - count + 1, end + 1)
+
+
+def _record_changes(connection: sqlite3.Connection, database: SqliteDatabase, table: str,
+                    op: str, record_ids: Iterable[int]) -> None:
+    """
+    Bump a table's version and log the records a write touched.
+
+    Runs inside the caller's write transaction, so the version, the log
+    and the data always agree. The log is trimmed to the database's
+    change_log_size; the newest dropped entry becomes the log floor.
+
+    Args:
+        connection: Connection holding the write transaction
+        database: Database the table belongs to
+        table: One of VERSIONED_TABLES
+        op: One of CHANGE_OPS
+        record_ids: IDs of the created, updated or deleted records
+    """
+    version = connection.execute(
+        'UPDATE table_versions SET version = version + 1 WHERE name = ? RETURNING version',
+        (table,)).fetchall()[0][0]
+    insert = f'INSERT INTO {table}_changes (version, op, record_id) VALUES (?, ?, ?)'
+    record_ids = list(record_ids)
+    if len(record_ids) == 1:
+        last = connection.execute(insert, (version, op, record_ids[0])).lastrowid
+    else:
+        connection.executemany(insert, [(version, op, record_id) for record_id in record_ids])
+        last = connection.execute(f'SELECT MAX(seq) FROM {table}_changes').fetchone()[0] or 0
+    cutoff = last - database.change_log_size
+    if cutoff > 0:
+        dropped = connection.execute(
+            f'DELETE FROM {table}_changes WHERE seq <= ? RETURNING version', (cutoff,)).fetchall()
+        if dropped:
+            connection.execute('UPDATE table_versions SET log_floor = ? WHERE name = ?',
+                               (max(row[0] for row in dropped), table))
+
+
+def _reset_changes(connection: sqlite3.Connection, table: str) -> None:
+    """Bump a table's version and empty its log, after every row was deleted."""
+    connection.execute(f'DELETE FROM {table}_changes')
+    connection.execute('UPDATE table_versions SET version = version + 1, log_floor = version + 1 '
+                       'WHERE name = ?', (table,))
+
+
+def _changes_since(database: SqliteDatabase, table: str, version: int) -> Optional[List[Change]]:
+    """Get a table's logged changes after a version, or None if the log no longer reaches back."""
+    with database.transaction() as connection:
+        # One read snapshot for the bounds and the entries
+        connection.execute('BEGIN')
+        current, floor = connection.execute(
+            'SELECT version, log_floor FROM table_versions WHERE name = ?', (table,)).fetchone()
+        if version < floor or version > current:
+            return None
+        rows = connection.execute(
+            f'SELECT version, op, record_id FROM {table}_changes WHERE version > ? '
+            'ORDER BY version, seq', (version,))
+        return [Change(*row) for row in rows]
+
+
+def _read_version(database: SqliteDatabase, table: str) -> int:
+    """Get a table's current version."""
+    return database.connection().execute(
+        'SELECT version FROM table_versions WHERE name = ?', (table,)).fetchone()[0]
+
+
+class SqlitePatientRepository:
+    """Repository for patient data operations backed by SQLite."""
+
+    def __init__(self, database: SqliteDatabase):
+        """
+        Initialize the repository.
+
+        Args:
+            database: Database holding the patients table
+        """
+        self._db = database
+        # (table version, sorted name words, their trigram index) for fuzzy search
+        self._vocabulary: Optional[Tuple[int, List[str], Dict[str, Set[str]]]] = None
+
+    def create(self, name: str, age: str, phone: str, notes: str = '') -> Patient:
+        """Create a new patient record."""
+        with self._db.transaction() as connection:
+            cursor = connection.execute(
+                'INSERT INTO patients (name, age, phone, notes) VALUES (?, ?, ?, ?)',
+                (name, age, phone, notes))
+            _record_changes(connection, self._db, 'patients', 'create', (cursor.lastrowid,))
+        return Patient(patient_id=cursor.lastrowid, name=name, age=age, phone=phone, notes=notes)
+
+    def create_many(self, records: Iterable[Tuple[str, str, str, str]]) -> List[Patient]:
+        """Create many patients from (name, age, phone, notes) tuples in one transaction."""
+        records = list(records)
+        if not records:
+            # Nothing changed: keep the version, and so the caches, as they are
+            return []
+        with self._db.transaction() as connection:
+            # IDs are reserved in the same transaction, so a failed insert
+            # rolls back the reservation with the rows
+            connection.execute('BEGIN IMMEDIATE')
+            ids = _reserve_ids(connection, 'patients', len(records))
+            patients = [Patient(patient_id, name, age, phone, notes)
+                        for patient_id, (name, age, phone, notes) in zip(ids, records)]
+            connection.executemany(
+                'INSERT INTO patients (id, name, age, phone, notes) VALUES (?, ?, ?, ?, ?)',
+                [(p.id, p.name, p.age, p.phone, p.notes) for p in patients])
+            _record_changes(connection, self._db, 'patients', 'create', ids)
+        return patients
+
+    def find_by_id(self, patient_id: int) -> Optional[Patient]:
+        """Find a patient by ID."""
+        row = self._db.connection().execute(
+            f'SELECT {PATIENT_COLUMNS} FROM patients WHERE id = ?', (patient_id,)).fetchone()
+        return _patient_from_row(row) if row else None
+
+    def find_by_ids(self, patient_ids: Iterable[int]) -> Dict[int, Patient]:
+        """Find many patients in one query."""
+        rows = self._db.connection().execute(
+            f'SELECT {PATIENT_COLUMNS} FROM patients '
+            'WHERE id IN (SELECT value FROM json_each(?))',
+            (json.dumps(list(set(patient_ids))),))
+        return {row[0]: _patient_from_row(row) for row in rows}
+
+    def get_all(self) -> List[Patient]:
+        """Get all patients, ordered by ID."""
+        rows = self._db.connection().execute(
+            f'SELECT {PATIENT_COLUMNS} FROM patients ORDER BY id')
+        return [_patient_from_row(row) for row in rows]
+
+    def get_page(self, limit: int, offset: int = 0,
+                 after_id: Optional[int] = None) -> List[Patient]:
+        """Get one page of patients ordered by ID."""
+        rows = self._db.connection().execute(
+            f'SELECT {PATIENT_COLUMNS} FROM patients WHERE id > ? '
+            'ORDER BY id LIMIT ? OFFSET ?',
+            (after_id if after_id is not None else 0, limit, offset))
+        return [_patient_from_row(row) for row in rows]
+
+    def get_recent(self, limit: int) -> List[Patient]:
+        """Get the most recently created patients, newest first."""
+        rows = self._db.connection().execute(
+            f'SELECT {PATIENT_COLUMNS} FROM patients ORDER BY id DESC LIMIT ?',
+            (max(limit, 0),))
+        return [_patient_from_row(row) for row in rows]
+
+    def update(self, patient_id: int, name: Optional[str] = None,
+               age: Optional[str] = None, phone: Optional[str] = None,
+               notes: Optional[str] = None) -> Optional[Patient]:
+        """Update a patient's information; None leaves a field unchanged."""
+        with self._db.transaction() as connection:
+            cursor = connection.execute(
+                'UPDATE patients SET name = COALESCE(?, name), age = COALESCE(?, age), '
+                'phone = COALESCE(?, phone), notes = COALESCE(?, notes) WHERE id = ?',
+                (name, age, phone, notes, patient_id))
+            if cursor.rowcount:
+                _record_changes(connection, self._db, 'patients', 'update', (patient_id,))
+        if cursor.rowcount == 0:
+            return None
+        return self.find_by_id(patient_id)
+
+    def delete(self, patient_id: int) -> bool:
+        """Delete a patient by ID."""
+        with self._db.transaction() as connection:
+            cursor = connection.execute('DELETE FROM patients WHERE id = ?', (patient_id,))
+            if cursor.rowcount:
+                _record_changes(connection, self._db, 'patients', 'delete', (patient_id,))
+        return cursor.rowcount > 0
+
+    def search(self, query: str, limit: int = 10) -> List[Patient]:
+        """
+        Find patients by partial name or phone number, for typeahead.
+
+        Matches like PatientRepository.search. Phone queries use the
+        phone digit indexes, name prefixes the patients_fts table, and
+        fuzzy matches look the query words up in a trigram index of the
+        distinct words of patients_fts_words, cached until the table changes.
+        """
+        if limit <= 0:
+            return []
+        connection = self._db.connection()
+        digits = phone_query(query)
+        if digits:
+            rows = connection.execute(
+                f'SELECT {PATIENT_COLUMNS} FROM patients WHERE phone_digits(phone) = ? '
+                'ORDER BY id LIMIT ?', (digits, limit)).fetchall()
+            if len(rows) < limit:
+                rows += connection.execute(
+                    f'SELECT {PATIENT_COLUMNS} FROM patients '
+                    'WHERE substr(phone_digits(phone), -4) = ? AND phone_digits(phone) != ? '
+                    'AND substr(phone_digits(phone), ?) = ? ORDER BY id LIMIT ?',
+                    (digits[-4:], digits, -len(digits), digits, limit - len(rows))).fetchall()
+            return [_patient_from_row(row) for row in rows]
+
+        words = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not words:
+            return []
+        rows = connection.execute(
+            f'SELECT {QUALIFIED_PATIENT_COLUMNS} FROM patients_fts JOIN patients p ON p.id = patients_fts.rowid '
+            'WHERE patients_fts MATCH ? ORDER BY patients_fts.rank, p.id LIMIT ?',
+            (' '.join(f'"{word}"*' for word in words), limit)).fetchall()
+        if len(rows) < limit and any(len(word) >= FUZZY_MIN_LENGTH for word in words):
+            rows += self._search_fuzzy(words, {row[0] for row in rows}, limit - len(rows))
+        return [_patient_from_row(row) for row in rows]
+
+    def _fuzzy_vocabulary(self) -> Tuple[List[str], Dict[str, Set[str]]]:
+        """
+        Get the sorted distinct name words and their trigram index.
+
+        Rebuilt only when the patients table's version changes, so
+        typeahead searches between writes do not rescan every word.
+        """
+        # Read the version first: a write landing before the scan below
+        # only makes the next search rebuild again
+        version = self.version
+        cached = self._vocabulary
+        if cached is None or cached[0] != version:
+            terms = sorted(row[0] for row in self._db.connection().execute(
+                'SELECT term FROM patients_fts_words'))
+            cached = (version, terms,
+                      trigram_index(term for term in terms if not term.isdigit()))
+            self._vocabulary = cached
+        return cached[1], cached[2]
+
+    def _search_fuzzy(self, words: List[str], exclude: set, limit: int) -> list:
+        """Rows of patients matching every query word by prefix or trigram similarity."""
+        connection = self._db.connection()
+        terms, by_trigram = self._fuzzy_vocabulary()
+        matches = []
+        for word in words:
+            scores = similar_words(word, by_trigram) if len(word) >= FUZZY_MIN_LENGTH else {}
+            position = bisect_left(terms, word)
+            while position < len(terms) and terms[position].startswith(word):
+                scores[terms[position]] = 1.0
+                position += 1
+            if not scores:
+                return []
+            matches.append(scores)
+        # Each query word must match one of its terms; FTS5 ANDs the groups
+        expression = ' AND '.join(
+            '(' + ' OR '.join(f'"{term}"' for term in scores) + ')' for scores in matches)
+        rows = {row[0]: row for row in connection.execute(
+            f'SELECT {QUALIFIED_PATIENT_COLUMNS} FROM patients_fts JOIN patients p ON p.id = patients_fts.rowid '
+            'WHERE patients_fts MATCH ? LIMIT ?', (expression, MAX_CANDIDATES))
+            if row[0] not in exclude}
+        ranked = rank_matches(((patient_id, row[1]) for patient_id, row in rows.items()), matches)
+        return [rows[patient_id] for patient_id in ranked[:limit]]
+
+    def find_duplicates(self, name: str, phone: str) -> List[Patient]:
+        """Find patients with the same phone digits and normalized name, ordered by ID."""
+        rows = self._db.connection().execute(
+            f'SELECT {PATIENT_COLUMNS} FROM patients '
+            'WHERE phone_digits(phone) = ? AND name_key(name) = ? ORDER BY id',
+            identity_key(name, phone))
+        return [_patient_from_row(row) for row in rows]
+
+    def allocate_ids(self, count: int) -> range:
+        """
+        Reserve a block of patient IDs for a bulk insert.
+
+        Args:
+            count: Number of IDs to reserve
+
+        Returns:
+            Range of IDs no other record will be given
+        """
+        return _allocate_ids(self._db, 'patients', count)
+
+    def count(self) -> int:
+        """Get total number of patients."""
+        return self._db.connection().execute('SELECT COUNT(*) FROM patients').fetchone()[0]
+
+    @property
+    def version(self) -> int:
+        """Number that changes whenever the patients table changes."""
+        return _read_version(self._db, 'patients')
+
+    def changes_since(self, version: int) -> Optional[List[Change]]:
+        """Get the patient changes made after a version, or None if the log no longer reaches back."""
+        return _changes_since(self._db, 'patients', version)
+
+    def clear(self) -> None:
+        """Remove all patients; the ID sequence keeps counting."""
+        with self._db.transaction() as connection:
+            connection.execute('DELETE FROM patients')
+            _reset_changes(connection, 'patients')
+
+
+class SqliteAppointmentRepository:
+    """Repository for appointment data operations backed by SQLite."""
+
+    def __init__(self, database: SqliteDatabase):
+        """
+        Initialize the repository.
+
+        Args:
+            database: Database holding the appointments table
+        """
+        self._db = database
+
+    def _select(self, where: str = '', params: tuple = ()) -> List[Appointment]:
+        """Run a SELECT over appointments and build model objects."""
+        rows = self._db.connection().execute(
+            f'SELECT {APPOINTMENT_COLUMNS} FROM appointments a {where}', params)
+        return [_appointment_from_row(row) for row in rows]
+
+    def create(self, patient_id: int, date: str, description: str) -> Appointment:
+        """Create a new appointment."""
+        with self._db.transaction() as connection:
+            cursor = connection.execute(
+                'INSERT INTO appointments (patient_id, date, description) VALUES (?, ?, ?)',
+                (patient_id, date, description))
+            _record_changes(connection, self._db, 'appointments', 'create', (cursor.lastrowid,))
+        return Appointment(appointment_id=cursor.lastrowid, patient_id=patient_id,
+                           date=date, description=description)
+
+    def create_many(self, records: Iterable[Tuple[int, str, str]]) -> List[Appointment]:
+        """Create many appointments from (patient_id, date, description) tuples in one transaction."""
+        records = list(records)
+        if not records:
+            return []
+        with self._db.transaction() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            ids = _reserve_ids(connection, 'appointments', len(records))
+            appointments = [Appointment(appointment_id, patient_id, date, description)
+                            for appointment_id, (patient_id, date, description)
+                            in zip(ids, records)]
+            connection.executemany(
+                'INSERT INTO appointments (id, patient_id, date, description) VALUES (?, ?, ?, ?)',
+                [(a.id, a.patient_id, a.date, a.description) for a in appointments])
+            _record_changes(connection, self._db, 'appointments', 'create', ids)
+        return appointments
+
+    def find_by_id(self, appointment_id: int) -> Optional[Appointment]:
+        """Find an appointment by ID."""
+        found = self._select('WHERE a.id = ?', (appointment_id,))
+        return found[0] if found else None
+
+    def get_all(self) -> List[Appointment]:
+        """Get all appointments, ordered by ID."""
+        return self._select('ORDER BY a.id')
+
+    def get_page(self, limit: int, offset: int = 0,
+                 after_id: Optional[int] = None) -> List[Appointment]:
+        """Get one page of appointments ordered by ID."""
+        return self._select('WHERE a.id > ? ORDER BY a.id LIMIT ? OFFSET ?',
+                            (after_id if after_id is not None else 0, limit, offset))
+
+    def get_recent(self, limit: int) -> List[Appointment]:
+        """Get the most recently created appointments, newest first."""
+        return self._select('ORDER BY a.id DESC LIMIT ?', (max(limit, 0),))
+
+    def find_by_patient_id(self, patient_id: int) -> List[Appointment]:
+        """Find all appointments for a specific patient."""
+        return self._select('WHERE a.patient_id = ? ORDER BY a.id', (patient_id,))
+
+    def delete_by_patient_id(self, patient_id: int) -> int:
+        """Delete all appointments for a specific patient."""
+        with self._db.transaction() as connection:
+            doomed = [row[0] for row in connection.execute(
+                'DELETE FROM appointments WHERE patient_id = ? RETURNING id', (patient_id,))]
+            if doomed:
+                _record_changes(connection, self._db, 'appointments', 'delete', doomed)
+        return len(doomed)
+
+    def find_by_date_range(self, date_from: Optional[str] = None,
+                           date_to: Optional[str] = None) -> List[Appointment]:
+        """Find appointments within an inclusive date range, ordered by date."""
+        return self.search(date_from=date_from, date_to=date_to)
+
+    def search(self, query: Optional[str] = None,
+               patient_id: Optional[int] = None,
+               date: Optional[str] = None,
+               date_from: Optional[str] = None,
+               date_to: Optional[str] = None,
+               match: str = 'prefix') -> List[Appointment]:
+        """
+        Search appointments by various criteria.
+
+        Accepts the same arguments as AppointmentRepository.search. Indexed
+        'term' and 'prefix' queries use the FTS5 table and are ordered by
+        bm25 relevance.
+        """
+        if match not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {match}")
+        if date:
+            date_from = max(date, date_from) if date_from else date
+            date_to = min(date, date_to) if date_to else date
+
+        clauses, params = [], []
+        if patient_id is not None:
+            clauses.append('a.patient_id = ?')
+            params.append(patient_id)
+        if date_from:
+            clauses.append('a.date >= ?')
+            params.append(date_from)
+        if date_to:
+            clauses.append('a.date <= ?')
+            params.append(date_to)
+
+        tokens = tokenize(query) if query else []
+        if tokens and match != 'substring':
+            suffix = '*' if match == 'prefix' else ''
+            # Space-separated phrases are ANDed by FTS5
+            expression = ' '.join(f'"{token}"{suffix}' for token in tokens)
+            where = ' AND '.join(['appointments_fts MATCH ?'] + clauses)
+            rows = self._db.connection().execute(
+                f'SELECT {APPOINTMENT_COLUMNS} FROM appointments_fts '
+                f'JOIN appointments a ON a.id = appointments_fts.rowid '
+                f'WHERE {where} ORDER BY appointments_fts.rank, a.id',
+                [expression] + params)
+            return [_appointment_from_row(row) for row in rows]
+
+        if query:
+            clauses.append('instr(py_lower(a.description), ?) > 0')
+            params.append(query.lower())
+        where = f'WHERE {" AND ".join(clauses)}' if clauses else ''
+        if patient_id is None and (date_from or date_to):
+            order = 'ORDER BY a.date, a.id'
+        else:
+            order = 'ORDER BY a.id'
+        return self._select(f'{where} {order}', tuple(params))
+
+    def allocate_ids(self, count: int) -> range:
+        """
+        Reserve a block of appointment IDs for a bulk insert.
+
+        Args:
+            count: Number of IDs to reserve
+
+        Returns:
+            Range of IDs no other record will be given
+        """
+        return _allocate_ids(self._db, 'appointments', count)
+
+    def count(self) -> int:
+        """Get total number of appointments."""
+        return self._db.connection().execute('SELECT COUNT(*) FROM appointments').fetchone()[0]
+
+    @property
+    def version(self) -> int:
+        """Number that changes whenever the appointments table changes."""
+        return _read_version(self._db, 'appointments')
+
+    def changes_since(self, version: int) -> Optional[List[Change]]:
+        """Get the appointment changes made after a version, or None if the log no longer reaches back."""
+        return _changes_since(self._db, 'appointments', version)
+
+    def clear(self) -> None:
+        """Remove all appointments; the ID sequence keeps counting."""
+        with self._db.transaction() as connection:
+            connection.execute('DELETE FROM appointments')
+            _reset_changes(connection, 'appointments')
@@ -0,0 +1,141 @@
+"""
+Inverted full-text index for searching free-text fields.
+Maps each token to the documents containing it so searches touch only
+the matching postings instead of every stored description.
+"""
+
+import math
+import re
+from bisect import bisect_left, insort
+from typing import Dict, List
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase word tokens.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens in order of appearance
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class InvertedIndex:
+    """Token -> document index supporting ranked term and prefix queries."""
+
+    def __init__(self):
+        """Initialize an empty index."""
+        # term -> {doc_id: term frequency}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # Sorted vocabulary, used to expand prefixes with bisect
+        self._terms: List[str] = []
+        self._doc_count: int = 0
+
+    def add(self, doc_id: int, text: str) -> None:
+        """
+        Index a document.
+
+        Args:
+            doc_id: Identifier of the document
+            text: Text to index
+        """
+        # A plain dict: Counter() spends most of its time on ABC isinstance checks
+        frequencies: Dict[str, int] = {}
+        for term in tokenize(text):
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._terms, term)
+            postings[doc_id] = frequency
+        self._doc_count += 1
+
+    def remove(self, doc_id: int, text: str) -> None:
+        """
+        Remove a document from the index.
+
+        Args:
+            doc_id: Identifier of the document
+            text: Text the document was indexed with
+        """
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+        self._doc_count -= 1
+
+    def clear(self) -> None:
+        """Remove all documents from the index."""
+        self._postings.clear()
+        self._terms.clear()
+        self._doc_count = 0
+
+    def _expand(self, token: str, prefix: bool) -> List[str]:
+        """Return the indexed terms matching a query token."""
+        if not prefix:
+            return [token] if token in self._postings else []
+        terms = []
+        for i in range(bisect_left(self._terms, token), len(self._terms)):
+            term = self._terms[i]
+            if not term.startswith(token):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, query: str, prefix: bool = False) -> List[int]:
+        """
+        Find documents containing every token of a query.
+
+        Documents are ranked by the sum of tf-idf weights of the matched
+        terms, with ties broken by ascending document id.
+
+        Args:
+            query: Query text
+            prefix: If True, each query token also matches longer terms
+                    starting with it
+
+        Returns:
+            List of matching document ids, best match first
+        """
+        # For each token, the (postings, idf) pairs of the terms it matches
+        per_token = []
+        for token in set(tokenize(query)):
+            matches = []
+            for term in self._expand(token, prefix):
+                postings = self._postings[term]
+                matches.append((postings, math.log(1 + self._doc_count / len(postings))))
+            if not matches:
+                return []
+            per_token.append(matches)
+        if not per_token:
+            return []
+
+        # Score the most selective token in full, then only probe the
+        # surviving candidates in the remaining tokens' postings
+        per_token.sort(key=lambda matches: sum(len(postings) for postings, _ in matches))
+        ranked: Dict[int, float] = {}
+        for postings, idf in per_token[0]:
+            for doc_id, frequency in postings.items():
+                ranked[doc_id] = ranked.get(doc_id, 0.0) + frequency * idf
+        for matches in per_token[1:]:
+            narrowed = {}
+            for doc_id, score in ranked.items():
+                extra = 0.0
+                for postings, idf in matches:
+                    frequency = postings.get(doc_id)
+                    if frequency:
+                        extra += frequency * idf
+                if extra:
+                    narrowed[doc_id] = score + extra
+            ranked = narrowed
+        return sorted(ranked, key=lambda doc_id: (-ranked[doc_id], doc_id))
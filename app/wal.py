@@ -0,0 +1,553 @@
+"""
+Write-ahead log and snapshots for the in-memory repositories.
+Every write is appended to a binary log before the caller returns, so
+the repositories can be rebuilt after a restart or crash by mapping the
+latest snapshot (see app.snapshot) and replaying the log written since.
+"""
+
+import atexit
+import functools
+import logging
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from contextlib import ExitStack
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.snapshot import MappedSnapshot, is_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# How appended entries are made durable before a write returns:
+# 'always' fsyncs (writers waiting together share one fsync), 'interval'
+# fsyncs in the background every WAL_FSYNC_INTERVAL seconds, so a crash
+# loses at most that much, and 'never' leaves flushing to the OS
+FSYNC_POLICIES = ('always', 'interval', 'never')
+DEFAULT_FSYNC_POLICY = 'always'
+WAL_FSYNC_INTERVAL = 0.1
+
+# A snapshot is taken once this many entries were logged since the last one
+SNAPSHOT_EVERY = 100_000
+
+SNAPSHOT_NAME = 'snapshot.bin'
+_SEGMENT_PREFIX = 'wal-'
+_SEGMENT_SUFFIX = '.log'
+
+# Frame header: payload length and CRC-32 of the payload
+_HEADER = struct.Struct('<II')
+_COUNT = struct.Struct('<I')
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+# (table, op) -> field types of each row: 'i' for int, 's' for str. The
+# position in this list is the entry's type byte, so only append to it.
+ENTRY_KINDS: List[Tuple[Tuple[str, str], str]] = [
+    # Heads snapshots in the framed format used before app.snapshot
+    (('snapshot', 'segment'), 'i'),
+    (('patients', 'create'), 'issss'),
+    (('patients', 'update'), 'issss'),
+    (('patients', 'delete'), 'i'),
+    (('patients', 'clear'), ''),
+    (('patients', 'reserve'), 'i'),
+    (('appointments', 'create'), 'iiss'),
+    (('appointments', 'delete_by_patient'), 'i'),
+    (('appointments', 'clear'), ''),
+    (('appointments', 'reserve'), 'i'),
+]
+_KIND_CODES = {kind: code for code, (kind, _) in enumerate(ENTRY_KINDS)}
+
+
+class WalCorruptError(ValueError):
+    """A log segment or snapshot is damaged somewhere other than a torn tail."""
+
+
+def _column_bytes(values: array) -> bytes:
+    """Bytes of an int array, little-endian whatever the platform."""
+    if _BIG_ENDIAN:
+        values.byteswap()
+    return values.tobytes()
+
+
+def _column_array(typecode: str, data: bytes) -> array:
+    """Int array from little-endian bytes."""
+    values = array(typecode, data)
+    if _BIG_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def encode_entry(table: str, op: str, rows: Sequence[tuple]) -> bytes:
+    """
+    Encode one write as a log entry.
+
+    Fields are stored column by column: an int64 array per int field, and
+    per text field an array of character lengths plus the UTF-8 of all
+    values joined, so decoding takes a few C calls per column.
+
+    Args:
+        table: 'patients' or 'appointments'
+        op: Operation, as listed in ENTRY_KINDS
+        rows: Field tuples of the affected records
+
+    Returns:
+        Entry payload, without framing
+    """
+    code = _KIND_CODES[table, op]
+    schema = ENTRY_KINDS[code][1]
+    parts = [bytes((code,)), _COUNT.pack(len(rows))]
+    for kind, column in zip(schema, zip(*rows)):
+        if kind == 'i':
+            parts.append(_column_bytes(array('q', column)))
+        else:
+            # Text fields such as Patient.age are sometimes given as numbers
+            column = [value if type(value) is str else str(value) for value in column]
+            data = ''.join(column).encode('utf-8', 'surrogatepass')
+            parts.append(_column_bytes(array('I', map(len, column))))
+            parts.append(_COUNT.pack(len(data)))
+            parts.append(data)
+    return b''.join(parts)
+
+
+def decode_entry(payload: bytes) -> Tuple[str, str, List[tuple]]:
+    """
+    Decode a log entry.
+
+    Args:
+        payload: Bytes produced by encode_entry
+
+    Returns:
+        Tuple of (table, op, rows)
+    """
+    (table, op), schema = ENTRY_KINDS[payload[0]]
+    count = _COUNT.unpack_from(payload, 1)[0]
+    position = 1 + _COUNT.size
+    if not count:
+        return table, op, []
+    columns = []
+    for kind in schema:
+        if kind == 'i':
+            end = position + 8 * count
+            columns.append(_column_array('q', payload[position:end]).tolist())
+            position = end
+        else:
+            end = position + 4 * count
+            offsets = [0, *accumulate(_column_array('I', payload[position:end]))]
+            length = _COUNT.unpack_from(payload, end)[0]
+            position = end + _COUNT.size
+            text = payload[position:position + length].decode('utf-8', 'surrogatepass')
+            position += length
+            columns.append([text[offsets[i]:offsets[i + 1]] for i in range(count)])
+    return table, op, list(zip(*columns))
+
+
+def _frame(payload: bytes) -> bytes:
+    """Prefix a payload with its length and checksum."""
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_frames(path: str, repair: bool = False) -> Iterator[bytes]:
+    """
+    Read the payloads of a framed file in order.
+
+    Args:
+        path: Log segment or snapshot file
+        repair: Truncate a torn or corrupt tail (a write cut short by a
+                crash) instead of raising
+
+    Returns:
+        Iterator of payloads
+
+    Raises:
+        WalCorruptError: If a frame is damaged and repair is False
+    """
+    with open(path, 'rb') as stream:
+        data = stream.read()
+    position = 0
+    while position < len(data):
+        end = position + _HEADER.size
+        if end <= len(data):
+            length, checksum = _HEADER.unpack_from(data, position)
+            payload = data[end:end + length]
+            if len(payload) == length and zlib.crc32(payload) == checksum:
+                yield payload
+                position = end + length
+                continue
+        if not repair:
+            raise WalCorruptError(f"Corrupt frame at byte {position} of {path}")
+        with open(path, 'r+b') as stream:
+            stream.truncate(position)
+        return
+
+
+def _segment_path(directory: str, number: int) -> str:
+    """Path of a numbered log segment."""
+    return os.path.join(directory, f'{_SEGMENT_PREFIX}{number:08d}{_SEGMENT_SUFFIX}')
+
+
+def list_segments(directory: str) -> List[int]:
+    """Numbers of the log segments in a directory, ascending."""
+    numbers = []
+    for name in os.listdir(directory):
+        if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX):
+            digits = name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]
+            if digits.isdigit():
+                numbers.append(int(digits))
+    return sorted(numbers)
+
+
+def _fsync_directory(directory: str) -> None:
+    """Make file creations and renames in a directory durable."""
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class WriteAheadLog:
+    """
+    Append-only log split into numbered segment files.
+
+    append() only buffers an entry, so repositories can call it while
+    holding their write lock; commit() then blocks, after the lock is
+    released, until the calling thread's entries are durable under the
+    fsync policy. Threads committing at the same time share one write
+    and one fsync (group commit): the first becomes the leader and
+    flushes everything buffered so far, the others wait for it.
+    """
+
+    def __init__(self, directory: str, segment: int, fsync: str = DEFAULT_FSYNC_POLICY):
+        """
+        Open a new, empty segment for appending.
+
+        Args:
+            directory: Directory holding the segments
+            segment: Number of the segment to create
+            fsync: One of FSYNC_POLICIES
+
+        Raises:
+            ValueError: If fsync is unknown
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.directory = directory
+        self.fsync = fsync
+        self._condition = threading.Condition(threading.Lock())
+        self._local = threading.local()
+        self._buffer: List[bytes] = []
+        # Entries appended, and entries written (and synced, per policy)
+        self._appended = 0
+        self._flushed = 0
+        self._flushing = False
+        self._error: Optional[BaseException] = None
+        # Failure of a background fsync or snapshot, raised by the next commit()
+        self._background_error: Optional[BaseException] = None
+        # Entries appended since the last rotate(), to schedule snapshots
+        self.entries_since_rotate = 0
+        self.segment = segment
+        self._descriptor = self._open_segment(segment)
+
+    def _open_segment(self, number: int) -> int:
+        """Create a segment file and make its directory entry durable."""
+        descriptor = os.open(_segment_path(self.directory, number),
+                             os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if self.fsync != 'never':
+            _fsync_directory(self.directory)
+        return descriptor
+
+    def append(self, table: str, op: str, rows: Sequence[tuple]) -> None:
+        """
+        Buffer one write; commit() makes it durable.
+
+        Args:
+            table: 'patients' or 'appointments'
+            op: Operation, as listed in ENTRY_KINDS
+            rows: Field tuples of the affected records
+        """
+        frame = _frame(encode_entry(table, op, rows))
+        with self._condition:
+            self._buffer.append(frame)
+            self._appended += 1
+            self.entries_since_rotate += 1
+            self._local.ticket = self._appended
+
+    def commit(self) -> None:
+        """
+        Wait until every entry this thread appended is durable.
+
+        Under the 'interval' policy this returns at once; the background
+        flush makes the entries durable.
+
+        Raises:
+            OSError: If writing the log, or the background fsync or
+                     snapshot since the last commit, failed; the in-memory
+                     write has already happened, but may not be durable
+        """
+        with self._condition:
+            background_error, self._background_error = self._background_error, None
+        if background_error is not None:
+            raise OSError("A background fsync or snapshot failed") from background_error
+        ticket = getattr(self._local, 'ticket', 0)
+        if self.fsync == 'interval' or ticket == 0:
+            return
+        self._flush(ticket, sync=self.fsync == 'always')
+
+    def report_background_error(self, error: BaseException) -> None:
+        """Make the next commit() raise a failure of background work."""
+        with self._condition:
+            self._background_error = error
+
+    def sync(self) -> None:
+        """Write and fsync everything appended so far."""
+        with self._condition:
+            ticket = self._appended
+        self._flush(ticket, sync=True)
+
+    def _flush(self, ticket: int, sync: bool) -> None:
+        """Write buffered entries until ticket is covered, as leader or follower."""
+        with self._condition:
+            while self._flushed < ticket:
+                if self._error is not None:
+                    raise OSError("Write-ahead log is unusable after an earlier error") from self._error
+                if self._flushing:
+                    self._condition.wait()
+                    continue
+                frames, upto = self._buffer, self._appended
+                self._buffer = []
+                self._flushing = True
+                self._condition.release()
+                try:
+                    os.write(self._descriptor, b''.join(frames))
+                    if sync:
+                        os.fsync(self._descriptor)
+                except BaseException as error:
+                    self._condition.acquire()
+                    self._error = error
+                    self._flushing = False
+                    self._condition.notify_all()
+                    raise
+                self._condition.acquire()
+                self._flushed = upto
+                self._flushing = False
+                self._condition.notify_all()
+
+    def rotate(self) -> int:
+        """
+        Flush the current segment and continue in a new one.
+
+        Callers must keep writers from appending meanwhile (snapshots
+        hold the repositories' read locks), so the new segment holds
+        exactly the writes after the rotation.
+
+        Returns:
+            Number of the new segment
+        """
+        self.sync()
+        with self._condition:
+            os.close(self._descriptor)
+            self.segment += 1
+            self._descriptor = self._open_segment(self.segment)
+            self.entries_since_rotate = 0
+            return self.segment
+
+    def close(self) -> None:
+        """Flush, fsync and close the current segment."""
+        self.sync()
+        with self._condition:
+            if self._descriptor >= 0:
+                os.close(self._descriptor)
+                self._descriptor = -1
+
+
+def durable(method: Callable) -> Callable:
+    """
+    Decorate a repository write to return only once it is logged durably.
+
+    Goes outside @writer: the entry is appended while the write lock is
+    held, so the log order is the order writes were applied, and the
+    wait happens after the lock is released, so concurrent writers can
+    share an fsync.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        journal = self._journal
+        if journal is not None:
+            journal.commit()
+        return result
+    return wrapper
+
+
+def _write_snapshot(directory: str, segment: int,
+                    states: Dict[str, Tuple[int, List[tuple]]]) -> None:
+    """Write a snapshot file atomically: to a temporary file, then rename."""
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    temporary = path + '.tmp'
+    tables = {table: (ENTRY_KINDS[_KIND_CODES[table, 'create']][1], high_water_mark, rows)
+              for table, (high_water_mark, rows) in states.items()}
+    with open(temporary, 'wb') as stream:
+        write_snapshot(stream, segment, tables)
+        stream.flush()
+        os.fsync(stream.fileno())
+    os.replace(temporary, path)
+    _fsync_directory(directory)
+
+
+class DurableStore:
+    """
+    Makes a pair of in-memory repositories durable in a directory.
+
+    Opening the store recovers the repositories from the directory's
+    snapshot and log segments, then attaches a WriteAheadLog to both.
+    A background thread fsyncs under the 'interval' policy and takes a
+    snapshot, dropping the segments it covers, every snapshot_every
+    entries.
+    """
+
+    def __init__(self, directory: str, repositories: Dict[str, Any],
+                 fsync: str = DEFAULT_FSYNC_POLICY,
+                 fsync_interval: float = WAL_FSYNC_INTERVAL,
+                 snapshot_every: int = SNAPSHOT_EVERY):
+        """
+        Recover the repositories and start logging their writes.
+
+        Args:
+            directory: Directory for the snapshot and log segments;
+                       created if missing
+            repositories: Empty repositories by table name ('patients',
+                          'appointments'), each with load_snapshot(),
+                          replay(), snapshot_state() and attach_journal()
+            fsync: One of FSYNC_POLICIES
+            fsync_interval: Seconds between background fsyncs under the
+                            'interval' policy
+            snapshot_every: Entries logged between snapshots; 0 disables
+                            automatic snapshots
+
+        Raises:
+            ValueError: If fsync is unknown
+            SnapshotFormatError: If the snapshot cannot be read
+            WalCorruptError: If the snapshot or a log segment other than
+                             the newest is damaged
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.repositories = repositories
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self._snapshot_lock = threading.Lock()
+        # Entries since rotation after which a failed automatic snapshot is retried
+        self._snapshot_retry_at = 0
+        last_segment = self.recover()
+        self.wal = WriteAheadLog(directory, last_segment + 1, fsync)
+        for repository in repositories.values():
+            repository.attach_journal(self.wal)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._background, name='wal-background', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def recover(self) -> int:
+        """
+        Load the snapshot and replay the log segments written after it.
+
+        The snapshot is memory-mapped and handed to each repository's
+        load_snapshot(), so repositories that decode rows lazily start
+        in time independent of the snapshot's size.
+
+        Returns:
+            Number of the newest segment found (0 if none)
+        """
+        first_segment = 1
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        if os.path.exists(path) and is_snapshot(path):
+            snapshot = MappedSnapshot(path)
+            for table, repository in self.repositories.items():
+                if table in snapshot.tables:
+                    repository.load_snapshot(snapshot.tables[table])
+            first_segment = snapshot.segment
+        elif os.path.exists(path):
+            first_segment = self._replay_file(path, repair=False)
+        segments = list_segments(self.directory)
+        for number in segments:
+            path = _segment_path(self.directory, number)
+            if number < first_segment:
+                # Left over from a snapshot that finished before its cleanup
+                os.remove(path)
+            else:
+                self._replay_file(path, repair=(number == segments[-1]))
+        return segments[-1] if segments else first_segment - 1
+
+    def _replay_file(self, path: str, repair: bool) -> int:
+        """Apply every entry of a file; return the segment a snapshot continues from."""
+        next_segment = 1
+        for payload in read_frames(path, repair):
+            table, op, rows = decode_entry(payload)
+            if table == 'snapshot':
+                next_segment = rows[0][0]
+            else:
+                self.repositories[table].replay(op, rows)
+        return next_segment
+
+    def snapshot(self) -> None:
+        """
+        Write a snapshot of both repositories and drop the log it replaces.
+
+        Writers are paused only while the rows are copied and the log is
+        rotated; the file is written afterwards.
+        """
+        with self._snapshot_lock:
+            with ExitStack() as stack:
+                states = {table: stack.enter_context(repository.snapshot_state())
+                          for table, repository in self.repositories.items()}
+                segment = self.wal.rotate()
+            _write_snapshot(self.directory, segment, states)
+            for number in list_segments(self.directory):
+                if number < segment:
+                    os.remove(_segment_path(self.directory, number))
+
+    def _background(self) -> None:
+        """
+        Fsync on an interval and take snapshots when enough was logged.
+
+        Failures are logged and handed to the log, whose next commit()
+        raises them; the loop keeps running, and a failed snapshot is
+        retried after another snapshot_every entries.
+        """
+        last_failure = None
+        while not self._closed.wait(self.fsync_interval):
+            try:
+                if self.wal.fsync == 'interval':
+                    self.wal.sync()
+                entries = self.wal.entries_since_rotate
+                if self.snapshot_every and entries >= max(self.snapshot_every,
+                                                          self._snapshot_retry_at):
+                    try:
+                        self.snapshot()
+                    except Exception:
+                        self._snapshot_retry_at = (self.wal.entries_since_rotate
+                                                   + self.snapshot_every)
+                        raise
+                    self._snapshot_retry_at = 0
+            except Exception as error:
+                # A log that failed keeps failing; report each distinct error once
+                if repr(error) != last_failure:
+                    logger.exception("Background fsync or snapshot failed in %s",
+                                     self.directory)
+                    last_failure = repr(error)
+                self.wal.report_background_error(error)
+
+    def close(self) -> None:
+        """Stop the background thread, then flush and close the log."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join()
+        for repository in self.repositories.values():
+            repository.attach_journal(None)
+        self.wal.close()
+        atexit.unregister(self.close)
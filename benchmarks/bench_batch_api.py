@@ -0,0 +1,49 @@
+"""
+Benchmark per-record cost of creating patients over HTTP.
+
+Compares posting the /patients/add form once per record with sending the
+same records to /api/patients:batch, through Flask's test client so only
+application overhead is measured.
+
+Usage:
+    python -m benchmarks.bench_batch_api [SIZE]
+"""
+
+import sys
+import time
+from typing import List
+
+from app import app, repositories
+from app.services import MAX_BATCH_SIZE
+
+DEFAULT_SIZE = 5_000
+
+
+def main(argv: List[str]) -> None:
+    """Print microseconds per created patient for each path."""
+    size = int(argv[0]) if argv else DEFAULT_SIZE
+    records = [{'name': f'Patient {i}', 'age': '30', 'phone': '0911234567'} for i in range(size)]
+    app.config['TESTING'] = True
+    client = app.test_client()
+
+    repositories.patient_repository.clear()
+    start = time.perf_counter()
+    for record in records:
+        client.post('/patients/add', data=record)
+    form = (time.perf_counter() - start) / size
+
+    repositories.patient_repository.clear()
+    start = time.perf_counter()
+    for i in range(0, size, MAX_BATCH_SIZE):
+        response = client.post('/api/patients:batch', json=records[i:i + MAX_BATCH_SIZE])
+        assert response.status_code == 201
+    batch = (time.perf_counter() - start) / size
+
+    print(f'Microseconds per patient, {size:,} patients')
+    print(f'{"form post per record":<26}{form * 1e6:>10.1f}')
+    print(f'{"batch API":<26}{batch * 1e6:>10.1f}')
+    print(f'{"speedup":<26}{form / batch:>10.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,73 @@
+"""
+Benchmark repository throughput under concurrent access.
+
+Each thread runs a read-heavy mix (80% lookups and page reads, 20%
+creates and updates) against a shared, pre-filled repository pair. The
+mix is run with growing thread counts for every registered engine, and
+the total operations per second is reported.
+
+Usage:
+    python -m benchmarks.bench_concurrency [OPERATIONS_PER_THREAD]
+"""
+
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import List
+
+from app.repositories import registered_engines, create_repositories
+
+PRELOAD = 10_000
+DEFAULT_OPERATIONS = 5_000
+THREAD_COUNTS = [1, 2, 4, 8]
+
+
+def worker(patients, appointments, seed: int, operations: int) -> None:
+    """Run the mixed workload in the calling thread."""
+    rng = random.Random(seed)
+    for i in range(operations):
+        action = rng.random()
+        if action < 0.4:
+            patients.find_by_id(rng.randint(1, PRELOAD))
+        elif action < 0.6:
+            patients.get_page(20, after_id=rng.randint(1, PRELOAD))
+        elif action < 0.8:
+            appointments.find_by_patient_id(rng.randint(1, PRELOAD))
+        elif action < 0.9:
+            patient = patients.create(f'Patient {seed}-{i}', '30', '0911234567')
+            appointments.create(patient.id, '2025-12-25', 'Checkup')
+        else:
+            patients.update(rng.randint(1, PRELOAD), notes='updated')
+
+
+def main(argv: List[str]) -> None:
+    """Run the workload for each engine and thread count."""
+    operations = int(argv[0]) if argv else DEFAULT_OPERATIONS
+    print(f'Total operations per second ({operations:,} per thread)')
+    print(f'{"engine":<10}' + ''.join(f'{count:>10} thr' for count in THREAD_COUNTS))
+    with tempfile.TemporaryDirectory() as workdir:
+        for engine in registered_engines():
+            patients, appointments = create_repositories(
+                engine, {'SQLITE_PATH': f'{workdir}/{engine}.db'})
+            for i in range(PRELOAD):
+                patient = patients.create(f'Patient {i}', '30', '0911234567')
+                appointments.create(patient.id, '2025-12-25', 'Checkup')
+
+            rates = []
+            for count in THREAD_COUNTS:
+                threads = [threading.Thread(target=worker,
+                                            args=(patients, appointments, seed, operations))
+                           for seed in range(count)]
+                start = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                rates.append(count * operations / (time.perf_counter() - start))
+            print(f'{engine:<10}' + ''.join(f'{rate:>14,.0f}' for rate in rates))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,56 @@
+"""
+Benchmark dashboard-style polling of the JSON APIs.
+
+Compares fetching /api/patients and /api/appointments in full on every
+poll with revalidating using If-None-Match, through Flask's test client
+so only application overhead is measured. The response cache is off,
+so the full fetch pays for serialization every time.
+
+Usage:
+    python -m benchmarks.bench_conditional_get [SIZE]
+"""
+
+import sys
+import time
+from typing import List
+
+from app import app, cache, repositories
+
+DEFAULT_SIZE = 5_000
+POLLS = 200
+PATHS = ['/api/patients', '/api/appointments']
+
+
+def main(argv: List[str]) -> None:
+    """Print microseconds per poll for full and conditional requests."""
+    size = int(argv[0]) if argv else DEFAULT_SIZE
+    repositories.patient_repository.clear()
+    repositories.appointment_repository.clear()
+    patients = repositories.patient_repository.create_many(
+        (f'Patient {i}', '30', '0911234567', '') for i in range(size))
+    repositories.appointment_repository.create_many(
+        (patient.id, '2025-06-15', 'General checkup') for patient in patients)
+    cache.configure_response_cache(0)
+    app.config['TESTING'] = True
+    client = app.test_client()
+
+    results = {}
+    for path in PATHS:
+        start = time.perf_counter()
+        for _ in range(POLLS):
+            response = client.get(path)
+        full = (time.perf_counter() - start) / POLLS
+        etag = response.headers['ETag']
+        start = time.perf_counter()
+        for _ in range(POLLS):
+            assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+        results[path] = (full, (time.perf_counter() - start) / POLLS, len(response.data))
+
+    print(f'Microseconds per poll, {size:,} patients and appointments')
+    print(f'{"endpoint":<22}{"200 full":>12}{"304":>10}{"bytes saved":>14}')
+    for path, (full, conditional, size_bytes) in results.items():
+        print(f'{path:<22}{full * 1e6:>12,.0f}{conditional * 1e6:>10,.0f}{size_bytes:>14,}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
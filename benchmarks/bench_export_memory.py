@@ -0,0 +1,70 @@
+"""
+Benchmark memory use of the patient CSV export.
+
+Fills the global patient repository, then measures how much the peak
+resident set size grows while exporting: first with the streaming
+iter_patients_csv generator, then with the previous approach of building
+the whole file in a StringIO. The streaming run goes first because peak
+RSS never decreases.
+
+Usage:
+    python -m benchmarks.bench_export_memory [SIZE]
+"""
+
+import csv
+import resource
+import sys
+import time
+from io import StringIO
+from typing import List
+
+from app.repositories import patient_repository
+from app.services import iter_patients_csv
+
+DEFAULT_SIZE = 1_000_000
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def export_in_memory() -> int:
+    """Build the CSV the way the export route used to and return its size."""
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['ID', 'Name', 'Age', 'Phone', 'Notes'])
+    for patient in patient_repository.get_all():
+        writer.writerow([patient.id, patient.name, patient.age, patient.phone, patient.notes])
+    output.seek(0)
+    return len(output.getvalue())
+
+
+def main(argv: List[str]) -> None:
+    """Populate the repository and compare both export strategies."""
+    size = int(argv[0]) if argv else DEFAULT_SIZE
+    patient_repository.clear()
+    for i in range(size):
+        patient_repository.create(f'Patient {i}', '30', '0911234567', 'Imported record')
+
+    baseline = peak_rss_mb()
+    print(f'{size:,} patients loaded, peak RSS {baseline:.1f} MB')
+
+    start = time.perf_counter()
+    streamed = sum(len(chunk) for chunk in iter_patients_csv())
+    elapsed = time.perf_counter() - start
+    after_stream = peak_rss_mb()
+    print(f'streaming: {streamed / 1e6:.1f} MB of CSV in {elapsed:.2f}s, '
+          f'peak RSS +{after_stream - baseline:.1f} MB')
+
+    start = time.perf_counter()
+    buffered = export_in_memory()
+    elapsed = time.perf_counter() - start
+    print(f'in-memory: {buffered / 1e6:.1f} MB of CSV in {elapsed:.2f}s, '
+          f'peak RSS +{peak_rss_mb() - after_stream:.1f} MB')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,74 @@
+"""
+Benchmark bulk import throughput.
+
+Generates patient and appointment files in memory, imports them into a
+fresh repository pair of each in-process engine and reports rows per
+second for CSV and JSON Lines input.
+
+Usage:
+    python -m benchmarks.bench_import [SIZE]
+"""
+
+import csv
+import io
+import json
+import random
+import sys
+import time
+from typing import List
+
+from app import repositories
+from app.importer import import_patients, import_appointments
+from benchmarks.bench_text_search import synthetic_description
+from benchmarks.harness import _random_date
+
+DEFAULT_SIZE = 200_000
+ENGINES = ['memory', 'columnar']
+
+
+def patient_rows(size: int) -> List[dict]:
+    """Build size patient records."""
+    rng = random.Random(3)
+    return [{'name': f'Patient {i}', 'age': str(rng.randint(1, 90)),
+             'phone': f'09{rng.randrange(10 ** 8):08d}', 'notes': ''} for i in range(size)]
+
+
+def appointment_rows(size: int) -> List[dict]:
+    """Build size appointment records for patients 1..size."""
+    rng = random.Random(5)
+    return [{'patient_id': str(rng.randint(1, size)), 'date': _random_date(rng),
+             'description': synthetic_description(rng)} for _ in range(size)]
+
+
+def encode(rows: List[dict], fmt: str) -> str:
+    """Encode records as CSV or JSON Lines text."""
+    if fmt == 'jsonl':
+        return ''.join(json.dumps(row) + '\n' for row in rows)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def main(argv: List[str]) -> None:
+    """Print import rows/sec per engine and format."""
+    size = int(argv[0]) if argv else DEFAULT_SIZE
+    patients, appointments = patient_rows(size), appointment_rows(size)
+    print(f'Import rows per second, {size:,} rows')
+    print(f'{"engine":<10}{"format":<8}{"patients":>14}{"appointments":>14}')
+    for engine in ENGINES:
+        for fmt in ('csv', 'jsonl'):
+            repositories.set_repositories(*repositories.create_repositories(engine, {}))
+            rates = []
+            for importer, rows in ((import_patients, patients), (import_appointments, appointments)):
+                stream = io.StringIO(encode(rows, fmt))
+                start = time.perf_counter()
+                report = importer(stream, fmt)
+                assert report.imported == size, report.errors[:5]
+                rates.append(size / (time.perf_counter() - start))
+            print(f'{engine:<10}{fmt:<8}{rates[0]:>14,.0f}{rates[1]:>14,.0f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
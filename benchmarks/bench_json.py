@@ -0,0 +1,66 @@
+"""
+Benchmark JSON encoding of the full patient and appointment lists.
+
+Compares the previous path (to_dict() per row, then jsonify) with the
+direct encoders in app.serialization, using orjson when it is
+installed and the standard library fallback either way.
+
+Usage:
+    python -m benchmarks.bench_json [SIZE]
+"""
+
+import sys
+import time
+from typing import Callable, List
+
+from flask import jsonify
+
+from app import app, serialization
+from app.models import Patient, Appointment
+from app.serialization import appointment_encoder, encode_patients, iter_json_array
+
+DEFAULT_SIZE = 100_000
+REPEATS = 3
+
+
+def best_of(function: Callable[[], object]) -> float:
+    """Return the fastest of REPEATS runs, in seconds."""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv: List[str]) -> None:
+    """Print milliseconds to encode each list with each path."""
+    size = int(argv[0]) if argv else DEFAULT_SIZE
+    patients = [Patient(i, f'Patient {i}', '30', '091-123-4567', 'Regular patient')
+                for i in range(1, size + 1)]
+    by_id = {patient.id: patient for patient in patients}
+    appointments = [Appointment(i, i % size + 1, '2025-06-15', 'General checkup')
+                    for i in range(1, size + 1)]
+
+    results = {}
+    with app.app_context():
+        results['to_dict + jsonify'] = (
+            best_of(lambda: jsonify([p.to_dict() for p in patients]).get_data()),
+            best_of(lambda: jsonify([a.to_dict(by_id.get(a.patient_id))
+                                     for a in appointments]).get_data()))
+    installed = serialization.orjson
+    for backend in ['stdlib'] + (['orjson'] if installed is not None else []):
+        serialization.orjson = installed if backend == 'orjson' else None
+        results[f'direct ({backend})'] = (
+            best_of(lambda: b''.join(iter_json_array(patients, encode_patients))),
+            best_of(lambda: b''.join(iter_json_array(appointments, appointment_encoder(by_id)))))
+    serialization.orjson = installed
+
+    print(f'Milliseconds to encode {size:,} rows')
+    print(f'{"path":<24}{"patients":>12}{"appointments":>14}')
+    for name, (patient_time, appointment_time) in results.items():
+        print(f'{name:<24}{patient_time * 1e3:>12,.0f}{appointment_time * 1e3:>14,.0f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,70 @@
+"""
+Benchmark primary-key operations on the in-memory repositories.
+
+Reports the mean per-call latency of find_by_id, update and delete at
+several repository sizes.
+
+Usage:
+    python -m benchmarks.bench_lookup [SIZE ...]
+"""
+
+import random
+import sys
+import time
+from typing import Callable, List
+
+from app.repositories import PatientRepository, AppointmentRepository
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+CALLS = 10_000
+
+
+def time_per_call(func: Callable[[int], object], keys: List[int]) -> float:
+    """Return the mean latency of func(key) over keys, in microseconds."""
+    start = time.perf_counter()
+    for key in keys:
+        func(key)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(keys) * 1_000_000
+
+
+def bench_patients(size: int) -> None:
+    """Benchmark PatientRepository with size records."""
+    repo = PatientRepository()
+    for i in range(size):
+        repo.create(f'Patient {i}', '30', '0911234567')
+
+    keys = [random.randint(1, size) for _ in range(CALLS)]
+    find = time_per_call(repo.find_by_id, keys)
+    update = time_per_call(lambda key: repo.update(key, notes='updated'), keys)
+    # Delete distinct ids so every call removes a record
+    doomed = random.sample(range(1, size + 1), min(CALLS, size))
+    delete = time_per_call(repo.delete, doomed)
+
+    print(f'{"patients":<14}{size:>12,}{find:>12.3f}{update:>12.3f}{delete:>12.3f}')
+
+
+def bench_appointments(size: int) -> None:
+    """Benchmark AppointmentRepository.find_by_id with size records."""
+    repo = AppointmentRepository()
+    for i in range(size):
+        repo.create(i % 1000 + 1, '2025-10-22', 'General Checkup')
+
+    keys = [random.randint(1, size) for _ in range(CALLS)]
+    find = time_per_call(repo.find_by_id, keys)
+
+    print(f'{"appointments":<14}{size:>12,}{find:>12.3f}{"-":>12}{"-":>12}')
+
+
+def main(argv: List[str]) -> None:
+    """Run the benchmark for each requested size."""
+    sizes = [int(arg) for arg in argv] or DEFAULT_SIZES
+    print('Per-call latency in microseconds')
+    print(f'{"repository":<14}{"records":>12}{"find":>12}{"update":>12}{"delete":>12}')
+    for size in sizes:
+        bench_patients(size)
+        bench_appointments(size)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,75 @@
+"""
+Benchmark memory used per record.
+
+First compares single model objects: the old dict-backed classes against
+the slotted ones. Then fills an appointment repository from each
+in-process engine and reports the bytes allocated per appointment,
+including indexes.
+
+Usage:
+    python -m benchmarks.bench_memory [SIZE]
+"""
+
+import random
+import sys
+import tracemalloc
+from typing import Callable, List
+
+from app.columnar import ColumnarAppointmentRepository
+from app.models import Patient, Appointment
+from app.repositories import AppointmentRepository
+from benchmarks.bench_text_search import synthetic_description
+from benchmarks.harness import _random_date
+
+DEFAULT_SIZE = 200_000
+
+
+class DictPatient(Patient):
+    """Patient with a per-instance __dict__, as before slotting."""
+
+
+class DictAppointment(Appointment):
+    """Appointment with a per-instance __dict__, as before slotting."""
+
+
+def bytes_per_record(build: Callable[[int], object], size: int) -> float:
+    """Return the bytes still allocated after build(size), divided by size."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build(size)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / size
+
+
+def fill(repo, size: int):
+    """Create size appointments with realistic dates and descriptions."""
+    rng = random.Random(7)
+    for _ in range(size):
+        repo.create(rng.randint(1, size // 4 + 1), _random_date(rng), synthetic_description(rng))
+    return repo
+
+
+def main(argv: List[str]) -> None:
+    """Print bytes per record for each model and engine."""
+    size = int(argv[0]) if argv else DEFAULT_SIZE
+    print(f'Bytes per record, {size:,} records')
+    models = [
+        ('Patient (dict)', lambda n: [DictPatient(i, f'Patient {i}', '30', '0911234567') for i in range(n)]),
+        ('Patient (slots)', lambda n: [Patient(i, f'Patient {i}', '30', '0911234567') for i in range(n)]),
+        ('Appointment (dict)', lambda n: [DictAppointment(i, i, '2025-12-25', 'Checkup') for i in range(n)]),
+        ('Appointment (slots)', lambda n: [Appointment(i, i, '2025-12-25', 'Checkup') for i in range(n)]),
+    ]
+    for name, build in models:
+        print(f'{name:<34}{bytes_per_record(build, size):>10,.0f}')
+    engines = [
+        ('AppointmentRepository', lambda n: fill(AppointmentRepository(), n)),
+        ('ColumnarAppointmentRepository', lambda n: fill(ColumnarAppointmentRepository(), n)),
+    ]
+    for name, build in engines:
+        print(f'{name:<34}{bytes_per_record(build, size):>10,.0f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
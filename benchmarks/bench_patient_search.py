@@ -0,0 +1,99 @@
+"""
+Benchmark patient typeahead search: indexed search vs. a linear scan.
+
+Builds a PatientRepository and a SQLite database with synthetic names and
+phone numbers and compares the mean latency of search() on both engines
+for name prefixes, misspelled names and phone digits against scanning
+every patient. The SQLite engine's fuzzy matches use a trigram index of
+the distinct name words that is cached until the patients table changes;
+its first fuzzy search after a write pays for rebuilding it.
+
+Usage:
+    python -m benchmarks.bench_patient_search [SIZE]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import List
+
+from app.patient_index import normalize_phone
+from app.repositories import PatientRepository
+from app.sqlite_repositories import SqliteDatabase, SqlitePatientRepository
+
+DEFAULT_SIZE = 1_000_000
+REPEAT = 20
+LIMIT = 10
+
+FIRST_NAMES = ['Anna', 'John', 'Maria', 'David', 'Sarah', 'Michael', 'Laura', 'James',
+               'Emma', 'Robert', 'Olivia', 'Daniel', 'Sophia', 'Thomas', 'Mia', 'Lucas']
+LAST_SYLLABLES = ['son', 'man', 'ford', 'ley', 'ton', 'berg', 'wood', 'ski', 'ez', 'ini']
+LAST_STEMS = ['Ander', 'Black', 'Car', 'Dal', 'Fer', 'Gold', 'Har', 'John', 'Kow',
+              'Mar', 'Nel', 'Rod', 'Sil', 'Thomp', 'Wil', 'Zan']
+
+
+def synthetic_patient(rng: random.Random):
+    """Build a random (name, phone) pair."""
+    last = rng.choice(LAST_STEMS) + rng.choice(LAST_SYLLABLES) + rng.choice(LAST_SYLLABLES)
+    phone = f'09{rng.randrange(10)}-{rng.randrange(1000):03d} {rng.randrange(10000):04d}'
+    return f'{rng.choice(FIRST_NAMES)} {last}', phone
+
+
+def scan(repo: PatientRepository, query: str) -> list:
+    """Naive typeahead: case-insensitive substring match on name or phone digits."""
+    query_lower = query.lower()
+    digits = normalize_phone(query)
+    return [p for p in repo.get_all()
+            if query_lower in p.name.lower() or (digits and digits in normalize_phone(p.phone))
+            ][:LIMIT]
+
+
+def mean_latency_ms(search, query: str, repeat: int = REPEAT) -> float:
+    """Return the mean latency of one search in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        search(query)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(argv: List[str]) -> None:
+    """Build the dataset and time each kind of query."""
+    size = int(argv[0]) if argv else DEFAULT_SIZE
+    rng = random.Random(42)
+    repo = PatientRepository()
+
+    start = time.perf_counter()
+    records = [(*synthetic_patient(rng), '') for _ in range(size)]
+    repo.create_many((name, '30', phone, notes) for name, phone, notes in records)
+    print(f'Indexed {size:,} patients in {time.perf_counter() - start:.1f}s')
+    directory = tempfile.mkdtemp(prefix='bench_patient_search_')
+    database = SqliteDatabase(os.path.join(directory, 'clinic.db'))
+    sqlite_repo = SqlitePatientRepository(database)
+    start = time.perf_counter()
+    sqlite_repo.create_many((name, '30', phone, notes) for name, phone, notes in records)
+    print(f'Stored {size:,} patients in SQLite in {time.perf_counter() - start:.1f}s')
+
+    sample_phone = records[size // 2][1]
+    queries = [('prefix', 'ma'), ('prefix', 'maria silt'), ('prefix', 'goldfordle'),
+               ('fuzzy', 'goldfrodley'), ('fuzzy', 'marie kowskison'),
+               ('phone', sample_phone), ('phone', sample_phone[-4:])]
+
+    first = mean_latency_ms(lambda q: sqlite_repo.search(q, LIMIT), 'goldfrodley', repeat=1)
+    print(f'SQLite fuzzy search building the word index: {first:.2f} ms')
+
+    print(f'{"kind":<8}{"query":<18}{"found":>7}{"scan":>10}{"index":>10}{"sqlite":>10}  (ms)')
+    for kind, query in queries:
+        found = len(repo.search(query, LIMIT))
+        scanned = mean_latency_ms(lambda q: scan(repo, q), query, repeat=2)
+        indexed = mean_latency_ms(lambda q: repo.search(q, LIMIT), query)
+        stored = mean_latency_ms(lambda q: sqlite_repo.search(q, LIMIT), query)
+        print(f'{kind:<8}{query:<18}{found:>7}{scanned:>10.2f}{indexed:>10.2f}{stored:>10.2f}')
+    database.close()
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,65 @@
+"""
+Benchmark read-heavy traffic on the list views with and without the
+response cache.
+
+Loads SIZE patients with two appointments each, then requests the
+dashboard, list pages and JSON APIs repeatedly, with one patient
+created every WRITE_EVERY reads so invalidation is part of the cost.
+
+Usage:
+    python -m benchmarks.bench_response_cache [SIZE]
+"""
+
+import random
+import sys
+import time
+from typing import List
+
+from app import app, cache, repositories
+
+DEFAULT_SIZE = 2_000
+REQUESTS = 2_000
+WRITE_EVERY = 100
+PATHS = ['/', '/patients', '/appointments', '/api/patients', '/api/appointments',
+         '/api/patients?limit=50', '/api/appointments?limit=50']
+
+
+def run(client, cache_size: int) -> float:
+    """Replay the request mix and return requests per second."""
+    cache.configure_response_cache(cache_size)
+    rng = random.Random(7)
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        if i % WRITE_EVERY == WRITE_EVERY - 1:
+            repositories.patient_repository.create(f'Walk-in {i}', '30', '0911234567')
+        response = client.get(rng.choice(PATHS))
+        assert response.status_code == 200
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def main(argv: List[str]) -> None:
+    """Print requests per second with the cache off and on."""
+    size = int(argv[0]) if argv else DEFAULT_SIZE
+    repositories.patient_repository.clear()
+    repositories.appointment_repository.clear()
+    patients = repositories.patient_repository.create_many(
+        (f'Patient {i}', '30', '0911234567', '') for i in range(size))
+    repositories.appointment_repository.create_many(
+        (patient.id, f'2025-{i % 12 + 1:02d}-15', 'General checkup')
+        for i, patient in enumerate(patients * 2))
+    app.config['TESTING'] = True
+    client = app.test_client()
+
+    uncached = run(client, 0)
+    cached = run(client, cache.DEFAULT_CACHE_SIZE)
+    stats = cache.response_cache.stats()
+
+    print(f'Requests per second, {size:,} patients, one write per {WRITE_EVERY} reads')
+    print(f'{"no cache":<26}{uncached:>10,.0f}')
+    print(f'{"response cache":<26}{cached:>10,.0f}')
+    print(f'{"speedup":<26}{cached / uncached:>10.1f}x')
+    print(f'{"hit rate":<26}{stats["hit_rate"]:>10.1%}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
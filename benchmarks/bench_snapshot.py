@@ -0,0 +1,86 @@
+"""
+Benchmark startup from a memory-mapped snapshot.
+
+Writes a snapshot of SIZE patients and SIZE appointments, then times
+recovering it into plain repositories (every row decoded and indexed up
+front) and into the mapped repositories (rows decoded on access, indexes
+built on first use), along with the first reads after startup and the
+memory each process holds privately.
+
+Usage:
+    python -m benchmarks.bench_snapshot [SIZE]
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+from typing import List
+
+from app.mapped import MappedAppointmentRepository, MappedPatientRepository
+from app.repositories import AppointmentRepository, PatientRepository
+from app.wal import DurableStore
+
+DEFAULT_SIZE = 1_000_000
+CHUNK = 10_000
+
+
+def private_memory_mb() -> float:
+    """Resident memory not shared with other processes (e.g. mapped files), in MB."""
+    with open('/proc/self/smaps_rollup') as stream:
+        fields = dict(line.split(':', 1) for line in stream if ':' in line)
+    private = sum(int(fields[key].split()[0]) for key in ('Private_Clean', 'Private_Dirty'))
+    return private / 1024
+
+
+def timed(label: str, action):
+    """Run an action and print its duration."""
+    start = time.perf_counter()
+    result = action()
+    print(f'  {label:<28}{(time.perf_counter() - start) * 1000:>10.1f} ms')
+    return result
+
+
+def main(argv: List[str]) -> None:
+    """Build a snapshot, then compare eager and mapped startup."""
+    size = int(argv[0]) if argv else DEFAULT_SIZE
+    directory = tempfile.mkdtemp(prefix='bench_snapshot_')
+    try:
+        store = DurableStore(directory, {'patients': PatientRepository(),
+                                         'appointments': AppointmentRepository()},
+                             fsync='never', snapshot_every=0)
+        patients, appointments = store.repositories.values()
+        for offset in range(0, size, CHUNK):
+            count = min(CHUNK, size - offset)
+            created = patients.create_many(
+                (f'Patient {offset + i}', '30', f'091-{offset + i:07d}', '') for i in range(count))
+            appointments.create_many(
+                (patient.id, '2025-10-22', 'General Checkup') for patient in created)
+        store.snapshot()
+        store.close()
+        del store, patients, appointments, created
+        print(f'Snapshot of {size:,} patients and appointments written')
+
+        for label, classes in (('eager', (PatientRepository, AppointmentRepository)),
+                               ('mapped', (MappedPatientRepository, MappedAppointmentRepository))):
+            print(f'{label}:')
+            before = private_memory_mb()
+            store = timed('startup', lambda: DurableStore(
+                directory, {'patients': classes[0](), 'appointments': classes[1]()},
+                fsync='never', snapshot_every=0))
+            print(f'  {"private memory":<28}{private_memory_mb() - before:>10.0f} MB')
+            patients, appointments = store.repositories.values()
+            timed('first page + lookups', lambda: (patients.get_page(20, offset=size // 2),
+                                                   appointments.get_recent(20),
+                                                   patients.find_by_id(size // 3)))
+            timed('first patient search', lambda: patients.search('patient 4242'))
+            timed('second patient search', lambda: patients.search('patient 4243'))
+            timed('first appointment search', lambda: appointments.search('checkup', patient_id=7))
+            store.close()
+            del store, patients, appointments
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
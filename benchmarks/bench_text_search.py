@@ -0,0 +1,69 @@
+"""
+Benchmark appointment description search: inverted index vs. substring scan.
+
+Builds an AppointmentRepository with synthetic descriptions and compares
+the mean query latency of the indexed 'term' and 'prefix' modes against
+the legacy 'substring' scan.
+
+Usage:
+    python -m benchmarks.bench_text_search [SIZE]
+"""
+
+import random
+import sys
+import time
+from typing import List
+
+from app.repositories import AppointmentRepository
+
+DEFAULT_SIZE = 1_000_000
+REPEAT = 5
+
+VISITS = ['General', 'Dental', 'Follow-up', 'Annual', 'Urgent', 'Routine',
+          'Pediatric', 'Cardiology', 'Dermatology', 'Orthopedic']
+REASONS = ['checkup', 'consultation', 'vaccination', 'x-ray', 'blood test',
+           'cleaning', 'surgery review', 'prescription refill', 'therapy',
+           'screening', 'ultrasound', 'allergy test']
+NOTES = ['', 'fasting required', 'bring previous results', 'new symptoms',
+         'second opinion', 'referral from GP', 'insurance pending']
+
+
+def synthetic_description(rng: random.Random) -> str:
+    """Build a random appointment description."""
+    return f'{rng.choice(VISITS)} {rng.choice(REASONS)} {rng.choice(NOTES)}'.strip()
+
+
+def mean_latency_ms(repo: AppointmentRepository, query: str, match: str) -> float:
+    """Return the mean latency of one search in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        repo.search(query=query, match=match)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main(argv: List[str]) -> None:
+    """Build the dataset and time each search mode."""
+    size = int(argv[0]) if argv else DEFAULT_SIZE
+    rng = random.Random(42)
+    repo = AppointmentRepository()
+
+    start = time.perf_counter()
+    for i in range(size):
+        repo.create(i % 10_000 + 1, '2025-10-22', synthetic_description(rng))
+    print(f'Indexed {size:,} descriptions in {time.perf_counter() - start:.1f}s')
+
+    # (whole-word query, typed prefix of it), from rare to common
+    queries = [('ultrasound fasting', 'ultra fast'), ('dermatology allergy', 'derm aller'),
+               ('referral', 'refer'), ('checkup', 'check')]
+
+    print(f'{"query":<22}{"matches":>10}{"substring":>12}{"term":>10}{"prefix":>10}  (ms)')
+    for term_query, prefix_query in queries:
+        matches = len(repo.search(query=term_query, match='term'))
+        substring = mean_latency_ms(repo, term_query, 'substring')
+        term = mean_latency_ms(repo, term_query, 'term')
+        prefix = mean_latency_ms(repo, prefix_query, 'prefix')
+        print(f'{term_query:<22}{matches:>10,}{substring:>12.2f}{term:>10.2f}{prefix:>10.2f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
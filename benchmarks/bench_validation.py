@@ -0,0 +1,104 @@
+"""
+Benchmark record validation throughput.
+
+Validates a mix of patient and appointment records (about 10% invalid)
+with validate_many, and with the previous validators that recompiled
+patterns, stripped each field several times and parsed dates with
+strptime. Reports records per second for each.
+
+Usage:
+    python -m benchmarks.bench_validation [SIZE]
+"""
+
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from app.services import validate_many, validate_patient_record, validate_appointment_record
+from benchmarks.harness import _random_date
+
+DEFAULT_SIZE = 1_000_000
+
+
+def legacy_patient(record: Dict[str, str]) -> Tuple[bool, str]:
+    """Validate a patient the way the old validators did."""
+    name, age, phone = record['name'], record['age'], record['phone']
+    if not name or not name.strip():
+        return False, "Patient name is required"
+    if len(name.strip()) < 2 or len(name.strip()) > 100:
+        return False, "Bad name"
+    if not age or not age.strip():
+        return False, "Age is required"
+    try:
+        age_int = int(age.strip())
+        if age_int < 0 or age_int > 150:
+            return False, "Bad age"
+    except ValueError:
+        return False, "Age must be a valid number"
+    if not phone or not phone.strip():
+        return False, "Phone number is required"
+    phone_clean = re.sub(r'[\s\-\(\)]', '', phone.strip())
+    if len(phone_clean) < 7 or len(phone_clean) > 15 or not phone_clean.isdigit():
+        return False, "Bad phone"
+    return True, ""
+
+
+def legacy_appointment(record: Dict[str, str]) -> Tuple[bool, str]:
+    """Validate an appointment the way the old validators did."""
+    date, description = record['date'], record['description']
+    if not date or not date.strip():
+        return False, "Date is required"
+    if not re.match(r'^\d{4}-\d{2}-\d{2}$', date.strip()):
+        return False, "Date must be in YYYY-MM-DD format"
+    try:
+        datetime.strptime(date.strip(), '%Y-%m-%d')
+    except ValueError:
+        return False, "Invalid date"
+    if not description or not description.strip():
+        return False, "Description is required"
+    if len(description.strip()) < 3 or len(description.strip()) > 500:
+        return False, "Bad description"
+    return True, ""
+
+
+def make_records(size: int) -> Tuple[List[dict], List[dict]]:
+    """Build size // 2 patient and size // 2 appointment records."""
+    rng = random.Random(11)
+    patients, appointments = [], []
+    for i in range(size // 2):
+        bad = rng.random() < 0.1
+        patients.append({'name': f'Patient {i}', 'age': 'x' if bad else str(rng.randint(1, 90)),
+                         'phone': f'091-{rng.randrange(10 ** 7):07d}', 'notes': ''})
+        appointments.append({'patient_id': str(i + 1),
+                             'date': '2025-02-30' if bad else _random_date(rng),
+                             'description': 'Follow-up visit'})
+    return patients, appointments
+
+
+def main(argv: List[str]) -> None:
+    """Print records per second for the old and new validators."""
+    size = int(argv[0]) if argv else DEFAULT_SIZE
+    patients, appointments = make_records(size)
+
+    start = time.perf_counter()
+    for record in patients:
+        legacy_patient(record)
+    for record in appointments:
+        legacy_appointment(record)
+    legacy = size / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    validate_many(patients, validate_patient_record)
+    validate_many(appointments, validate_appointment_record)
+    current = size / (time.perf_counter() - start)
+
+    print(f'Records validated per second, {size:,} records')
+    print(f'{"previous validators":<22}{legacy:>14,.0f}')
+    print(f'{"validate_many":<22}{current:>14,.0f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,159 @@
+"""
+Shared benchmark harness for repository storage engines.
+
+Runs one fixed workload against every registered engine (or the engines
+named on the command line) and reports operations per second for each
+step, so engines can be compared like for like.
+
+Usage:
+    python -m benchmarks.harness [--size N] [ENGINE ...]
+"""
+
+import argparse
+import datetime
+import random
+import tempfile
+import time
+from typing import Callable, List, Tuple
+
+from app.repositories import registered_engines, create_repositories
+from benchmarks.bench_text_search import synthetic_description
+
+DEFAULT_SIZE = 20_000
+QUERY_CALLS = 200
+
+START_DATE = datetime.date(2024, 1, 1)
+
+
+def _random_date(rng: random.Random) -> str:
+    """Return a random ISO date within two years of START_DATE."""
+    return (START_DATE + datetime.timedelta(days=rng.randrange(730))).isoformat()
+
+
+# Each step takes (patients, appointments, rng, size) and returns the number
+# of operations it performed
+def step_create_patients(patients, appointments, rng, size):
+    """Create size patients."""
+    for i in range(size):
+        patients.create(f'Patient {i}', str(rng.randint(1, 90)), '0911234567')
+    return size
+
+
+def step_create_appointments(patients, appointments, rng, size):
+    """Create two appointments per patient on random dates."""
+    for _ in range(size * 2):
+        appointments.create(rng.randint(1, size), _random_date(rng), synthetic_description(rng))
+    return size * 2
+
+
+def step_find_patient(patients, appointments, rng, size):
+    """Look up random patients by ID."""
+    for _ in range(size):
+        patients.find_by_id(rng.randint(1, size))
+    return size
+
+
+def step_find_patients_batch(patients, appointments, rng, size):
+    """Look up random patients 50 at a time."""
+    calls = max(size // 50, 1)
+    for _ in range(calls):
+        patients.find_by_ids(rng.randint(1, size) for _ in range(50))
+    return calls
+
+
+def step_page_patients(patients, appointments, rng, size):
+    """Walk every patient with keyset pagination."""
+    pages, after_id = 0, None
+    while True:
+        page = patients.get_page(50, after_id=after_id)
+        if not page:
+            return pages
+        pages += 1
+        after_id = page[-1].id
+
+
+def step_appointments_by_patient(patients, appointments, rng, size):
+    """Fetch random patients' appointments."""
+    for _ in range(size):
+        appointments.find_by_patient_id(rng.randint(1, size))
+    return size
+
+
+def step_week_range(patients, appointments, rng, size):
+    """Query random one-week date ranges."""
+    for _ in range(QUERY_CALLS):
+        start = START_DATE + datetime.timedelta(days=rng.randrange(723))
+        appointments.find_by_date_range(start.isoformat(),
+                                        (start + datetime.timedelta(days=6)).isoformat())
+    return QUERY_CALLS
+
+
+def step_text_search(patients, appointments, rng, size):
+    """Run prefix description searches."""
+    for _ in range(QUERY_CALLS):
+        appointments.search(query=rng.choice(['ultra', 'derm aller', 'refer', 'check']))
+    return QUERY_CALLS
+
+
+def step_update_patient(patients, appointments, rng, size):
+    """Update random patients."""
+    for _ in range(size):
+        patients.update(rng.randint(1, size), notes='updated')
+    return size
+
+
+def step_delete_patient(patients, appointments, rng, size):
+    """Delete a tenth of the patients with their appointments."""
+    doomed = rng.sample(range(1, size + 1), max(size // 10, 1))
+    for patient_id in doomed:
+        appointments.delete_by_patient_id(patient_id)
+        patients.delete(patient_id)
+    return len(doomed)
+
+
+WORKLOAD: List[Tuple[str, Callable]] = [
+    ('create patient', step_create_patients),
+    ('create appointment', step_create_appointments),
+    ('find patient', step_find_patient),
+    ('find 50 patients', step_find_patients_batch),
+    ('page 50 patients', step_page_patients),
+    ('appointments by patient', step_appointments_by_patient),
+    ('one-week date range', step_week_range),
+    ('description search', step_text_search),
+    ('update patient', step_update_patient),
+    ('cascade delete patient', step_delete_patient),
+]
+
+
+def run_engine(engine: str, size: int, workdir: str) -> List[float]:
+    """Run the workload on a fresh repository pair and return ops/sec per step."""
+    patients, appointments = create_repositories(
+        engine, {'SQLITE_PATH': f'{workdir}/{engine}.db'})
+    rng = random.Random(7)
+    results = []
+    for _, step in WORKLOAD:
+        start = time.perf_counter()
+        operations = step(patients, appointments, rng, size)
+        results.append(operations / (time.perf_counter() - start))
+    return results
+
+
+def main(argv: List[str] = None) -> None:
+    """Run the workload on each selected engine and print a comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('engines', nargs='*', help='engines to run (default: all registered)')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE, help='number of patients')
+    args = parser.parse_args(argv)
+    engines = args.engines or registered_engines()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {engine: run_engine(engine, args.size, workdir) for engine in engines}
+
+    print(f'Operations per second, {args.size:,} patients')
+    print(f'{"step":<26}' + ''.join(f'{engine:>14}' for engine in engines))
+    for i, (name, _) in enumerate(WORKLOAD):
+        print(f'{name:<26}' + ''.join(f'{results[engine][i]:>14,.0f}' for engine in engines))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,11 @@
 Run script for Clinic Management System.
 """
 
-from app import app, initialize_sample_data
+from app import create_app
 
 if __name__ == '__main__':
-    # Initialize sample data
-    initialize_sample_data()
+    # Configure storage and initialize sample data
+    app = create_app()
     
     # Run the application
     app.run(debug=True, host='127.0.0.1', port=5001)
@@ -0,0 +1,48 @@
+"""
+Unit tests for the response cache.
+"""
+
+import pytest
+from app.cache import ResponseCache
+
+
+class TestResponseCache:
+    """Test cases for ResponseCache."""
+    
+    def test_hit_requires_matching_version(self):
+        """Test that a value is only returned for the version it was built from."""
+        cache = ResponseCache(max_entries=4)
+        cache.put('/patients', 1, 'old page')
+        assert cache.get('/patients', 1) == 'old page'
+        assert cache.get('/patients', 2) is None
+        # The stale entry was dropped, so the old version misses too
+        assert cache.get('/patients', 1) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+    
+    def test_least_recently_used_is_evicted(self):
+        """Test that the oldest unused entry is evicted when full."""
+        cache = ResponseCache(max_entries=2)
+        cache.put('a', 1, 'A')
+        cache.put('b', 1, 'B')
+        cache.get('a', 1)
+        cache.put('c', 1, 'C')
+        assert cache.get('b', 1) is None
+        assert cache.get('a', 1) == 'A' and cache.get('c', 1) == 'C'
+        assert cache.stats()['evictions'] == 1
+    
+    def test_stats(self):
+        """Test the reported metrics."""
+        cache = ResponseCache(max_entries=8)
+        cache.put('a', 1, 'A')
+        cache.get('a', 1)
+        cache.get('b', 1)
+        assert cache.stats() == {'entries': 1, 'max_entries': 8, 'hits': 1, 'misses': 1,
+                                 'evictions': 0, 'hit_rate': 0.5}
+    
+    def test_disabled(self):
+        """Test that a zero-sized cache stores nothing and negative sizes are rejected."""
+        cache = ResponseCache(max_entries=0)
+        cache.put('a', 1, 'A')
+        assert not cache.enabled and cache.get('a', 1) is None
+        with pytest.raises(ValueError):
+            ResponseCache(max_entries=-1)
@@ -0,0 +1,43 @@
+"""
+Unit tests for the change log.
+"""
+
+import pytest
+from app.changelog import ChangeLog
+
+
+class TestChangeLog:
+    """Test cases for ChangeLog."""
+    
+    def test_since_returns_later_changes_in_order(self):
+        """Test that only changes after the given version are returned."""
+        log = ChangeLog()
+        start = log.version
+        first = log.record('create', [1, 2])
+        log.record('update', [1])
+        assert [(c.op, c.record_id) for c in log.since(start)] == [
+            ('create', 1), ('create', 2), ('update', 1)]
+        assert [(c.op, c.record_id) for c in log.since(first)] == [('update', 1)]
+        assert log.since(log.version) == []
+    
+    def test_overflow_moves_floor(self):
+        """Test that versions older than the dropped entries need a snapshot."""
+        log = ChangeLog(max_entries=2)
+        start = log.version
+        first = log.record('create', [1])
+        log.record('create', [2])
+        log.record('create', [3])
+        assert log.since(start) is None
+        assert [c.record_id for c in log.since(first)] == [2, 3]
+        log.record('create', [4, 5, 6])
+        assert log.since(first) is None
+    
+    def test_reset_and_unknown_versions(self):
+        """Test that reset and versions the log never issued force a snapshot."""
+        log = ChangeLog()
+        before = log.record('create', [1])
+        log.reset()
+        assert log.since(before) is None
+        assert log.since(log.version + 1) is None
+        with pytest.raises(ValueError):
+            ChangeLog(max_entries=0)
@@ -0,0 +1,96 @@
+"""
+Unit tests for the column-oriented appointment storage.
+"""
+
+import pytest
+from app import columnar
+from app.columnar import AppointmentTable, ColumnarAppointmentRepository, date_ordinal
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    """Use tiny blocks so rows span several of them."""
+    monkeypatch.setattr(columnar, 'BLOCK_SIZE', 3)
+
+
+class TestDateOrdinal:
+    """Test cases for date_ordinal."""
+    
+    def test_round_trip(self):
+        """Test that ISO dates convert to ordinals and back."""
+        assert columnar.iso_date(date_ordinal("2025-12-25")) == "2025-12-25"
+        assert date_ordinal("2025-12-26") - date_ordinal("2025-12-25") == 1
+    
+    def test_rejects_non_canonical_dates(self):
+        """Test that anything but YYYY-MM-DD is rejected."""
+        for bad in ["20251225", "2025-13-01", "25-12-2025", ""]:
+            with pytest.raises(ValueError):
+                date_ordinal(bad)
+
+
+class TestAppointmentTable:
+    """Test cases for AppointmentTable."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.table = AppointmentTable()
+    
+    def fill(self, count):
+        """Append count rows with IDs 1..count."""
+        for i in range(1, count + 1):
+            self.table.append(i, i % 3, date_ordinal("2025-12-25"), "Checkup")
+    
+    def test_lookup_across_blocks(self, small_blocks):
+        """Test get, contains and getitem over several blocks."""
+        self.fill(10)
+        assert len(self.table) == 10
+        assert self.table[7].patient_id == 1
+        assert self.table.get(11) is None
+        assert 4 in self.table and 0 not in self.table
+        with pytest.raises(KeyError):
+            self.table[11]
+    
+    def test_pop_keeps_order(self, small_blocks):
+        """Test removing rows, including emptying whole blocks."""
+        self.fill(10)
+        for appointment_id in [4, 5, 6, 3, 10]:
+            assert self.table.pop(appointment_id).id == appointment_id
+        with pytest.raises(KeyError):
+            self.table.pop(4)
+        assert [apt.id for apt in self.table.values()] == [1, 2, 7, 8, 9]
+        assert [apt.id for apt in self.table.window(2, 1, 2)] == [8, 9]
+        assert [apt.id for apt in self.table.window(None, 0, 10)] == [1, 2, 7, 8, 9]
+        assert [apt.id for apt in self.table.newest(3)] == [9, 8, 7]
+    
+    def test_append_requires_increasing_ids(self):
+        """Test that rows must arrive in ID order."""
+        self.fill(2)
+        with pytest.raises(ValueError):
+            self.table.append(2, 1, date_ordinal("2025-12-25"), "Checkup")
+    
+    def test_descriptions_are_shared(self):
+        """Test that equal descriptions are stored once."""
+        self.table.append(1, 1, 1, "".join(["Check", "up"]))
+        self.table.append(2, 1, 1, "".join(["Check", "up"]))
+        assert self.table[1].description is self.table[2].description
+
+
+class TestColumnarAppointmentRepository:
+    """Test cases specific to ColumnarAppointmentRepository."""
+    
+    def test_invalid_date_does_not_use_an_id(self):
+        """Test that a rejected create leaves no trace."""
+        repo = ColumnarAppointmentRepository()
+        with pytest.raises(ValueError):
+            repo.create(1, "25/12/2025", "Checkup")
+        assert repo.count() == 0
+        assert repo.create(1, "2025-12-25", "Checkup").id == 1
+    
+    def test_date_range_across_blocks(self, small_blocks):
+        """Test date range queries after deletes."""
+        repo = ColumnarAppointmentRepository()
+        for day in range(10, 20):
+            repo.create(day % 2, f"2025-12-{day}", f"Visit {day}")
+        repo.delete_by_patient_id(0)
+        results = repo.find_by_date_range("2025-12-12", "2025-12-17")
+        assert [apt.date for apt in results] == ["2025-12-13", "2025-12-15", "2025-12-17"]
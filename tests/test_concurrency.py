@@ -0,0 +1,126 @@
+"""
+Concurrency stress tests for the repositories.
+"""
+
+import random
+import sys
+import threading
+import pytest
+from app.locking import ReadWriteLock
+from app.repositories import registered_engines, create_repositories
+
+THREADS = 8
+OPERATIONS = 300
+
+
+@pytest.fixture
+def fast_switching():
+    """Switch threads very often to make races likely."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def run_threads(target, count=THREADS):
+    """Run target(thread_index) in several threads and re-raise any failure."""
+    errors = []
+    
+    def guarded(index):
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=guarded, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+class TestReadWriteLock:
+    """Test cases for ReadWriteLock."""
+    
+    def test_readers_share_the_lock(self):
+        """Test that readers do not block each other."""
+        lock = ReadWriteLock()
+        inside = threading.Barrier(3, timeout=5)
+        
+        def read(_):
+            with lock.read_locked():
+                inside.wait()
+        
+        run_threads(read, count=3)
+    
+    def test_writer_excludes_readers(self):
+        """Test that a writer holds the lock exclusively."""
+        lock = ReadWriteLock()
+        state = {'writing': False, 'overlaps': 0}
+        
+        def work(index):
+            for _ in range(200):
+                if index % 2:
+                    with lock.write_locked():
+                        state['writing'] = True
+                        state['writing'] = False
+                else:
+                    with lock.read_locked():
+                        if state['writing']:
+                            state['overlaps'] += 1
+        
+        run_threads(work, count=4)
+        assert state['overlaps'] == 0
+
+
+@pytest.mark.parametrize('engine', registered_engines())
+class TestRepositoryStress:
+    """Hammer each engine from many threads and check its invariants."""
+    
+    def test_concurrent_writes_keep_invariants(self, engine, tmp_path, fast_switching):
+        """Test that mixed concurrent operations never corrupt the repositories."""
+        patients, appointments = create_repositories(
+            engine, {'SQLITE_PATH': str(tmp_path / 'stress.db')})
+        created = [[] for _ in range(THREADS)]
+        deleted = [[] for _ in range(THREADS)]
+        
+        def work(index):
+            rng = random.Random(index)
+            mine = created[index]
+            for i in range(OPERATIONS):
+                action = rng.random()
+                if action < 0.5 or not mine:
+                    patient = patients.create(f"Patient {index}-{i}", "30", "1234567890")
+                    mine.append(patient.id)
+                    appointments.create(patient.id, "2025-12-25", f"Visit {index}-{i}")
+                elif action < 0.7:
+                    patients.update(rng.choice(mine), notes=f"thread {index}")
+                elif action < 0.8:
+                    patient_id = mine.pop(rng.randrange(len(mine)))
+                    appointments.delete_by_patient_id(patient_id)
+                    assert patients.delete(patient_id)
+                    deleted[index].append(patient_id)
+                else:
+                    patients.get_page(20)
+                    appointments.search(query="visit", date="2025-12-25")
+        
+        run_threads(work)
+        
+        all_created = [pid for ids in created for pid in ids]
+        all_deleted = [pid for ids in deleted for pid in ids]
+        # Every id was handed out exactly once
+        assert len(set(all_created + all_deleted)) == len(all_created) + len(all_deleted)
+        
+        remaining = patients.get_all()
+        assert sorted(p.id for p in remaining) == sorted(all_created)
+        assert patients.count() == len(all_created)
+        paged = patients.get_page(len(all_created) + 1)
+        assert [p.id for p in paged] == [p.id for p in remaining]
+        
+        assert appointments.count() == len(all_created)
+        assert sorted(apt.patient_id for apt in appointments.get_all()) == sorted(all_created)
+        for patient_id in all_deleted:
+            assert appointments.find_by_patient_id(patient_id) == []
+        assert len(appointments.search(query="visit")) == len(all_created)
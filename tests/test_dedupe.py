@@ -0,0 +1,67 @@
+"""
+Unit tests for batch duplicate detection.
+"""
+
+import pytest
+from app import app, repositories
+from app.dedupe import find_duplicate_clusters
+from app.models import Patient
+from app.sqlite_repositories import SqliteDatabase, SqlitePatientRepository
+
+
+class TestFindDuplicateClusters:
+    """Test cases for find_duplicate_clusters."""
+    
+    def test_groups_by_identity_key(self):
+        """Test that clusters hold patients with the same normalized name and phone."""
+        patients = [
+            Patient(3, "Smith, Anna", "31", "(091) 111-2222"),
+            Patient(1, "Anna Smith", "30", "0911112222"),
+            Patient(2, "John Doe", "40", "0913334444"),
+            Patient(4, "John Doe", "40", "0915556666"),
+            Patient(5, "anna smith", "30", "091 111 2222"),
+        ]
+        clusters = find_duplicate_clusters(patients)
+        assert len(clusters) == 1
+        assert [p.id for p in clusters[0].patients] == [1, 3, 5]
+        assert (clusters[0].phone, clusters[0].name) == ("0911112222", "anna smith")
+    
+    def test_no_duplicates(self):
+        """Test that unique patients form no clusters."""
+        assert find_duplicate_clusters([Patient(1, "Anna Smith", "30", "0911112222")]) == []
+    
+    def test_to_dict(self):
+        """Test the JSON form of a cluster."""
+        cluster = find_duplicate_clusters([Patient(1, "Anna", "30", "0911"),
+                                           Patient(2, "anna", "30", "0911")])[0]
+        assert [p['id'] for p in cluster.to_dict()['patients']] == [1, 2]
+
+
+class TestFindDuplicatesCommand:
+    """Test cases for the flask find-duplicates command."""
+    
+    @pytest.fixture(autouse=True)
+    def sqlite_engine(self, tmp_path, monkeypatch):
+        """Point the app config at a SQLite database and restore the repositories after."""
+        saved = (repositories.patient_repository, repositories.appointment_repository)
+        monkeypatch.setitem(app.config, 'REPOSITORY_ENGINE', 'sqlite')
+        monkeypatch.setitem(app.config, 'SQLITE_PATH', str(tmp_path / 'clinic.db'))
+        self.patients = SqlitePatientRepository(SqliteDatabase(str(tmp_path / 'clinic.db')))
+        yield
+        repositories.set_repositories(*saved)
+    
+    def test_reports_clusters(self):
+        """Test that clusters in the configured database are listed and the exit code is non-zero."""
+        first = self.patients.create("Anna Smith", "30", "0911112222")
+        second = self.patients.create("Anna Smith", "30", "091-111-2222")
+        result = app.test_cli_runner().invoke(args=['find-duplicates'])
+        assert result.exit_code == 1
+        assert f"#{first.id}, #{second.id}" in result.output
+        assert "Found 1 duplicate group(s), 1 extra record(s)" in result.output
+    
+    def test_clean_dataset(self):
+        """Test a dataset without duplicates."""
+        self.patients.create("Anna Smith", "30", "0911112222")
+        result = app.test_cli_runner().invoke(args=['find-duplicates'])
+        assert result.exit_code == 0
+        assert "Found 0 duplicate group(s)" in result.output
@@ -0,0 +1,328 @@
+"""
+Conformance tests run against every registered storage engine.
+"""
+
+import pytest
+from app.repositories import (
+    registered_engines, create_repositories,
+    PatientRepositoryProtocol, AppointmentRepositoryProtocol
+)
+
+
+@pytest.fixture(params=registered_engines())
+def engine(request, tmp_path):
+    """Create a fresh (patients, appointments) repository pair for each engine."""
+    config = {'SQLITE_PATH': str(tmp_path / 'conformance.db'), 'CHANGE_LOG_SIZE': 4}
+    return create_repositories(request.param, config)
+
+
+@pytest.fixture
+def patients(engine):
+    """Patient repository of the engine under test."""
+    return engine[0]
+
+
+@pytest.fixture
+def appointments(engine):
+    """Appointment repository of the engine under test."""
+    return engine[1]
+
+
+class TestPatientConformance:
+    """Behaviour every patient repository must share."""
+    
+    def test_implements_protocol(self, patients):
+        """Test that the repository satisfies the protocol."""
+        assert isinstance(patients, PatientRepositoryProtocol)
+    
+    def test_create_and_find(self, patients):
+        """Test creating and finding patients."""
+        first = patients.create("John Doe", "30", "123-456-7890", "Notes")
+        second = patients.create("Jane Smith", "25", "098-765-4321")
+        assert (first.id, second.id) == (1, 2)
+        assert patients.find_by_id(first.id).notes == "Notes"
+        assert patients.find_by_id(999) is None
+    
+    def test_find_by_ids(self, patients):
+        """Test batched lookups ignore duplicates and missing IDs."""
+        first = patients.create("John Doe", "30", "123-456-7890")
+        found = patients.find_by_ids([first.id, first.id, 999])
+        assert list(found) == [first.id]
+        assert found[first.id].name == "John Doe"
+    
+    def test_update(self, patients):
+        """Test partial updates."""
+        patient = patients.create("John Doe", "30", "123-456-7890")
+        updated = patients.update(patient.id, phone="555-000-1111")
+        assert (updated.name, updated.phone) == ("John Doe", "555-000-1111")
+        assert patients.find_by_id(patient.id).phone == "555-000-1111"
+        assert patients.update(999, name="Nobody") is None
+    
+    def test_delete(self, patients):
+        """Test deleting patients."""
+        patient = patients.create("John Doe", "30", "123-456-7890")
+        assert patients.delete(patient.id) is True
+        assert patients.delete(patient.id) is False
+        assert patients.find_by_id(patient.id) is None
+        assert patients.count() == 0
+    
+    def test_ordering_and_pagination(self, patients):
+        """Test get_all, get_page and get_recent ordering."""
+        ids = [patients.create(f"Patient {i}", "30", "123-456-7890").id for i in range(5)]
+        patients.delete(ids[1])
+        assert [p.id for p in patients.get_all()] == [ids[0], ids[2], ids[3], ids[4]]
+        assert [p.id for p in patients.get_page(2, offset=1)] == [ids[2], ids[3]]
+        assert [p.id for p in patients.get_page(5, after_id=ids[2])] == [ids[3], ids[4]]
+        assert [p.id for p in patients.get_recent(2)] == [ids[4], ids[3]]
+    
+    def test_clear(self, patients):
+        """Test clearing the repository."""
+        patients.create("John Doe", "30", "123-456-7890")
+        patients.clear()
+        assert patients.count() == 0
+        assert patients.get_all() == []
+    
+    def test_create_many(self, patients):
+        """Test batched creation assigns consecutive IDs in input order."""
+        first = patients.create("John Doe", "30", "123-456-7890")
+        created = patients.create_many([("Jane Smith", "25", "098-765-4321", ""),
+                                        ("Jim Beam", "40", "111-222-3333", "VIP")])
+        assert [p.id for p in created] == [first.id + 1, first.id + 2]
+        assert patients.find_by_id(created[1].id).notes == "VIP"
+        assert [p.id for p in patients.get_page(5, after_id=first.id)] == [p.id for p in created]
+        assert patients.create_many([]) == []
+        assert patients.count() == 3
+    
+    def test_empty_create_many_keeps_version(self, patients):
+        """Test that creating no patients is not reported as a change."""
+        patients.create("John Doe", "30", "123-456-7890")
+        version = patients.version
+        assert patients.create_many([]) == []
+        assert patients.version == version
+        assert patients.changes_since(version) == []
+    
+    def test_ids_never_reused(self, patients):
+        """Test that deleting or clearing never releases an ID."""
+        first = patients.create("John Doe", "30", "123-456-7890")
+        patients.delete(first.id)
+        second = patients.create("Jane Smith", "25", "098-765-4321")
+        patients.clear()
+        third = patients.create("Jim Beam", "40", "111-222-3333")
+        assert first.id < second.id < third.id
+    
+    def test_allocate_ids(self, patients):
+        """Test that reserved ID blocks are contiguous and skipped by create."""
+        first = patients.create("John Doe", "30", "123-456-7890")
+        block = patients.allocate_ids(3)
+        assert list(block) == [first.id + 1, first.id + 2, first.id + 3]
+        assert patients.allocate_ids(0) == range(block.stop, block.stop)
+        assert patients.create("Jane Smith", "25", "098-765-4321").id == block.stop
+        with pytest.raises(ValueError):
+            patients.allocate_ids(-1)
+    
+    def test_changes_since(self, patients):
+        """Test the change log and its size bound (CHANGE_LOG_SIZE is 4 here)."""
+        start = patients.version
+        patient = patients.create("John Doe", "30", "123-456-7890")
+        patients.update(patient.id, notes="Allergic")
+        synced = patients.version
+        patients.delete(patient.id)
+        assert [(c.op, c.record_id) for c in patients.changes_since(start)] == [
+            ('create', patient.id), ('update', patient.id), ('delete', patient.id)]
+        assert [c.op for c in patients.changes_since(synced)] == ['delete']
+        patients.create_many([("Jane Smith", "25", "098-765-4321", "")] * 2)
+        assert patients.changes_since(start) is None
+        assert len(patients.changes_since(synced)) == 3
+    
+    def test_version_changes_on_every_write(self, patients):
+        """Test that each mutation changes the version and reads do not."""
+        versions = [patients.version]
+        patient = patients.create("John Doe", "30", "123-456-7890")
+        versions.append(patients.version)
+        patients.update(patient.id, name="John Smith")
+        versions.append(patients.version)
+        patients.get_all()
+        patients.update(999, name="Nobody")
+        patients.delete(999)
+        assert patients.version == versions[-1]
+        patients.create_many([("Jane Smith", "25", "098-765-4321", "")])
+        versions.append(patients.version)
+        patients.delete(patient.id)
+        versions.append(patients.version)
+        patients.clear()
+        versions.append(patients.version)
+        assert len(set(versions)) == len(versions)
+    
+    def test_search(self, patients):
+        """Test name prefix, fuzzy and phone search; order within a group may differ."""
+        anna, annabel, john, jon = patients.create_many([
+            ("Anna Smith", "30", "091-111 2222", ""),
+            ("Annabel Jones", "40", "555 1234", ""),
+            ("John Smyth", "50", "(091) 333-2222", ""),
+            ("Jon Smith", "20", "0911112222", "")])
+        ids = lambda query, limit=10: [p.id for p in patients.search(query, limit)]
+        assert set(ids("ann")) == {anna.id, annabel.id}
+        assert ids("smi ann") == [anna.id]
+        # Prefix matches come before the misspelled 'smyth'
+        assert set(ids("smith")[:2]) == {anna.id, jon.id}
+        assert ids("smith")[2] == john.id
+        assert set(ids("smiht")) == {anna.id, jon.id}
+        assert set(ids("0911112222")) == {anna.id, jon.id}
+        assert set(ids("2222")) == {anna.id, john.id, jon.id}
+        assert ids("3332222") == [john.id]
+        assert len(ids("smith", 1)) == 1
+        assert ids("") == []
+    
+    def test_search_follows_writes(self, patients):
+        """Test that updates, deletes and clear keep the search indexes current."""
+        patient = patients.create("Anna Smith", "30", "091-111 2222")
+        patients.update(patient.id, name="Hanna Brown", phone="555 1234")
+        assert [p.id for p in patients.search("hann")] == [patient.id]
+        assert patients.search("smith") == []
+        assert [p.id for p in patients.search("5551234")] == [patient.id]
+        assert patients.search("2222") == []
+        patients.delete(patient.id)
+        assert patients.search("hann") == []
+        patients.create("Jon Smith", "20", "0911112222")
+        patients.clear()
+        assert patients.search("jon") == []
+
+
+    def test_find_duplicates(self, patients):
+        """Test identity lookups ignore formatting and follow updates."""
+        first = patients.create("Anna Smith", "30", "091-111 2222")
+        second = patients.create("smith, anna", "31", "(091) 1112222")
+        patients.create("Anna Smith", "30", "0913334444")
+        assert [p.id for p in patients.find_duplicates("ANNA SMITH", "0911112222")] == [
+            first.id, second.id]
+        patients.update(second.id, phone="0915556666")
+        assert [p.id for p in patients.find_duplicates("Anna Smith", "0911112222")] == [first.id]
+        patients.delete(first.id)
+        assert patients.find_duplicates("Anna Smith", "0911112222") == []
+
+
+class TestAppointmentConformance:
+    """Behaviour every appointment repository must share."""
+    
+    def test_implements_protocol(self, appointments):
+        """Test that the repository satisfies the protocol."""
+        assert isinstance(appointments, AppointmentRepositoryProtocol)
+    
+    def test_create_and_find(self, appointments):
+        """Test creating and finding appointments."""
+        appointment = appointments.create(1, "2025-12-25", "Checkup")
+        assert appointment.id == 1
+        found = appointments.find_by_id(appointment.id)
+        assert (found.patient_id, found.date, found.description) == (1, "2025-12-25", "Checkup")
+        assert appointments.find_by_id(999) is None
+    
+    def test_patient_queries_and_cascade(self, appointments):
+        """Test per-patient lookups and cascading deletes."""
+        appointments.create(1, "2025-12-25", "Checkup")
+        kept = appointments.create(2, "2025-12-26", "Other")
+        appointments.create(1, "2025-12-27", "Follow-up")
+        assert [apt.description for apt in appointments.find_by_patient_id(1)] == ["Checkup", "Follow-up"]
+        assert appointments.delete_by_patient_id(1) == 2
+        assert appointments.find_by_patient_id(1) == []
+        assert [apt.id for apt in appointments.get_all()] == [kept.id]
+        assert appointments.create(3, "2025-12-28", "New").id > kept.id
+    
+    def test_date_queries(self, appointments):
+        """Test exact date and date range searches."""
+        appointments.create(1, "2025-12-27", "Late")
+        appointments.create(1, "2025-12-20", "Early")
+        appointments.create(2, "2025-12-25", "Middle")
+        in_range = appointments.find_by_date_range("2025-12-21", "2025-12-31")
+        assert [apt.description for apt in in_range] == ["Middle", "Late"]
+        assert [apt.description for apt in appointments.search(date="2025-12-20")] == ["Early"]
+        results = appointments.search(patient_id=1, date_from="2025-12-21")
+        assert [apt.description for apt in results] == ["Late"]
+    
+    def test_description_search(self, appointments):
+        """Test each description matching mode."""
+        appointments.create(1, "2025-12-25", "General Checkup")
+        appointments.create(2, "2025-12-26", "Dental checkup and cleaning")
+        appointments.create(2, "2025-12-27", "Follow-up Visit")
+        assert {apt.id for apt in appointments.search(query="checkup", match="term")} == {1, 2}
+        assert {apt.id for apt in appointments.search(query="CHECK clean")} == {2}
+        assert appointments.search(query="check", match="term") == []
+        assert [apt.id for apt in appointments.search(query="low-u", match="substring")] == [3]
+        assert [apt.id for apt in appointments.search(query="checkup", patient_id=1)] == [1]
+        with pytest.raises(ValueError):
+            appointments.search(query="checkup", match="fuzzy")
+    
+    def test_pagination(self, appointments):
+        """Test get_page and get_recent."""
+        ids = [appointments.create(1, "2025-12-25", f"Visit {i}").id for i in range(4)]
+        assert [apt.id for apt in appointments.get_page(2, after_id=ids[0])] == ids[1:3]
+        assert [apt.id for apt in appointments.get_recent(1)] == [ids[3]]
+    
+    def test_clear(self, appointments):
+        """Test clearing the repository."""
+        appointments.create(1, "2025-12-25", "Checkup")
+        appointments.clear()
+        assert appointments.count() == 0
+        assert appointments.search(query="checkup") == []
+    
+    def test_create_many(self, appointments):
+        """Test batched creation updates every index."""
+        created = appointments.create_many([(1, "2025-12-26", "Dental cleaning"),
+                                            (2, "2025-12-25", "Checkup"),
+                                            (1, "2025-12-27", "Follow-up")])
+        assert [apt.id for apt in created] == [1, 2, 3]
+        assert [apt.id for apt in appointments.find_by_patient_id(1)] == [1, 3]
+        assert [apt.id for apt in appointments.find_by_date_range("2025-12-25", "2025-12-26")] == [2, 1]
+        assert [apt.id for apt in appointments.search(query="clean")] == [1]
+        assert appointments.create(1, "2025-12-28", "Review").id == 4
+    
+    def test_empty_create_many_keeps_version(self, appointments):
+        """Test that creating no appointments is not reported as a change."""
+        version = appointments.version
+        assert appointments.create_many([]) == []
+        assert appointments.version == version
+        assert appointments.create(1, "2025-12-28", "Review").id == 1
+    
+    def test_ids_never_reused(self, appointments):
+        """Test that cascade deletes and clearing never release an ID."""
+        first = appointments.create(1, "2025-12-25", "Checkup")
+        appointments.delete_by_patient_id(1)
+        second = appointments.create(1, "2025-12-26", "Follow-up")
+        appointments.clear()
+        third = appointments.create(1, "2025-12-27", "Review")
+        assert first.id < second.id < third.id
+    
+    def test_allocate_ids(self, appointments):
+        """Test that reserved ID blocks are skipped by create."""
+        block = appointments.allocate_ids(5)
+        assert list(block) == [1, 2, 3, 4, 5]
+        assert appointments.create(1, "2025-12-25", "Checkup").id == 6
+    
+    def test_changes_since(self, appointments):
+        """Test that cascade deletes are logged per appointment."""
+        start = appointments.version
+        first = appointments.create(1, "2025-12-25", "Checkup")
+        second = appointments.create(1, "2025-12-26", "Follow-up")
+        appointments.delete_by_patient_id(1)
+        assert [(c.op, c.record_id) for c in appointments.changes_since(start)] == [
+            ('create', first.id), ('create', second.id),
+            ('delete', first.id), ('delete', second.id)]
+        appointments.clear()
+        assert appointments.changes_since(start) is None
+        assert appointments.changes_since(appointments.version) == []
+    
+    def test_version_changes_on_every_write(self, appointments):
+        """Test that each mutation changes the version and reads do not."""
+        versions = [appointments.version]
+        appointments.create(1, "2025-12-25", "Checkup")
+        versions.append(appointments.version)
+        appointments.create_many([(2, "2025-12-26", "Follow-up")])
+        versions.append(appointments.version)
+        appointments.search(query="checkup")
+        assert appointments.version == versions[-1]
+        appointments.delete_by_patient_id(3)
+        assert appointments.version == versions[-1]
+        appointments.delete_by_patient_id(1)
+        versions.append(appointments.version)
+        appointments.clear()
+        versions.append(appointments.version)
+        assert len(set(versions)) == len(versions)
@@ -0,0 +1,204 @@
+"""
+Unit tests for bulk import and the import CLI commands.
+"""
+
+import io
+import pytest
+from app import app, repositories
+from app.importer import import_patients, import_appointments, read_records
+from app.repositories import (
+    AppointmentRepository, PatientRepository, patient_repository, appointment_repository
+)
+from app.sqlite_repositories import (
+    SqliteAppointmentRepository, SqliteDatabase, SqlitePatientRepository
+)
+from app.wal import DurableStore
+
+
+@pytest.fixture(autouse=True)
+def empty_repositories():
+    """Start every test with empty repositories."""
+    patient_repository.clear()
+    appointment_repository.clear()
+
+
+class TestReadRecords:
+    """Test cases for read_records."""
+    
+    def test_csv_headers_are_normalized(self):
+        """Test that export-style headers map to field names."""
+        stream = io.StringIO("Name,Patient ID\nJohn,7\n\nJane,8\n")
+        records = list(read_records(stream, 'csv'))
+        assert records == [(2, {'name': 'John', 'patient_id': '7'}, None),
+                           (4, {'name': 'Jane', 'patient_id': '8'}, None)]
+    
+    def test_jsonl_errors_are_per_line(self):
+        """Test that malformed lines are reported without stopping the stream."""
+        stream = io.StringIO('{"name": "John", "age": 30}\nnot json\n[1]\n')
+        records = list(read_records(stream, 'jsonl'))
+        assert records[0] == (1, {'name': 'John', 'age': '30'}, None)
+        assert records[1][0] == 2 and "Invalid JSON" in records[1][2]
+        assert records[2] == (3, None, "Each line must be a JSON object")
+    
+    def test_unknown_format(self):
+        """Test that an unknown format is rejected."""
+        with pytest.raises(ValueError):
+            list(read_records(io.StringIO(""), 'xml'))
+
+
+class TestImportPatients:
+    """Test cases for import_patients."""
+    
+    def test_valid_rows_imported_and_errors_reported(self):
+        """Test a mix of valid and invalid rows across several batches."""
+        stream = io.StringIO(
+            "name,age,phone,notes\n"
+            " John Doe ,30,091-111-2222,First\n"
+            "J,30,0911112222,\n"
+            "Jane Smith,abc,0911112222,\n"
+            "Jim Beam,40,0911112222,\n"
+        )
+        report = import_patients(stream, batch_size=2)
+        assert (report.imported, report.failed) == (2, 2)
+        assert [row for row, _ in report.errors] == [3, 4]
+        assert "2 characters" in report.errors[0][1]
+        names = [p.name for p in patient_repository.get_all()]
+        assert names == ["John Doe", "Jim Beam"]
+    
+    def test_jsonl(self):
+        """Test importing JSON Lines."""
+        stream = io.StringIO('{"name": "John Doe", "age": 30, "phone": "0911112222"}\n')
+        report = import_patients(stream, 'jsonl')
+        assert report.to_dict() == {'imported': 1, 'merged': 0, 'failed': 0, 'errors': []}
+        assert patient_repository.get_all()[0].age == "30"
+    
+    def test_reject_policy_rejects_duplicate_rows(self, monkeypatch):
+        """Test that duplicates of existing patients and of earlier rows are failed rows."""
+        monkeypatch.setattr('app.services.duplicate_policy', 'reject')
+        existing = patient_repository.create("Anna Smith", "30", "0911112222")
+        stream = io.StringIO(
+            "name,age,phone\n"
+            "anna smith,31,091-111-2222\n"
+            "John Doe,40,0913334444\n"
+            "Jim Beam,50,0915556666\n"
+            "JOHN DOE,41,0913334444\n"
+        )
+        report = import_patients(stream, batch_size=3)
+        assert (report.imported, report.failed) == (2, 2)
+        assert report.errors == [
+            (2, f"A patient with this name and phone number already exists (#{existing.id})"),
+            (5, f"A patient with this name and phone number already exists "
+                f"(#{existing.id + 1})"),
+        ]
+        stream = io.StringIO("name,age,phone\nSara Omar,25,0917778888\nsara omar,26,0917778888\n")
+        report = import_patients(stream)
+        assert report.errors == [(3, "Duplicates row 2")]
+        assert [p.name for p in patient_repository.get_all()] == [
+            "Anna Smith", "John Doe", "Jim Beam", "Sara Omar"]
+    
+    def test_merge_policy_merges_duplicate_rows(self, monkeypatch):
+        """Test that duplicate rows update the patient they duplicate."""
+        monkeypatch.setattr('app.services.duplicate_policy', 'merge')
+        existing = patient_repository.create("Anna Smith", "30", "0911112222")
+        stream = io.StringIO(
+            "name,age,phone,notes\n"
+            "anna smith,31,091-111-2222,Allergic\n"
+            "John Doe,40,0913334444,\n"
+            "john doe,41,0913334444,\n"
+        )
+        report = import_patients(stream)
+        assert (report.imported, report.merged, report.failed) == (1, 2, 0)
+        assert patient_repository.count() == 2
+        assert patient_repository.find_by_id(existing.id).notes == "Allergic"
+        assert patient_repository.find_by_id(existing.id + 1).age == "41"
+
+
+class TestImportAppointments:
+    """Test cases for import_appointments."""
+    
+    def test_unknown_patients_rejected(self):
+        """Test that rows must refer to existing patients."""
+        patient = patient_repository.create("John Doe", "30", "0911112222")
+        stream = io.StringIO(
+            "patient_id,date,description\n"
+            f"{patient.id},2025-12-25,Checkup\n"
+            "999,2025-12-25,Checkup\n"
+            f"{patient.id},2025-13-01,Checkup\n"
+            "x,2025-12-25,Checkup\n"
+        )
+        report = import_appointments(stream)
+        assert report.imported == 1
+        assert sorted(report.errors) == [(3, "Patient not found"), (4, "Invalid date"),
+                                         (5, "Patient ID must be a number")]
+        assert len(appointment_repository.find_by_patient_id(patient.id)) == 1
+
+
+class TestImportCommands:
+    """Test cases for the flask import CLI commands."""
+    
+    @pytest.fixture(autouse=True)
+    def sqlite_engine(self, tmp_path, monkeypatch):
+        """Point the app config at a SQLite database and restore the repositories after."""
+        saved = (repositories.patient_repository, repositories.appointment_repository)
+        monkeypatch.setitem(app.config, 'REPOSITORY_ENGINE', 'sqlite')
+        monkeypatch.setitem(app.config, 'SQLITE_PATH', str(tmp_path / 'clinic.db'))
+        yield
+        repositories.set_repositories(*saved)
+    
+    def test_import_patients_command(self, tmp_path):
+        """Test importing a file from the command line into the configured engine."""
+        path = tmp_path / 'patients.jsonl'
+        path.write_text('{"name": "John Doe", "age": "30", "phone": "0911112222"}\n')
+        result = app.test_cli_runner().invoke(args=['import-patients', str(path)])
+        assert result.exit_code == 0
+        assert "Imported 1 patients" in result.output
+        assert isinstance(repositories.patient_repository, SqlitePatientRepository)
+        assert patient_repository.count() == 0
+        
+        stored = SqlitePatientRepository(SqliteDatabase(str(tmp_path / 'clinic.db')))
+        assert [(p.name, p.phone) for p in stored.get_all()] == [("John Doe", "0911112222")]
+    
+    def test_import_appointments_command(self, tmp_path):
+        """Test that imported appointments reach the SQLite database."""
+        database = SqliteDatabase(str(tmp_path / 'clinic.db'))
+        patient = SqlitePatientRepository(database).create("John Doe", "30", "0911112222")
+        result = app.test_cli_runner().invoke(
+            args=['import-appointments', '-'],
+            input=f"patient_id,date,description\n{patient.id},2025-12-25,Checkup\n")
+        assert result.exit_code == 0
+        stored = SqliteAppointmentRepository(database).find_by_patient_id(patient.id)
+        assert [(a.date, a.description) for a in stored] == [("2025-12-25", "Checkup")]
+    
+    def test_refuses_in_memory_engine(self, tmp_path, monkeypatch):
+        """Test that imports into a store discarded on exit are refused."""
+        monkeypatch.setitem(app.config, 'REPOSITORY_ENGINE', 'memory')
+        monkeypatch.setitem(app.config, 'DURABILITY_PATH', None)
+        path = tmp_path / 'patients.jsonl'
+        path.write_text('{"name": "John Doe", "age": "30", "phone": "0911112222"}\n')
+        result = app.test_cli_runner().invoke(args=['import-patients', str(path)])
+        assert result.exit_code == 1
+        assert "keeps data only until the command exits" in result.output
+        assert "Imported" not in result.output
+    
+    def test_durable_in_memory_engine(self, tmp_path, monkeypatch):
+        """Test importing into the memory engine with a write-ahead log."""
+        monkeypatch.setitem(app.config, 'REPOSITORY_ENGINE', 'memory')
+        monkeypatch.setitem(app.config, 'DURABILITY_PATH', str(tmp_path / 'data'))
+        path = tmp_path / 'patients.jsonl'
+        path.write_text('{"name": "John Doe", "age": "30", "phone": "0911112222"}\n')
+        result = app.test_cli_runner().invoke(args=['import-patients', str(path)])
+        assert result.exit_code == 0
+        repositories.durable_store.close()
+        store = DurableStore(str(tmp_path / 'data'), {'patients': PatientRepository(),
+                                                      'appointments': AppointmentRepository()})
+        assert [p.name for p in store.repositories['patients'].get_all()] == ["John Doe"]
+        store.close()
+    
+    def test_import_command_reports_errors(self):
+        """Test that rejected rows are listed and the exit code is non-zero."""
+        result = app.test_cli_runner().invoke(
+            args=['import-appointments', '-'],
+            input="patient_id,date,description\n1,bad,Checkup\n")
+        assert result.exit_code == 1
+        assert "row 2: Patient ID" not in result.output
+        assert "row 2: Date must be in YYYY-MM-DD format" in result.output
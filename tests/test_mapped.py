@@ -0,0 +1,247 @@
+"""
+Unit tests for memory-mapped snapshots and the repositories built on them.
+"""
+
+import os
+import random
+import threading
+
+import pytest
+from app.mapped import LayeredIds, MappedAppointmentRepository, MappedPatientRepository
+from app.repositories import AppointmentRepository, PatientRepository
+from app.snapshot import (
+    SNAPSHOT_FORMAT_VERSION, MappedSnapshot, SnapshotFormatError, write_snapshot
+)
+from app.wal import DurableStore
+
+PATIENT_SCHEMA = 'issss'
+APPOINTMENT_SCHEMA = 'iiss'
+
+
+def snapshot_of(tmp_path, patients, appointments, segment=1):
+    """Write two repositories' contents to a snapshot and map it."""
+    path = str(tmp_path / 'snapshot.bin')
+    with patients.snapshot_state() as patient_state, \
+            appointments.snapshot_state() as appointment_state:
+        with open(path, 'wb') as stream:
+            write_snapshot(stream, segment, {
+                'patients': (PATIENT_SCHEMA, *patient_state),
+                'appointments': (APPOINTMENT_SCHEMA, *appointment_state),
+            })
+    return MappedSnapshot(path)
+
+
+def populated(size=40):
+    """A plain repository pair with patients and appointments, some deleted."""
+    patients, appointments = PatientRepository(), AppointmentRepository()
+    names = ['Anna Smith', 'John Doe', 'Maria Garcia', 'Sara Omar', 'Ahmed Ali']
+    for i in range(size):
+        patient = patients.create(names[i % 5], str(20 + i), f'091-{i:04d}', f'note {i}')
+        appointments.create(patient.id, f'2025-10-{1 + i % 28:02d}', f'Checkup visit {i}')
+    for patient_id in (3, 7, 20):
+        patients.delete(patient_id)
+        appointments.delete_by_patient_id(patient_id)
+    patients.allocate_ids(2)
+    return patients, appointments
+
+
+class TestSnapshotFormat:
+    """Test cases for writing and mapping snapshots."""
+
+    def test_round_trip(self, tmp_path):
+        """Test that every row and the header fields read back."""
+        patients, appointments = populated()
+        snapshot = snapshot_of(tmp_path, patients, appointments, segment=7)
+        table = snapshot.tables['patients']
+        assert snapshot.segment == 7
+        assert table.high_water_mark == 42
+        assert list(table.rows()) == [(p.id, p.name, p.age, p.phone, p.notes)
+                                      for p in patients.get_all()]
+        assert table.find(4) == 2
+        assert table.find(3) == -1
+        assert len(snapshot.tables['appointments']) == appointments.count()
+
+    def test_text_and_empty_tables(self, tmp_path):
+        """Test non-ASCII text and tables without rows."""
+        path = str(tmp_path / 'snapshot.bin')
+        with open(path, 'wb') as stream:
+            write_snapshot(stream, 1, {
+                'patients': (PATIENT_SCHEMA, 5, [(5, 'Añna 李', '3', '', 'x')]),
+                'appointments': (APPOINTMENT_SCHEMA, 0, []),
+            })
+        snapshot = MappedSnapshot(path)
+        assert snapshot.tables['patients'].row(0) == (5, 'Añna 李', '3', '', 'x')
+        assert list(snapshot.tables['appointments'].rows()) == []
+
+    def test_rejects_truncated_file(self, tmp_path):
+        """Test that a snapshot cut short is not mapped."""
+        snapshot_of(tmp_path, *populated())
+        path = str(tmp_path / 'snapshot.bin')
+        with open(path, 'r+b') as stream:
+            stream.truncate(os.path.getsize(path) - 8)
+        with pytest.raises(SnapshotFormatError):
+            MappedSnapshot(path)
+
+    def test_rejects_other_version(self, tmp_path):
+        """Test that a snapshot of another format version is not mapped."""
+        snapshot_of(tmp_path, *populated())
+        path = str(tmp_path / 'snapshot.bin')
+        with open(path, 'r+b') as stream:
+            stream.seek(8)
+            stream.write((SNAPSHOT_FORMAT_VERSION + 1).to_bytes(4, 'little'))
+        with pytest.raises(SnapshotFormatError):
+            MappedSnapshot(path)
+
+
+class TestLayeredIds:
+    """Test cases for LayeredIds."""
+
+    def test_matches_sorted_ids(self):
+        """Test windows and iteration against a plain sorted list."""
+        ids = LayeredIds(list(range(1, 101)))
+        expected = list(range(1, 101))
+        rng = random.Random(5)
+        for record_id in rng.sample(expected, 30):
+            assert ids.discard(record_id)
+            expected.remove(record_id)
+        assert not ids.discard(expected[0] + 1000)
+        for record_id in range(101, 121):
+            ids.add(record_id)
+            expected.append(record_id)
+        ids.discard(110)
+        expected.remove(110)
+        assert list(ids) == expected
+        assert list(reversed(ids)) == expected[::-1]
+        assert len(ids) == len(expected)
+        for minimum in (None, 0, 17, 55, 100, 105, 200):
+            qualifying = [i for i in expected if minimum is None or i > minimum]
+            for offset in (0, 1, 9, 40, 80):
+                assert ids.islice_after(minimum, offset, 7) == qualifying[offset:offset + 7]
+
+
+class TestMappedRepositories:
+    """Test that repositories loaded from a snapshot behave like plain ones."""
+
+    @pytest.fixture
+    def pairs(self, tmp_path):
+        """A populated plain pair and a mapped pair loaded from its snapshot."""
+        plain_patients, plain_appointments = populated()
+        snapshot = snapshot_of(tmp_path, plain_patients, plain_appointments)
+        patients, appointments = MappedPatientRepository(), MappedAppointmentRepository()
+        patients.load_snapshot(snapshot.tables['patients'])
+        appointments.load_snapshot(snapshot.tables['appointments'])
+        return (plain_patients, plain_appointments), (patients, appointments)
+
+    @staticmethod
+    def reads(patients, appointments):
+        """Results of the read methods, as dictionaries."""
+        def rows(records):
+            return [record.to_dict() for record in records]
+        return {
+            'count': (patients.count(), appointments.count()),
+            'all': (rows(patients.get_all()), rows(appointments.get_all())),
+            'pages': [rows(patients.get_page(5, offset)) for offset in (0, 5, 30)]
+                     + [rows(appointments.get_page(4, after_id=after)) for after in (0, 10, 38)],
+            'recent': (rows(patients.get_recent(3)), rows(appointments.get_recent(3))),
+            'find': [p.to_dict() if p else None for p in map(patients.find_by_id, (1, 3, 41))],
+            'search': [rows(patients.search(query)) for query in ('ann', 'smiht', '0910041')],
+            'duplicates': rows(patients.find_duplicates('anna smith', '091-0000')),
+            'by_patient': rows(appointments.find_by_patient_id(6)),
+            'dates': rows(appointments.find_by_date_range('2025-10-05', '2025-10-07')),
+            'text': rows(appointments.search('visit 1', match='prefix')),
+        }
+
+    def test_reads_match_after_load(self, pairs):
+        """Test that a freshly loaded pair reads like the original."""
+        plain, mapped = pairs
+        assert self.reads(*mapped) == self.reads(*plain)
+
+    def test_writes_match(self, pairs):
+        """Test updates, deletes and creates over snapshot rows."""
+        plain, mapped = pairs
+        for patients, appointments in (plain, mapped):
+            patients.update(1, name='Anna Smithson', phone='092-5555')
+            patients.update(2, notes='changed')
+            patients.delete(4)
+            appointments.delete_by_patient_id(4)
+            new = patients.create('Zed Zulu', '50', '093-1234')
+            appointments.create(new.id, '2025-10-06', 'New visit')
+            patients.delete(new.id - 1)
+        assert self.reads(*mapped) == self.reads(*plain)
+
+    def test_writes_before_indexing(self, pairs):
+        """Test that writes made before the first indexed read are indexed."""
+        plain, mapped = pairs
+        for patients, appointments in (plain, mapped):
+            patients.update(1, name='Zara Quinn')
+            appointments.create(1, '2025-10-06', 'Dental visit')
+        assert [p.id for p in mapped[0].search('zara')] == [1]
+        assert self.reads(*mapped) == self.reads(*plain)
+
+    def test_index_built_outside_the_lock(self, pairs, monkeypatch):
+        """Test that writes proceed while snapshot rows are indexed, and are indexed too."""
+        plain, mapped = pairs
+        table = mapped[0]._patients.table
+        rows = table.rows
+
+        def rows_with_concurrent_write():
+            for position, row in enumerate(rows()):
+                if position == 5:
+                    thread = threading.Thread(target=mapped[0].update, args=(1,),
+                                              kwargs={'name': 'Zara Quinn'})
+                    thread.start()
+                    thread.join(timeout=5)
+                    assert not thread.is_alive()
+                yield row
+
+        monkeypatch.setattr(table, 'rows', rows_with_concurrent_write)
+        plain[0].update(1, name='Zara Quinn')
+        assert [p.id for p in mapped[0].search('zara')] == [1]
+        assert self.reads(*mapped) == self.reads(*plain)
+
+    def test_ids_continue_after_snapshot(self, pairs):
+        """Test that reserved IDs are not handed out again."""
+        _, (patients, appointments) = pairs
+        assert patients.create('New', '1', '1').id == 43
+        assert appointments.create(1, '2025-10-01', 'x').id == 41
+
+    def test_clear(self, pairs):
+        """Test that clear() drops the snapshot rows too."""
+        _, (patients, appointments) = pairs
+        patients.clear()
+        appointments.clear()
+        assert (patients.count(), appointments.count()) == (0, 0)
+        assert patients.get_all() == [] and patients.search('anna') == []
+        assert appointments.find_by_patient_id(1) == []
+
+
+class TestDurableStoreMapping:
+    """Test that recovery maps the snapshot instead of replaying it."""
+
+    def test_recovers_into_mapped_repositories(self, tmp_path):
+        """Test recovery from a snapshot plus later log into lazy repositories."""
+        store = DurableStore(str(tmp_path), {'patients': MappedPatientRepository(),
+                                             'appointments': MappedAppointmentRepository()},
+                             snapshot_every=0)
+        patients, appointments = store.repositories.values()
+        anna = patients.create('Anna', '30', '091')
+        appointments.create(anna.id, '2025-10-22', 'Checkup')
+        store.snapshot()
+        patients.update(anna.id, name='Anna Smith')
+        store.close()
+
+        recovered = DurableStore(str(tmp_path), {'patients': MappedPatientRepository(),
+                                                 'appointments': MappedAppointmentRepository()},
+                                 snapshot_every=0)
+        patients, appointments = recovered.repositories.values()
+        assert isinstance(patients._patients._table.ids, memoryview)
+        assert patients.find_by_id(anna.id).name == 'Anna Smith'
+        assert [a.description for a in appointments.find_by_patient_id(anna.id)] == ['Checkup']
+        # A second snapshot from mapped repositories reads back the same
+        recovered.snapshot()
+        recovered.close()
+        again = DurableStore(str(tmp_path), {'patients': PatientRepository(),
+                                             'appointments': AppointmentRepository()},
+                             snapshot_every=0)
+        assert [p.name for p in again.repositories['patients'].search('smith')] == ['Anna Smith']
+        again.close()
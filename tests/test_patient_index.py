@@ -0,0 +1,116 @@
+"""
+Unit tests for the patient name and phone search index.
+"""
+
+import pytest
+from app.patient_index import (
+    PatientSearchIndex, normalize_phone, phone_query, similarity, trigrams, rank_matches,
+    normalize_name, identity_key
+)
+
+
+class TestHelpers:
+    """Test cases for the phone and trigram helpers."""
+    
+    def test_normalize_phone(self):
+        """Test that separators are dropped."""
+        assert normalize_phone("(091) 111-22.33") == "0911112233"
+    
+    def test_normalize_name(self):
+        """Test that case, punctuation, spacing and word order are ignored."""
+        assert normalize_name("Smith,  ANNA") == normalize_name("anna smith") == "anna smith"
+    
+    def test_identity_key(self):
+        """Test that the key combines phone digits and the normalized name."""
+        assert identity_key("Anna Smith", "091-111 2222") == ("0911112222", "anna smith")
+    
+    def test_phone_query(self):
+        """Test that only digit queries of four or more digits search phones."""
+        assert phone_query("091-111") == "091111"
+        assert phone_query("091") == ""
+        assert phone_query("anna 0911") == ""
+    
+    def test_similarity(self):
+        """Test trigram similarity of near misses and unrelated words."""
+        assert similarity(trigrams("smith"), trigrams("smith")) == 1.0
+        assert similarity(trigrams("smith"), trigrams("smiht")) >= 0.3
+        assert similarity(trigrams("smith"), trigrams("jones")) == 0.0
+    
+    def test_rank_matches(self):
+        """Test that every query word must match and higher scores come first."""
+        matches = [{'smith': 1.0, 'smyth': 0.4}, {'anna': 1.0}]
+        candidates = [(1, "Anna Smyth"), (2, "Anna Smith"), (3, "John Smith")]
+        assert rank_matches(candidates, matches) == [2, 1]
+
+
+class TestPatientSearchIndex:
+    """Test cases for PatientSearchIndex."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.patients = {
+            1: ("Anna Smith", "091-111 2222"),
+            2: ("Annabel Jones", "555 1234"),
+            3: ("John Smyth", "(091) 333-2222"),
+            4: ("Jon Smith", "0911112222"),
+        }
+        self.index = PatientSearchIndex()
+        for patient_id, (name, phone) in self.patients.items():
+            self.index.add(patient_id, name, phone)
+    
+    def search(self, query, limit=10):
+        """Search the fixture patients."""
+        return self.index.search(query, limit,
+                                 name_of=lambda patient_id: self.patients[patient_id][0],
+                                 phone_of=lambda patient_id: self.patients[patient_id][1])
+    
+    def test_prefix_search(self):
+        """Test that every query word must prefix one of the name words."""
+        assert self.search("ann") == [1, 2]
+        assert self.search("smi ann") == [1]
+        assert self.search("ANNA s") == [1]
+    
+    def test_fuzzy_matches_follow_prefix_matches(self):
+        """Test that misspellings find similar names after exact prefixes."""
+        assert self.search("smith") == [1, 4, 3]
+        assert set(self.search("smiht")) == {1, 4}
+    
+    def test_phone_search(self):
+        """Test exact phone matches first, then matching endings."""
+        assert self.search("091 111 2222") == [1, 4]
+        assert self.search("2222") == [1, 3, 4]
+        assert self.search("3332222") == [3]
+        assert self.search("9999") == []
+    
+    def test_limit(self):
+        """Test that results are capped."""
+        assert self.search("smith", limit=1) == [1]
+        assert self.search("smith", limit=0) == []
+    
+    def test_queries_without_words(self):
+        """Test that empty and punctuation-only queries match nothing."""
+        assert self.search("") == []
+        assert self.search(" -- ") == []
+    
+    def test_remove(self):
+        """Test that removed patients and their unique words disappear."""
+        self.index.remove(2, *self.patients.pop(2))
+        assert self.search("annab") == [1]
+        assert 2 not in self.search("jones")
+        assert self.search("1234") == []
+    
+    def test_find_duplicates(self):
+        """Test identity lookups follow adds and removes."""
+        assert self.index.find_duplicates("smith anna", "0911112222") == [1]
+        self.index.add(5, "Anna  SMITH", "(091) 111-2222")
+        assert self.index.find_duplicates("Anna Smith", "091 111 2222") == [1, 5]
+        self.index.remove(1, *self.patients[1])
+        assert self.index.find_duplicates("Anna Smith", "091 111 2222") == [5]
+        assert self.index.find_duplicates("Anna Smith", "0000") == []
+    
+    def test_clear(self):
+        """Test that clearing empties every index."""
+        self.index.clear()
+        assert self.index.find_duplicates("Anna Smith", "0911112222") == []
+        assert self.search("ann") == []
+        assert self.search("2222") == []
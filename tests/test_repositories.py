@@ -60,6 +60,42 @@ class TestPatientRepository:
         assert self.repo.count() == 0
         self.repo.create("John Doe", "30", "123-456-7890")
         assert self.repo.count() == 1
+    
+    def test_find_by_ids(self):
+        """Test finding many patients in one call."""
+        first = self.repo.create("John Doe", "30", "123-456-7890")
+        second = self.repo.create("Jane Smith", "25", "098-765-4321")
+        found = self.repo.find_by_ids([first.id, second.id, first.id, 999])
+        assert set(found) == {first.id, second.id}
+        assert found[second.id].name == "Jane Smith"
+    
+    def test_get_page(self):
+        """Test offset and keyset pagination."""
+        ids = [self.repo.create(f"Patient {i}", "30", "123-456-7890").id for i in range(5)]
+        self.repo.delete(ids[1])
+        assert [p.id for p in self.repo.get_page(2)] == [ids[0], ids[2]]
+        assert [p.id for p in self.repo.get_page(2, offset=2)] == [ids[3], ids[4]]
+        assert [p.id for p in self.repo.get_page(10, after_id=ids[2])] == [ids[3], ids[4]]
+        assert self.repo.get_page(10, after_id=ids[4]) == []
+    
+    def test_get_recent(self):
+        """Test getting the newest patients first."""
+        ids = [self.repo.create(f"Patient {i}", "30", "123-456-7890").id for i in range(4)]
+        assert [p.id for p in self.repo.get_recent(2)] == [ids[3], ids[2]]
+        assert len(self.repo.get_recent(10)) == 4
+        assert self.repo.get_recent(0) == []
+    
+    def test_delete_nonexistent_patient(self):
+        """Test deleting a non-existent patient."""
+        assert self.repo.delete(999) is False
+    
+    def test_get_all_preserves_insertion_order(self):
+        """Test that get_all returns patients in insertion order after deletes."""
+        first = self.repo.create("John Doe", "30", "123-456-7890")
+        second = self.repo.create("Jane Smith", "25", "098-765-4321")
+        third = self.repo.create("Sam Brown", "40", "555-123-4567")
+        self.repo.delete(second.id)
+        assert [p.id for p in self.repo.get_all()] == [first.id, third.id]
 
 
 class TestAppointmentRepository:
@@ -116,4 +152,82 @@ class TestAppointmentRepository:
         results = self.repo.search(date="2025-12-25")
         assert len(results) == 1
         assert results[0].date == "2025-12-25"
-
+    
+    def test_appointment_ids_unique_after_delete(self):
+        """Test that new appointments never overwrite existing ones."""
+        self.repo.create(1, "2025-12-25", "Checkup")
+        kept = self.repo.create(2, "2025-12-26", "Follow-up")
+        self.repo.delete_by_patient_id(1)
+        created = self.repo.create(3, "2025-12-27", "Other")
+        assert created.id != kept.id
+        assert self.repo.find_by_id(kept.id).description == "Follow-up"
+    
+    def test_find_by_patient_id_after_delete(self):
+        """Test that the patient index is updated by cascading deletes."""
+        self.repo.create(1, "2025-12-25", "Checkup")
+        self.repo.create(2, "2025-12-27", "Other")
+        self.repo.delete_by_patient_id(1)
+        assert self.repo.find_by_patient_id(1) == []
+        assert self.repo.delete_by_patient_id(1) == 0
+        assert len(self.repo.find_by_patient_id(2)) == 1
+    
+    def test_search_by_patient_id(self):
+        """Test searching appointments by patient ID and description."""
+        self.repo.create(1, "2025-12-25", "General Checkup")
+        self.repo.create(1, "2025-12-26", "Follow-up Visit")
+        self.repo.create(2, "2025-12-25", "General Checkup")
+        results = self.repo.search(query="checkup", patient_id=1)
+        assert [apt.patient_id for apt in results] == [1]
+    
+    def test_clear(self):
+        """Test clearing the repository resets all indexes."""
+        self.repo.create(1, "2025-12-25", "Checkup")
+        self.repo.clear()
+        assert self.repo.count() == 0
+        assert self.repo.find_by_patient_id(1) == []
+    
+    def test_search_by_date_range(self):
+        """Test searching appointments within an inclusive date range."""
+        self.repo.create(1, "2025-12-27", "Late")
+        self.repo.create(1, "2025-12-20", "Early")
+        self.repo.create(2, "2025-12-25", "Middle")
+        self.repo.create(2, "2026-01-05", "Next year")
+        results = self.repo.search(date_from="2025-12-20", date_to="2025-12-27")
+        assert [apt.description for apt in results] == ["Early", "Middle", "Late"]
+        results = self.repo.search(date_from="2025-12-26")
+        assert [apt.description for apt in results] == ["Late", "Next year"]
+        results = self.repo.search(patient_id=2, date_to="2025-12-31")
+        assert [apt.description for apt in results] == ["Middle"]
+    
+    def test_date_range_after_delete(self):
+        """Test that the date index is updated by cascading deletes."""
+        self.repo.create(1, "2025-12-25", "Checkup")
+        self.repo.create(2, "2025-12-25", "Other")
+        self.repo.delete_by_patient_id(1)
+        results = self.repo.find_by_date_range("2025-12-25", "2025-12-25")
+        assert [apt.patient_id for apt in results] == [2]
+    
+    def test_search_description_modes(self):
+        """Test term, prefix and substring description matching."""
+        self.repo.create(1, "2025-12-25", "General Checkup")
+        self.repo.create(1, "2025-12-26", "Follow-up Visit")
+        assert len(self.repo.search(query="check")) == 1
+        assert self.repo.search(query="check", match="term") == []
+        assert len(self.repo.search(query="eck", match="substring")) == 1
+        with pytest.raises(ValueError):
+            self.repo.search(query="check", match="fuzzy")
+    
+    def test_search_description_after_delete(self):
+        """Test that the text index is updated by cascading deletes."""
+        self.repo.create(1, "2025-12-25", "General Checkup")
+        self.repo.create(2, "2025-12-25", "Dental Checkup")
+        self.repo.delete_by_patient_id(1)
+        results = self.repo.search(query="checkup")
+        assert [apt.patient_id for apt in results] == [2]
+    
+    def test_get_page_after_delete(self):
+        """Test that pagination skips appointments removed by cascade."""
+        self.repo.create(1, "2025-12-25", "Checkup")
+        kept = self.repo.create(2, "2025-12-26", "Follow-up")
+        self.repo.delete_by_patient_id(1)
+        assert [apt.id for apt in self.repo.get_page(10)] == [kept.id]
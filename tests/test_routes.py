@@ -4,6 +4,7 @@ Integration tests for route handlers.
 
 import pytest
 from app import app
+from app.cache import configure_response_cache
 from app.repositories import patient_repository, appointment_repository
 
 
@@ -20,9 +21,8 @@ def client():
 def setup_data():
     """Set up test data."""
     # Clear repositories
-    patient_repository._patients.clear()
-    patient_repository._next_id = 1
-    appointment_repository._appointments.clear()
+    patient_repository.clear()
+    appointment_repository.clear()
     
     # Create test patient
     patient = patient_repository.create("Test Patient", "30", "1234567890")
@@ -37,6 +37,16 @@ class TestIndexRoute:
         response = client.get('/')
         assert response.status_code == 200
         assert b'Dashboard' in response.data
+    
+    def test_index_shows_counts(self, client, setup_data):
+        """Test that the dashboard shows totals and recent patients."""
+        for i in range(6):
+            patient_repository.create(f"Extra Patient {i}", "30", "1234567890")
+        response = client.get('/')
+        assert response.status_code == 200
+        assert b'<h3 class="mb-0">7</h3>' in response.data
+        assert b'Extra Patient 5' in response.data
+        assert b'Test Patient' not in response.data
 
 
 class TestPatientRoutes:
@@ -87,6 +97,51 @@ class TestPatientRoutes:
             'phone': '0987654321'
         }, follow_redirects=True)
         assert response.status_code == 200
+    
+    def test_add_duplicate_patient_warns(self, client, setup_data):
+        """Test that adding a duplicate under the default policy warns."""
+        response = client.post('/patients/add', data={
+            'name': 'test  patient', 'age': '30', 'phone': '123-456-7890'
+        }, follow_redirects=True)
+        assert b'added successfully' in response.data
+        assert f'Possible duplicate: patient #{setup_data.id}'.encode() in response.data
+        assert patient_repository.count() == 2
+    
+    def test_add_duplicate_patient_merges(self, client, setup_data, monkeypatch):
+        """Test that the merge policy reports the merge instead of a new patient."""
+        monkeypatch.setattr('app.services.duplicate_policy', 'merge')
+        response = client.post('/patients/add', data={
+            'name': 'Test Patient', 'age': '31', 'phone': '1234567890'
+        }, follow_redirects=True)
+        assert f'already exists (#{setup_data.id})'.encode() in response.data
+        assert patient_repository.count() == 1
+        assert patient_repository.find_by_id(setup_data.id).age == '31'
+    
+    def test_api_patient_duplicates(self, client, setup_data):
+        """Test the dedupe report endpoint."""
+        assert client.get('/api/patients/duplicates').get_json() == []
+        duplicate = patient_repository.create("Patient, Test", "30", "(123) 456-7890")
+        clusters = client.get('/api/patients/duplicates').get_json()
+        assert [[p['id'] for p in c['patients']] for c in clusters] == [[setup_data.id, duplicate.id]]
+
+
+class TestExportRoutes:
+    """Test cases for CSV export routes."""
+    
+    def test_export_patients(self, client, setup_data):
+        """Test streaming the patient CSV export."""
+        response = client.get('/patients/export')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        assert b'Test Patient' in response.data
+    
+    def test_export_appointments(self, client, setup_data):
+        """Test streaming the appointment CSV export."""
+        appointment_repository.create(setup_data.id, '2025-12-25', 'Exported Visit')
+        response = client.get('/appointments/export')
+        assert response.status_code == 200
+        assert b'Exported Visit' in response.data
+        assert b'Test Patient' in response.data
 
 
 class TestAppointmentRoutes:
@@ -98,12 +153,68 @@ class TestAppointmentRoutes:
         assert response.status_code == 200
         assert b'Appointments' in response.data
     
+    def test_list_appointments_date_range(self, client, setup_data):
+        """Test filtering appointments by a date range."""
+        appointment_repository.create(setup_data.id, '2025-12-20', 'Inside Range')
+        appointment_repository.create(setup_data.id, '2026-02-01', 'Outside Range')
+        response = client.get('/appointments?date_from=2025-12-01&date_to=2025-12-31')
+        assert response.status_code == 200
+        assert b'Inside Range' in response.data
+        assert b'Outside Range' not in response.data
+    
+    def test_list_appointments_search_matches_substrings(self, client, setup_data):
+        """Test that the description search box matches inside words."""
+        appointment_repository.create(setup_data.id, '2025-12-20', 'General Checkup')
+        appointment_repository.create(setup_data.id, '2025-12-21', 'Dental Cleaning')
+        response = client.get('/appointments?search=eckup')
+        assert response.status_code == 200
+        assert b'General Checkup' in response.data
+        assert b'Dental Cleaning' not in response.data
+    
+    def test_list_appointments_invalid_date_range(self, client):
+        """Test filtering appointments with an invalid range bound."""
+        response = client.get('/appointments?date_from=not-a-date')
+        assert response.status_code == 200
+        assert b'YYYY-MM-DD' in response.data
+    
+    def test_list_appointments_invalid_date(self, client, setup_data):
+        """Test filtering appointments by a malformed exact date."""
+        appointment_repository.create(setup_data.id, '2025-12-20', 'Checkup')
+        response = client.get('/appointments?date=not-a-date')
+        assert response.status_code == 200
+        assert b'YYYY-MM-DD' in response.data
+        assert b'Checkup' not in response.data
+        response = client.get('/appointments?date=2025-13-45')
+        assert response.status_code == 200
+        assert b'Invalid date' in response.data
+    
     def test_create_appointment_get(self, client, setup_data):
         """Test getting the create appointment form."""
         response = client.get('/appointments/create')
         assert response.status_code == 200
         assert b'Create' in response.data
     
+    def test_create_appointment_form_does_not_list_patients(self, client, setup_data, monkeypatch):
+        """Test that the form uses the search endpoint instead of loading every patient."""
+        def get_all():
+            raise AssertionError("get_all() should not be called")
+        monkeypatch.setattr(patient_repository, 'get_all', get_all)
+        response = client.get('/appointments/create')
+        assert response.status_code == 200
+        assert b'Test Patient' not in response.data
+        assert b'/api/patients/search' in response.data
+        response = client.post('/appointments/create', data={
+            'patient_id': str(setup_data.id), 'date': 'bad', 'description': 'Checkup'})
+        assert response.status_code == 200
+        assert f'#{setup_data.id} - Test Patient'.encode() in response.data
+        assert f'value="{setup_data.id}"'.encode() in response.data
+    
+    def test_create_appointment_without_patients(self, client):
+        """Test that the form is disabled until a patient exists."""
+        patient_repository.clear()
+        response = client.get('/appointments/create')
+        assert b'No patients available' in response.data
+    
     def test_create_appointment_post_success(self, client, setup_data):
         """Test successfully creating an appointment."""
         response = client.post('/appointments/create', data={
@@ -131,4 +242,188 @@ class TestAPIRoutes:
         assert response.status_code == 200
         data = response.get_json()
         assert isinstance(data, list)
+    
+    def test_api_get_patients_paginated(self, client, setup_data):
+        """Test paginating the patients API with a cursor."""
+        patient_repository.create("Second Patient", "40", "0987654321")
+        response = client.get('/api/patients?limit=1')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['total'] == 2
+        assert len(data['items']) == 1
+        response = client.get(f"/api/patients?limit=1&cursor={data['next_cursor']}")
+        data = response.get_json()
+        assert data['items'][0]['name'] == "Second Patient"
+        assert data['next_cursor'] is None
+    
+    def test_api_get_appointments_paginated(self, client, setup_data):
+        """Test paginating the appointments API with an offset."""
+        appointment_repository.create(setup_data.id, '2025-12-25', 'First')
+        appointment_repository.create(setup_data.id, '2025-12-26', 'Second')
+        response = client.get('/api/appointments?limit=1&offset=1')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['total'] == 2
+        assert data['items'][0]['description'] == 'Second'
+        assert data['items'][0]['patient']['id'] == setup_data.id
+    
+    def test_api_invalid_paging_args(self, client):
+        """Test that invalid paging arguments are rejected."""
+        assert client.get('/api/patients?limit=abc').status_code == 400
+        assert client.get('/api/appointments?cursor=bogus').status_code == 400
+    
+    def test_api_create_patients_batch(self, client, setup_data):
+        """Test creating patients in one batch request."""
+        response = client.post('/api/patients:batch', json=[
+            {'name': 'Batch One', 'age': 30, 'phone': '0911112222'},
+            {'name': 'Batch Two', 'age': '41', 'phone': '0911113333', 'notes': 'VIP'},
+        ])
+        assert response.status_code == 201
+        data = response.get_json()
+        assert data['created'] == 2
+        assert [r['patient']['name'] for r in data['results']] == ['Batch One', 'Batch Two']
+        assert patient_repository.count() == 3
+    
+    def test_api_create_batch_is_all_or_nothing(self, client, setup_data):
+        """Test that one invalid item rejects the whole batch."""
+        response = client.post('/api/appointments:batch', json=[
+            {'patient_id': setup_data.id, 'date': '2025-12-25', 'description': 'Checkup'},
+            {'patient_id': 999, 'date': '2025-12-25', 'description': 'Checkup'},
+            'not an object',
+        ])
+        assert response.status_code == 422
+        data = response.get_json()
+        assert data['created'] == 0
+        assert [r['status'] for r in data['results']] == ['valid', 'invalid', 'invalid']
+        assert data['results'][1]['error'] == 'Patient not found'
+        assert appointment_repository.count() == 0
+    
+    def test_api_create_batch_bad_body(self, client):
+        """Test that a body that is not a JSON array is rejected."""
+        assert client.post('/api/patients:batch', json={'name': 'x'}).status_code == 400
+        assert client.post('/api/appointments:batch', data='nope').status_code == 400
+    
+    def test_large_list_is_streamed(self, client, setup_data, monkeypatch):
+        """Test that a list over the stream threshold is still one valid JSON array."""
+        monkeypatch.setattr('app.serialization.STREAM_THRESHOLD', 1)
+        patient_repository.create("Second Patient", "40", "1234567890")
+        appointment_repository.create(setup_data.id, "2025-12-25", "Checkup")
+        appointment_repository.create(999, "2025-12-26", "Orphan")
+        response = client.get('/api/patients')
+        assert response.is_streamed
+        assert [p['name'] for p in response.get_json()] == ["Test Patient", "Second Patient"]
+        appointments = client.get('/api/appointments').get_json()
+        assert appointments[0]['patient']['id'] == setup_data.id
+        assert 'patient' not in appointments[1]
+    
+    def test_api_search_patients(self, client, setup_data):
+        """Test the patient typeahead endpoint."""
+        patient_repository.create("Anna Smith", "30", "091-111 2222")
+        response = client.get('/api/patients/search?q=ann')
+        assert response.status_code == 200
+        assert [p['name'] for p in response.get_json()] == ["Anna Smith"]
+        data = client.get('/api/patients/search?q=1234567890&limit=1').get_json()
+        assert data[0]['id'] == setup_data.id
+        assert client.get('/api/patients/search').get_json() == []
+        assert client.get('/api/patients/search?q=ann&limit=x').status_code == 400
+        assert client.get('/api/patients/search?q=ann&limit=0').status_code == 400
+
+class TestResponseCache:
+    """Test cases for cached list views."""
+    
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self):
+        """Start every test with an empty response cache."""
+        configure_response_cache(16)
+        yield
+        configure_response_cache()
+    
+    def test_repeat_requests_hit_cache(self, client, setup_data):
+        """Test that an unchanged view is served from the cache."""
+        first = client.get('/api/patients')
+        second = client.get('/api/patients')
+        assert second.get_json() == first.get_json()
+        assert second.mimetype == 'application/json'
+        stats = client.get('/api/cache').get_json()
+        assert (stats['hits'], stats['misses']) == (1, 1)
+    
+    def test_query_args_are_part_of_key(self, client, setup_data):
+        """Test that different query arguments are cached separately."""
+        client.get('/api/patients?limit=1')
+        client.get('/api/patients?limit=2')
+        client.get('/api/patients?limit=1')
+        stats = client.get('/api/cache').get_json()
+        assert (stats['entries'], stats['hits']) == (2, 1)
+    
+    def test_writes_invalidate(self, client, setup_data):
+        """Test that any repository write makes cached pages stale."""
+        assert b'Second Patient' not in client.get('/patients').data
+        patient_repository.create("Second Patient", "40", "1234567890")
+        assert b'Second Patient' in client.get('/patients').data
+        appointment_repository.create(setup_data.id, "2025-12-25", "Checkup")
+        assert client.get('/api/appointments').get_json()[0]['description'] == "Checkup"
+    
+    def test_pending_flash_bypasses_cache(self, client, setup_data):
+        """Test that a page showing a flash message is neither served from nor stored in the cache."""
+        client.get('/patients')
+        response = client.post('/patients/add', data={
+            'name': 'New Patient', 'age': '25', 'phone': '0987654321', 'notes': ''
+        }, follow_redirects=True)
+        assert b'added successfully' in response.data
+        stats = client.get('/api/cache').get_json()
+        assert (stats['hits'], stats['entries']) == (0, 1)
+
+
+class TestConditionalGet:
+    """Test cases for ETags and If-None-Match."""
+    
+    def test_unchanged_data_returns_304(self, client, setup_data):
+        """Test that a matching ETag gets an empty 304."""
+        first = client.get('/api/patients')
+        assert first.headers['ETag'] and first.headers['Cache-Control'] == 'no-cache'
+        second = client.get('/api/patients', headers={'If-None-Match': first.headers['ETag']})
+        assert second.status_code == 304
+        assert second.data == b''
+        assert second.headers['ETag'] == first.headers['ETag']
+    
+    def test_etag_depends_on_data_read(self, client, setup_data):
+        """Test that only writes to data a view reads change its ETag."""
+        patients_tag = client.get('/api/patients').headers['ETag']
+        appointments_tag = client.get('/api/appointments').headers['ETag']
+        appointment_repository.create(setup_data.id, "2025-12-25", "Checkup")
+        assert client.get('/api/patients', headers={'If-None-Match': patients_tag}).status_code == 304
+        response = client.get('/api/appointments', headers={'If-None-Match': appointments_tag})
+        assert response.status_code == 200
+        assert response.get_json()[0]['description'] == "Checkup"
+    
+    def test_etag_depends_on_query(self, client, setup_data):
+        """Test that each page has its own ETag."""
+        tag = client.get('/api/patients?limit=1').headers['ETag']
+        assert client.get('/api/patients?limit=2').headers['ETag'] != tag
+        assert client.get('/api/patients?limit=x').headers.get('ETag') is None
+    
+    def test_export_supports_if_none_match(self, client, setup_data):
+        """Test conditional requests on the CSV export."""
+        tag = client.get('/patients/export').headers['ETag']
+        assert client.get('/patients/export', headers={'If-None-Match': tag}).status_code == 304
+        patient_repository.update(setup_data.id, notes="Allergic to penicillin")
+        assert client.get('/patients/export', headers={'If-None-Match': tag}).status_code == 200
+
+
+class TestChangesRoute:
+    """Test cases for the delta sync endpoint."""
+    
+    def test_changes_round_trip(self, client, setup_data):
+        """Test a snapshot followed by a delta."""
+        first = client.get('/api/changes').get_json()
+        assert first['patients']['upserted'][0]['id'] == setup_data.id
+        appointment_repository.create(setup_data.id, "2025-12-25", "Checkup")
+        second = client.get(f"/api/changes?since={first['version']}").get_json()
+        assert second['patients']['upserted'] == []
+        assert [a['description'] for a in second['appointments']['upserted']] == ["Checkup"]
+    
+    def test_invalid_token(self, client):
+        """Test that a malformed token is a 400."""
+        response = client.get('/api/changes?since=garbage')
+        assert response.status_code == 400
 
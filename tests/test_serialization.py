@@ -0,0 +1,62 @@
+"""
+Unit tests for the fast JSON encoders.
+"""
+
+import json
+import pytest
+from app import serialization
+from app.models import Patient, Appointment
+from app.serialization import (
+    encode_patients, appointment_encoder, iter_json_array, json_array_response
+)
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def encoder_backend(request, monkeypatch):
+    """Run each test with orjson (when installed) and with the stdlib fallback."""
+    if request.param == 'orjson' and serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    if request.param == 'stdlib':
+        monkeypatch.setattr(serialization, 'orjson', None)
+    return request.param
+
+
+def _decode(chunks):
+    """Parse an encoded JSON array."""
+    return json.loads(b''.join(chunks))
+
+
+class TestEncoders:
+    """Test cases for the row encoders."""
+    
+    def test_patients_match_to_dict(self, encoder_backend):
+        """Test that encoded patients equal to_dict(), including characters needing escapes."""
+        patients = [Patient(1, 'Zoë "Z" O\'Neil', '30', '091\t111', 'line\nbreak \\  '),
+                    Patient(2, 'Jane Smith', '25', '0987654321')]
+        assert _decode(iter_json_array(patients, encode_patients)) == [p.to_dict() for p in patients]
+    
+    def test_appointments_match_to_dict(self, encoder_backend):
+        """Test that appointments embed their patient, or omit it when missing."""
+        patient = Patient(1, 'John Doe', '30', '1234567890')
+        appointments = [Appointment(1, 1, '2025-12-25', 'Checkup'),
+                        Appointment(2, 9, '2025-12-26', 'Orphan "visit"'),
+                        Appointment(3, 1, '2025-12-27', 'Follow-up')]
+        encoded = _decode(iter_json_array(appointments, appointment_encoder({1: patient})))
+        assert encoded == [a.to_dict({1: patient}.get(a.patient_id)) for a in appointments]
+    
+    def test_chunks_form_one_array(self, encoder_backend):
+        """Test that chunked output is a single valid array, also when empty."""
+        patients = [Patient(i, f'Patient {i}', '30', '1234567890') for i in range(5)]
+        chunks = list(iter_json_array(patients, encode_patients, chunk_size=2))
+        assert len(chunks) == 5
+        assert [p['id'] for p in _decode(chunks)] == [0, 1, 2, 3, 4]
+        assert _decode(iter_json_array([], encode_patients)) == []
+    
+    def test_large_arrays_are_streamed(self, monkeypatch):
+        """Test that only arrays over STREAM_THRESHOLD are streamed."""
+        monkeypatch.setattr(serialization, 'STREAM_THRESHOLD', 2)
+        patients = [Patient(i, f'Patient {i}', '30', '1234567890') for i in range(3)]
+        assert json_array_response(patients[:2], encode_patients).is_streamed is False
+        response = json_array_response(patients, encode_patients)
+        assert response.is_streamed and response.mimetype == 'application/json'
+        assert len(_decode(response.response)) == 3
@@ -6,7 +6,13 @@ import pytest
 from app.services import (
     validate_patient_name, validate_age, validate_phone, validate_date,
     validate_appointment_description, create_patient, update_patient,
-    delete_patient, create_appointment
+    delete_patient, create_appointment, get_appointments_with_patients,
+    search_appointments, get_patients_page, encode_cursor, decode_cursor,
+    ValidationError, get_dashboard_summary, iter_patients_csv,
+    iter_appointments_csv, validate_patient_record, create_patients_batch,
+    create_appointments_batch, MAX_BATCH_SIZE, validate_many, validate_appointment_record,
+    get_changes, search_patients, MAX_SEARCH_LIMIT, find_duplicate_patients,
+    find_patient_duplicate_clusters, configure_duplicate_policy
 )
 from app.repositories import patient_repository, appointment_repository
 
@@ -62,6 +68,12 @@ class TestValidation:
         assert valid is False
         assert "digits" in error.lower()
     
+    def test_validate_phone_separators_and_length(self):
+        """Test that separators are ignored when counting digits."""
+        assert validate_phone("(091) 111-2222") == (True, "")
+        assert validate_phone("12-34") == (False, "Phone number is too short")
+        assert validate_phone(" - ") == (False, "Phone number is required")
+    
     def test_validate_date_valid(self):
         """Test validating a valid date."""
         valid, error = validate_date("2025-12-25")
@@ -93,9 +105,8 @@ class TestPatientServices:
     def setup_method(self):
         """Set up test fixtures."""
         # Clear repositories
-        patient_repository._patients.clear()
-        patient_repository._next_id = 1
-        appointment_repository._appointments.clear()
+        patient_repository.clear()
+        appointment_repository.clear()
     
     def test_create_patient_success(self):
         """Test successfully creating a patient."""
@@ -140,15 +151,60 @@ class TestPatientServices:
         assert error is not None
 
 
+class TestPaginationServices:
+    """Test cases for paginated listing services."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        patient_repository.clear()
+        appointment_repository.clear()
+    
+    def test_cursor_round_trip(self):
+        """Test that cursors decode to the encoded ID."""
+        assert decode_cursor(encode_cursor(42)) == 42
+    
+    def test_decode_invalid_cursor(self):
+        """Test decoding a malformed cursor."""
+        with pytest.raises(ValidationError):
+            decode_cursor("not a cursor")
+    
+    def test_get_patients_page_follows_cursor(self):
+        """Test walking all patients page by page."""
+        for i in range(5):
+            create_patient(f"Patient {i}", "30", "1234567890")
+        first = get_patients_page(limit=2)
+        assert first['total'] == 5
+        assert [p['name'] for p in first['items']] == ["Patient 0", "Patient 1"]
+        second = get_patients_page(limit=2, cursor=first['next_cursor'])
+        assert [p['name'] for p in second['items']] == ["Patient 2", "Patient 3"]
+        last = get_patients_page(limit=2, cursor=second['next_cursor'])
+        assert len(last['items']) == 1
+        assert last['next_cursor'] is None
+    
+    def test_get_patients_page_invalid_limit(self):
+        """Test requesting a page size outside the allowed range."""
+        with pytest.raises(ValidationError):
+            get_patients_page(limit=0)
+    
+    def test_search_patients(self):
+        """Test typeahead search by name prefix and phone digits."""
+        create_patient("Anna Smith", "30", "091-111 2222")
+        create_patient("John Doe", "40", "0913334444")
+        assert [p['name'] for p in search_patients("  ann ")] == ["Anna Smith"]
+        assert [p['name'] for p in search_patients("0911112222")] == ["Anna Smith"]
+        assert search_patients("   ") == []
+        with pytest.raises(ValidationError):
+            search_patients("ann", limit=MAX_SEARCH_LIMIT + 1)
+
+
 class TestAppointmentServices:
     """Test cases for appointment service functions."""
     
     def setup_method(self):
         """Set up test fixtures."""
         # Clear repositories
-        patient_repository._patients.clear()
-        patient_repository._next_id = 1
-        appointment_repository._appointments.clear()
+        patient_repository.clear()
+        appointment_repository.clear()
     
     def test_create_appointment_success(self):
         """Test successfully creating an appointment."""
@@ -171,4 +227,241 @@ class TestAppointmentServices:
         appointment, error = create_appointment(patient.id, "invalid-date", "Checkup")
         assert appointment is None
         assert error is not None
+    
+    def test_get_appointments_with_patients(self):
+        """Test that appointments are joined with their patients."""
+        john, _ = create_patient("John Doe", "30", "1234567890")
+        jane, _ = create_patient("Jane Smith", "25", "0987654321")
+        create_appointment(john.id, "2025-12-25", "Checkup")
+        create_appointment(jane.id, "2025-12-26", "Follow-up")
+        appointments = get_appointments_with_patients()
+        assert [apt['patient']['name'] for apt in appointments] == ["John Doe", "Jane Smith"]
+    
+    def test_search_appointments_includes_patient(self):
+        """Test that search results are joined with their patients."""
+        patient, _ = create_patient("John Doe", "30", "1234567890")
+        create_appointment(patient.id, "2025-12-25", "General Checkup")
+        results = search_appointments(query="checkup")
+        assert len(results) == 1
+        assert results[0]['patient']['id'] == patient.id
+    
+    def test_get_dashboard_summary(self):
+        """Test that the dashboard summary has counts and recent items."""
+        for i in range(7):
+            patient, _ = create_patient(f"Patient {i}", "30", "1234567890")
+            create_appointment(patient.id, "2025-12-25", f"Visit {i}")
+        summary = get_dashboard_summary(limit=5)
+        assert summary['patient_count'] == 7
+        assert summary['appointment_count'] == 7
+        assert len(summary['recent_patients']) == 5
+        assert summary['recent_patients'][0].name == "Patient 6"
+        assert summary['recent_appointments'][0]['patient']['name'] == "Patient 6"
+    
+    def test_iter_patients_csv_streams_chunks(self):
+        """Test that the patient export is produced in chunks."""
+        for i in range(5):
+            create_patient(f"Patient {i}", "30", "1234567890")
+        chunks = list(iter_patients_csv(chunk_size=2))
+        assert len(chunks) > 3
+        lines = ''.join(chunks).splitlines()
+        assert lines[0] == 'ID,Name,Age,Phone,Notes'
+        assert len(lines) == 6
+    
+    def test_iter_appointments_csv_includes_patient(self):
+        """Test that the appointment export joins patient columns."""
+        patient, _ = create_patient("John Doe", "30", "1234567890")
+        create_appointment(patient.id, "2025-12-25", "Checkup")
+        lines = ''.join(iter_appointments_csv()).splitlines()
+        assert lines[0].startswith('ID,Date,Description,Patient ID,Patient Name')
+        assert lines[1].endswith(',John Doe,30,1234567890')
 
+
+class TestBatchServices:
+    """Test cases for record validation and batch creation."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        patient_repository.clear()
+        appointment_repository.clear()
+    
+    def test_validate_patient_record(self):
+        """Test that records are normalized to create_many tuples."""
+        values, error = validate_patient_record({'name': ' John Doe ', 'age': 30, 'phone': '091-111-2222'})
+        assert (values, error) == (("John Doe", "30", "091-111-2222", ""), None)
+        values, error = validate_patient_record({'name': 'John Doe', 'age': None})
+        assert values is None and error == "Age is required"
+    
+    def test_create_patients_batch(self):
+        """Test creating a valid batch."""
+        created, results = create_patients_batch([
+            {'name': 'John Doe', 'age': '30', 'phone': '0911112222'},
+        ])
+        assert created is True
+        assert results[0]['patient']['id'] == patient_repository.get_all()[0].id
+    
+    def test_create_appointments_batch_rejects_unknown_patient(self):
+        """Test that nothing is created when one item is invalid."""
+        patient, _ = create_patient("John Doe", "30", "1234567890")
+        created, results = create_appointments_batch([
+            {'patient_id': patient.id, 'date': '2025-12-25', 'description': 'Checkup'},
+            {'patient_id': 'abc', 'date': '2025-12-25', 'description': 'Checkup'},
+        ])
+        assert created is False
+        assert results[1] == {'index': 1, 'status': 'invalid', 'error': "Patient ID must be a number"}
+        assert appointment_repository.count() == 0
+    
+    def test_validate_many(self):
+        """Test that values and errors line up with the input records."""
+        values, errors = validate_many([
+            {'patient_id': '1', 'date': ' 2025-12-25 ', 'description': 'Checkup'},
+            {'patient_id': '1', 'date': '2025-02-30', 'description': 'Checkup'},
+            ['not', 'a', 'record'],
+        ], validate_appointment_record)
+        assert values == [(1, '2025-12-25', 'Checkup'), None, None]
+        assert errors == [None, "Invalid date", "Record must be a JSON object"]
+    
+    def test_batch_limits(self):
+        """Test that non-list and oversized batches raise ValidationError."""
+        with pytest.raises(ValidationError):
+            create_patients_batch({'name': 'John Doe'})
+        with pytest.raises(ValidationError):
+            create_patients_batch([{}] * (MAX_BATCH_SIZE + 1))
+
+
+class TestDuplicateServices:
+    """Test cases for the duplicate patient policies."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        patient_repository.clear()
+        self.existing, _ = create_patient("Anna Smith", "30", "091-111-2222", "Allergic")
+    
+    def test_warn_creates_duplicate(self):
+        """Test that the default policy creates the patient anyway."""
+        patient, error = create_patient("smith anna", "31", "0911112222")
+        assert error is None and patient.id != self.existing.id
+        assert [p.id for p in find_duplicate_patients("Anna Smith", "0911112222",
+                                                      exclude_id=patient.id)] == [self.existing.id]
+    
+    def test_reject_refuses_duplicate(self):
+        """Test that the reject policy returns an error naming the existing patient."""
+        patient, error = create_patient("Anna Smith", "31", "(091) 111 2222", policy='reject')
+        assert patient is None
+        assert f"#{self.existing.id}" in error
+        assert patient_repository.count() == 1
+    
+    def test_merge_updates_existing(self):
+        """Test that the merge policy folds the new details into the existing patient."""
+        patient, error = create_patient("ANNA SMITH", "31", "0911112222", "Diabetic", policy='merge')
+        assert error is None and patient.id == self.existing.id
+        assert (patient.age, patient.notes) == ("31", "Allergic\nDiabetic")
+        patient, _ = create_patient("Anna Smith", "31", "0911112222", "Diabetic", policy='merge')
+        assert patient.notes == "Allergic\nDiabetic"
+        assert patient_repository.count() == 1
+    
+    def test_update_into_duplicate(self):
+        """Test that reject and merge refuse an update that creates a duplicate."""
+        other, _ = create_patient("John Doe", "40", "0913334444")
+        for policy in ('reject', 'merge'):
+            patient, error = update_patient(other.id, name="Anna Smith", phone="0911112222",
+                                            policy=policy)
+            assert patient is None and f"#{self.existing.id}" in error
+        patient, error = update_patient(self.existing.id, name="Anna Smith", age="31",
+                                        policy='reject')
+        assert error is None and patient.age == "31"
+        patient, error = update_patient(other.id, phone="0911112222", policy='reject')
+        assert error is None
+    
+    def test_configured_policy(self):
+        """Test that the configured policy applies when none is passed."""
+        configure_duplicate_policy('reject')
+        try:
+            patient, error = create_patient("Anna Smith", "30", "0911112222")
+            assert patient is None and error
+        finally:
+            configure_duplicate_policy()
+        with pytest.raises(ValueError):
+            configure_duplicate_policy('ignore')
+    
+    def test_batch_reject(self):
+        """Test that duplicates of existing patients and of earlier items are invalid."""
+        created, results = create_patients_batch([
+            {'name': 'Anna Smith', 'age': '30', 'phone': '0911112222'},
+            {'name': 'John Doe', 'age': '40', 'phone': '0913334444'},
+            {'name': 'john doe', 'age': '40', 'phone': '091-333-4444'},
+        ], policy='reject')
+        assert created is False
+        assert [r['status'] for r in results] == ['invalid', 'valid', 'invalid']
+        assert results[2]['error'] == "Duplicates item 1 of this batch"
+    
+    def test_batch_warn(self):
+        """Test that duplicates are created and list what they duplicate."""
+        created, results = create_patients_batch([
+            {'name': 'Anna Smith', 'age': '30', 'phone': '0911112222'},
+            {'name': 'John Doe', 'age': '40', 'phone': '0913334444'},
+            {'name': 'john doe', 'age': '40', 'phone': '091-333-4444'},
+        ], policy='warn')
+        assert created is True
+        assert results[0]['duplicates'] == [self.existing.id]
+        assert 'duplicates' not in results[1]
+        assert results[2]['duplicates'] == [results[1]['patient']['id']]
+        assert patient_repository.count() == 4
+    
+    def test_batch_merge(self):
+        """Test that duplicates are merged instead of created."""
+        created, results = create_patients_batch([
+            {'name': 'Anna Smith', 'age': '31', 'phone': '0911112222', 'notes': 'Diabetic'},
+            {'name': 'John Doe', 'age': '40', 'phone': '0913334444'},
+            {'name': 'john doe', 'age': '41', 'phone': '091-333-4444'},
+        ], policy='merge')
+        assert created is True
+        assert [r['status'] for r in results] == ['merged', 'created', 'merged']
+        assert results[0]['patient']['id'] == self.existing.id
+        assert results[0]['patient']['notes'] == "Allergic\nDiabetic"
+        assert results[2]['patient'] == dict(results[1]['patient'], age='41')
+        assert patient_repository.count() == 2
+    
+    def test_find_patient_duplicate_clusters(self):
+        """Test the dedupe job across pages."""
+        create_patient("John Doe", "40", "0913334444")
+        duplicate, _ = create_patient("Smith, Anna", "30", "0911112222")
+        clusters = find_patient_duplicate_clusters(chunk_size=1)
+        assert [[p.id for p in c.patients] for c in clusters] == [[self.existing.id, duplicate.id]]
+
+
+class TestSyncServices:
+    """Test cases for delta sync."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        patient_repository.clear()
+        appointment_repository.clear()
+    
+    def test_first_sync_is_snapshot(self):
+        """Test that a sync without a token returns everything."""
+        patient, _ = create_patient("John Doe", "30", "1234567890")
+        changes = get_changes()
+        assert changes['patients'] == {'snapshot': True, 'upserted': [patient.to_dict()],
+                                       'deleted': []}
+        assert changes['appointments']['snapshot'] is True
+    
+    def test_delta_since_token(self):
+        """Test that later syncs return only what changed, collapsed per record."""
+        john, _ = create_patient("John Doe", "30", "1234567890")
+        jane, _ = create_patient("Jane Smith", "25", "0987654321")
+        token = get_changes()['version']
+        update_patient(john.id, notes="Allergic")
+        delete_patient(jane.id)
+        jim, _ = create_patient("Jim Beam", "40", "1112223333")
+        delete_patient(jim.id)
+        changes = get_changes(token)
+        assert changes['patients']['snapshot'] is False
+        assert [p['notes'] for p in changes['patients']['upserted']] == ["Allergic"]
+        assert changes['patients']['deleted'] == [jane.id, jim.id]
+        assert changes['appointments'] == {'snapshot': False, 'upserted': [], 'deleted': []}
+        assert get_changes(changes['version'])['patients']['upserted'] == []
+    
+    def test_invalid_token(self):
+        """Test that a malformed token raises ValidationError."""
+        with pytest.raises(ValidationError):
+            get_changes("not a token")
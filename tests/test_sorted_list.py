@@ -0,0 +1,72 @@
+"""
+Unit tests for the blocked sorted list used by repository indexes.
+"""
+
+import random
+import pytest
+from app.sorted_list import SortedList
+
+
+@pytest.fixture
+def small_load(monkeypatch):
+    """Use tiny sublists so splitting and merging are exercised."""
+    monkeypatch.setattr(SortedList, 'LOAD', 4)
+
+
+class TestSortedList:
+    """Test cases for SortedList."""
+
+    def test_add_keeps_order(self, small_load):
+        """Test that values come back sorted regardless of insert order."""
+        rng = random.Random(1)
+        values = rng.sample(range(1000), 200)
+        items = SortedList()
+        for value in values:
+            items.add(value)
+        assert list(items) == sorted(values)
+        assert list(reversed(items)) == sorted(values, reverse=True)
+        assert len(items) == 200
+
+    def test_discard(self, small_load):
+        """Test removing present and absent values."""
+        items = SortedList()
+        for value in range(50):
+            items.add(value)
+        for value in range(0, 50, 3):
+            assert items.discard(value)
+        assert not items.discard(3)
+        assert not items.discard(99)
+        assert list(items) == [v for v in range(50) if v % 3]
+        for value in range(50):
+            items.discard(value)
+        assert len(items) == 0
+        assert list(items) == []
+
+    def test_irange(self, small_load):
+        """Test bounded iteration, including tuple keys."""
+        items = SortedList()
+        for value in range(0, 100, 2):
+            items.add(value)
+        assert list(items.irange(10, 20)) == [10, 12, 14, 16, 18, 20]
+        assert list(items.irange(11, 15)) == [12, 14]
+        assert list(items.irange(10, 14, exclusive_minimum=True)) == [12, 14]
+        assert list(items.irange(maximum=4)) == [0, 2, 4]
+        assert list(items.irange(200)) == []
+
+        dates = SortedList()
+        for pair in [('2025-01-02', 1), ('2025-01-01', 2), ('2025-01-03', 3)]:
+            dates.add(pair)
+        assert [i for _, i in dates.irange(('2025-01-01', 0), ('2025-01-02', 99))] == [2, 1]
+
+    def test_islice_after(self, small_load):
+        """Test that windows match slicing a plain sorted list."""
+        items = SortedList()
+        for value in range(1, 101):
+            items.add(value)
+        for value in range(1, 101, 7):
+            items.discard(value)
+        expected = list(items)
+        for after in (None, 0, 5, 50, 99, 100):
+            base = [v for v in expected if after is None or v > after]
+            for offset in (0, 3, 10, 200):
+                assert items.islice_after(after, offset, 6) == base[offset:offset + 6]
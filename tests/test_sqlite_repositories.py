@@ -0,0 +1,171 @@
+"""
+Unit tests for the SQLite repository classes.
+"""
+
+import sqlite3
+import threading
+import pytest
+from app import repositories
+from app.sqlite_repositories import (
+    SqliteDatabase, SqlitePatientRepository, SqliteAppointmentRepository
+)
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Create a database in a temporary file."""
+    db = SqliteDatabase(str(tmp_path / 'clinic.db'))
+    yield db
+    db.close()
+
+
+class TestSqliteDatabase:
+    """Test cases for SqliteDatabase."""
+    
+    def test_wal_mode(self, database):
+        """Test that connections use write-ahead logging."""
+        mode = database.connection().execute('PRAGMA journal_mode').fetchone()[0]
+        assert mode == 'wal'
+    
+    def test_connection_reused_per_thread(self, database):
+        """Test that each thread gets its own pooled connection."""
+        assert database.connection() is database.connection()
+        other = []
+        thread = threading.Thread(target=lambda: other.append(database.connection()))
+        thread.start()
+        thread.join()
+        assert other[0] is not database.connection()
+    
+    def test_indexes_created(self, database):
+        """Test that lookup columns are indexed."""
+        names = {row[0] for row in database.connection().execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {'idx_patients_phone', 'idx_appointments_patient',
+                'idx_appointments_date'} <= names
+
+
+class TestSqlitePatientRepository:
+    """Test cases for SqlitePatientRepository."""
+    
+    def test_create_and_find(self, database):
+        """Test creating and finding a patient."""
+        repo = SqlitePatientRepository(database)
+        patient = repo.create("John Doe", "30", "123-456-7890", "Notes")
+        assert patient.id == 1
+        found = repo.find_by_id(patient.id)
+        assert found.name == "John Doe"
+        assert found.notes == "Notes"
+    
+    def test_update_keeps_unset_fields(self, database):
+        """Test that update only changes the given fields."""
+        repo = SqlitePatientRepository(database)
+        patient = repo.create("John Doe", "30", "123-456-7890")
+        updated = repo.update(patient.id, name="John Updated")
+        assert updated.name == "John Updated"
+        assert updated.age == "30"
+        assert repo.update(999, name="Nobody") is None
+    
+    def test_data_survives_reopen(self, tmp_path):
+        """Test that records persist across database connections."""
+        path = str(tmp_path / 'clinic.db')
+        first = SqliteDatabase(path)
+        SqlitePatientRepository(first).create("John Doe", "30", "123-456-7890")
+        first.close()
+        second = SqliteDatabase(path)
+        assert SqlitePatientRepository(second).count() == 1
+        second.close()
+
+    def test_high_water_mark_survives_reopen(self, tmp_path):
+        """Test that reserved and cleared IDs stay used after reopening."""
+        path = str(tmp_path / 'clinic.db')
+        first = SqliteDatabase(path)
+        repo = SqlitePatientRepository(first)
+        repo.create("John Doe", "30", "123-456-7890")
+        assert repo.allocate_ids(10) == range(2, 12)
+        repo.clear()
+        first.close()
+        second = SqliteDatabase(path)
+        assert SqlitePatientRepository(second).create("Jane Smith", "25", "555").id == 12
+        second.close()
+    
+    def test_fuzzy_vocabulary_cached_until_write(self, database):
+        """Test that fuzzy search rescans the name words only after the table changes."""
+        repo = SqlitePatientRepository(database)
+        anna = repo.create("Anna Smith", "30", "555")
+        scans = []
+        database.connection().set_trace_callback(
+            lambda statement: scans.append(statement) if 'patients_fts_words' in statement else None)
+        assert [p.id for p in repo.search("smiht")] == [anna.id]
+        assert [p.id for p in repo.search("smiht")] == [anna.id]
+        assert len(scans) == 1
+        john = repo.create("John Doe", "40", "556")
+        assert [p.id for p in repo.search("johm")] == [john.id]
+        assert len(scans) == 2
+    
+    def test_failed_create_many_keeps_ids_and_version(self, database):
+        """Test that a batch that fails to insert reserves no IDs and logs no change."""
+        repo = SqlitePatientRepository(database)
+        repo.create("John Doe", "30", "123-456-7890")
+        version = repo.version
+        with pytest.raises(sqlite3.IntegrityError):
+            repo.create_many([("Jane Smith", "25", "555", ""), (None, "40", "556", "")])
+        assert repo.version == version
+        assert repo.changes_since(version) == []
+        assert [p.id for p in repo.create_many([("Jane Smith", "25", "555", "")])] == [2]
+    
+    def test_version_shared_and_persistent(self, tmp_path):
+        """Test that versions are shared by connections, survive reopening and differ per file."""
+        path = str(tmp_path / 'clinic.db')
+        first = SqliteDatabase(path)
+        other = SqliteDatabase(str(tmp_path / 'other.db'))
+        repo = SqlitePatientRepository(first)
+        assert repo.version != SqlitePatientRepository(other).version
+        repo.create("John Doe", "30", "123-456-7890")
+        second = SqliteDatabase(path)
+        assert SqlitePatientRepository(second).version == repo.version
+        for database in (first, second, other):
+            database.close()
+
+
+class TestSqliteAppointmentRepository:
+    """Test cases for SqliteAppointmentRepository."""
+    
+    def test_search_description_modes(self, database):
+        """Test full-text and substring description search."""
+        repo = SqliteAppointmentRepository(database)
+        repo.create(1, "2025-12-25", "General Checkup")
+        repo.create(1, "2025-12-26", "Follow-up Visit")
+        assert len(repo.search(query="check")) == 1
+        assert repo.search(query="check", match="term") == []
+        assert len(repo.search(query="eck", match="substring")) == 1
+    
+    def test_delete_by_patient_id_updates_search(self, database):
+        """Test that cascading deletes remove rows from the text index."""
+        repo = SqliteAppointmentRepository(database)
+        repo.create(1, "2025-12-25", "General Checkup")
+        repo.create(2, "2025-12-25", "Dental Checkup")
+        assert repo.delete_by_patient_id(1) == 1
+        assert [apt.patient_id for apt in repo.search(query="checkup")] == [2]
+
+
+class TestConfigureRepositories:
+    """Test cases for selecting the storage engine."""
+    
+    def setup_method(self):
+        """Remember the active repositories."""
+        self.saved = (repositories.patient_repository, repositories.appointment_repository)
+    
+    def teardown_method(self):
+        """Restore the repositories active before the test."""
+        repositories.set_repositories(*self.saved)
+    
+    def test_configure_sqlite(self, tmp_path):
+        """Test switching the global repositories to SQLite."""
+        repositories.configure_repositories('sqlite', {'SQLITE_PATH': str(tmp_path / 'clinic.db')})
+        assert isinstance(repositories.patient_repository, SqlitePatientRepository)
+        assert isinstance(repositories.appointment_repository, SqliteAppointmentRepository)
+    
+    def test_configure_unknown_engine(self):
+        """Test that unknown engines are rejected."""
+        with pytest.raises(ValueError):
+            repositories.configure_repositories('cassandra')
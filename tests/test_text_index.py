@@ -0,0 +1,59 @@
+"""
+Unit tests for the inverted full-text index.
+"""
+
+import pytest
+from app.text_index import InvertedIndex, tokenize
+
+
+class TestTokenize:
+    """Test cases for tokenize."""
+    
+    def test_tokenize_lowercases_and_splits(self):
+        """Test that punctuation separates tokens and case is folded."""
+        assert tokenize("Follow-up: Blood TEST") == ["follow", "up", "blood", "test"]
+    
+    def test_tokenize_empty(self):
+        """Test tokenizing text without word characters."""
+        assert tokenize(" -- ") == []
+
+
+class TestInvertedIndex:
+    """Test cases for InvertedIndex."""
+    
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.index = InvertedIndex()
+        self.index.add(1, "General Checkup")
+        self.index.add(2, "Follow-up Visit")
+        self.index.add(3, "Checkup checkup and blood test")
+    
+    def test_term_search(self):
+        """Test that term queries match whole words only."""
+        assert set(self.index.search("checkup")) == {1, 3}
+        assert self.index.search("check") == []
+    
+    def test_prefix_search(self):
+        """Test that prefix queries match words starting with the token."""
+        assert set(self.index.search("check", prefix=True)) == {1, 3}
+        assert self.index.search("fol vis", prefix=True) == [2]
+    
+    def test_all_tokens_required(self):
+        """Test that every query token must match."""
+        assert self.index.search("checkup blood") == [3]
+        assert self.index.search("checkup missing") == []
+    
+    def test_ranking_by_term_frequency(self):
+        """Test that documents repeating a term rank higher."""
+        assert self.index.search("checkup") == [3, 1]
+    
+    def test_remove(self):
+        """Test removing a document drops it and its unique terms."""
+        self.index.remove(2, "Follow-up Visit")
+        assert self.index.search("visit") == []
+        assert self.index.search("vis", prefix=True) == []
+    
+    def test_clear(self):
+        """Test clearing the index."""
+        self.index.clear()
+        assert self.index.search("checkup") == []
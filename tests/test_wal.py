@@ -0,0 +1,258 @@
+"""
+Unit tests for the write-ahead log and snapshots.
+"""
+
+import os
+import threading
+
+import pytest
+from app import repositories
+from app.columnar import ColumnarAppointmentRepository
+from app.repositories import AppointmentRepository, PatientRepository
+from app.wal import (
+    SNAPSHOT_NAME, DurableStore, WalCorruptError, WriteAheadLog, decode_entry, encode_entry,
+    list_segments, read_frames
+)
+
+
+def open_store(directory, appointment_class=AppointmentRepository, **options):
+    """Recover a new repository pair from a directory."""
+    options.setdefault('snapshot_every', 0)
+    return DurableStore(str(directory), {'patients': PatientRepository(),
+                                         'appointments': appointment_class()}, **options)
+
+
+def dump(store):
+    """Stored patients and appointments as dictionaries."""
+    patients, appointments = store.repositories.values()
+    return ([p.to_dict() for p in patients.get_all()],
+            [a.to_dict() for a in appointments.get_all()])
+
+
+class TestEntryEncoding:
+    """Test cases for encode_entry and decode_entry."""
+
+    def test_round_trip(self):
+        """Test that rows survive encoding, including non-ASCII text."""
+        rows = [(1, 'Añna Smith', '30', '091-111', ''), (2, 'Bob', '41', '092', 'notes\n')]
+        assert decode_entry(encode_entry('patients', 'create', rows)) == ('patients', 'create', rows)
+
+    def test_empty_rows(self):
+        """Test entries without rows."""
+        assert decode_entry(encode_entry('appointments', 'clear', [])) == ('appointments', 'clear', [])
+
+    def test_numbers_in_text_fields(self):
+        """Test that a number given for a text field is logged as text."""
+        _, _, rows = decode_entry(encode_entry('patients', 'update', [(1, 'Ann', 30, '1', '')]))
+        assert rows == [(1, 'Ann', '30', '1', '')]
+
+
+class TestWriteAheadLog:
+    """Test cases for WriteAheadLog."""
+
+    def test_commit_writes_frames(self, tmp_path):
+        """Test that committed entries can be read back in order."""
+        wal = WriteAheadLog(str(tmp_path), 1)
+        wal.append('patients', 'delete', [(1,)])
+        wal.append('patients', 'delete', [(2,)])
+        wal.commit()
+        frames = list(read_frames(os.path.join(tmp_path, 'wal-00000001.log')))
+        assert [decode_entry(frame)[2] for frame in frames] == [[(1,)], [(2,)]]
+        wal.close()
+
+    def test_unknown_policy(self, tmp_path):
+        """Test that an unknown fsync policy is rejected."""
+        with pytest.raises(ValueError):
+            WriteAheadLog(str(tmp_path), 1, fsync='sometimes')
+
+    def test_group_commit(self, tmp_path):
+        """Test that concurrent writers all end up durable."""
+        store = open_store(tmp_path)
+        patients = store.repositories['patients']
+
+        def work():
+            for _ in range(50):
+                patients.create('Anna', '30', '091')
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        expected = dump(store)
+        store.close()
+        assert len(expected[0]) == 400
+        assert dump(open_store(tmp_path)) == expected
+
+    def test_torn_tail_is_discarded(self, tmp_path):
+        """Test that a partly written last entry is dropped on recovery."""
+        store = open_store(tmp_path)
+        store.repositories['patients'].create('Anna', '30', '091')
+        store.repositories['patients'].create('Bob', '40', '092')
+        store.close()
+        path = os.path.join(tmp_path, 'wal-00000001.log')
+        with open(path, 'r+b') as stream:
+            stream.truncate(os.path.getsize(path) - 3)
+        recovered = open_store(tmp_path)
+        assert [p['name'] for p in dump(recovered)[0]] == ['Anna']
+        # The ID of the lost write is handed out again; it was never acknowledged
+        assert recovered.repositories['patients'].create('Carl', '50', '093').id == 2
+        recovered.close()
+
+    def test_corrupt_older_segment(self, tmp_path):
+        """Test that damage before the newest segment is an error."""
+        store = open_store(tmp_path)
+        store.repositories['patients'].create('Anna', '30', '091')
+        store.close()
+        open_store(tmp_path).close()
+        path = os.path.join(tmp_path, 'wal-00000001.log')
+        with open(path, 'r+b') as stream:
+            stream.seek(-1, os.SEEK_END)
+            stream.write(b'X')
+        with pytest.raises(WalCorruptError):
+            open_store(tmp_path)
+
+
+class TestDurableStore:
+    """Test cases for recovery through DurableStore."""
+
+    @pytest.mark.parametrize('appointment_class', [AppointmentRepository,
+                                                   ColumnarAppointmentRepository])
+    def test_recovers_every_write(self, tmp_path, appointment_class):
+        """Test that creates, updates, deletes and reservations are replayed."""
+        store = open_store(tmp_path, appointment_class)
+        patients, appointments = store.repositories.values()
+        anna = patients.create('Anna Smith', '30', '091-111', 'first')
+        patients.create_many([('Bob', '40', '092', ''), ('Carl', '50', '093', '')])
+        patients.update(anna.id, phone='091-999', notes='second')
+        patients.delete(2)
+        appointments.create(anna.id, '2025-10-22', 'Checkup')
+        appointments.create_many([(3, '2025-10-23', 'X-ray'), (3, '2025-10-24', 'Review')])
+        appointments.delete_by_patient_id(3)
+        patients.allocate_ids(5)
+        expected = dump(store)
+        store.close()
+
+        recovered = open_store(tmp_path, appointment_class)
+        patients, appointments = recovered.repositories.values()
+        assert dump(recovered) == expected
+        assert [p.id for p in patients.search('091999')] == [anna.id]
+        assert patients.create('Dan', '60', '094').id == 9
+        assert appointments.create(anna.id, '2025-10-25', 'Follow-up').id == 4
+        recovered.close()
+
+    def test_clear_is_replayed(self, tmp_path):
+        """Test that clear() is logged and the ID sequence still moves on."""
+        store = open_store(tmp_path)
+        store.repositories['patients'].create('Anna', '30', '091')
+        store.repositories['patients'].clear()
+        store.close()
+        recovered = open_store(tmp_path)
+        assert dump(recovered)[0] == []
+        assert recovered.repositories['patients'].create('Bob', '40', '092').id == 2
+        recovered.close()
+
+    def test_snapshot_replaces_older_segments(self, tmp_path):
+        """Test recovery from a snapshot plus the log written after it."""
+        store = open_store(tmp_path)
+        patients, appointments = store.repositories.values()
+        anna = patients.create('Anna', '30', '091')
+        appointments.create(anna.id, '2025-10-22', 'Checkup')
+        patients.allocate_ids(3)
+        store.snapshot()
+        patients.update(anna.id, name='Anna Smith')
+        patients.create('Bob', '40', '092')
+        expected = dump(store)
+        store.close()
+
+        assert os.path.exists(os.path.join(tmp_path, SNAPSHOT_NAME))
+        assert list_segments(str(tmp_path)) == [2]
+        recovered = open_store(tmp_path)
+        assert dump(recovered) == expected
+        assert recovered.repositories['patients'].create('Carl', '50', '093').id == 6
+        recovered.close()
+
+    def test_automatic_snapshot(self, tmp_path):
+        """Test that the background thread snapshots after snapshot_every entries."""
+        store = open_store(tmp_path, snapshot_every=3, fsync_interval=0.01)
+        for _ in range(3):
+            store.repositories['patients'].create('Anna', '30', '091')
+        for _ in range(200):
+            if os.path.exists(os.path.join(tmp_path, SNAPSHOT_NAME)):
+                break
+            threading.Event().wait(0.01)
+        store.close()
+        assert os.path.exists(os.path.join(tmp_path, SNAPSHOT_NAME))
+        assert len(dump(open_store(tmp_path))[0]) == 3
+
+    def test_empty_batch_not_logged(self, tmp_path):
+        """Test that creating no records writes no log entry."""
+        store = open_store(tmp_path)
+        store.repositories['patients'].create_many([])
+        store.repositories['appointments'].create_many([])
+        assert store.wal.entries_since_rotate == 0
+        store.close()
+
+    def test_background_failure_is_reported(self, tmp_path, monkeypatch, caplog):
+        """Test that a failed snapshot is logged and raised, and syncing carries on."""
+        store = open_store(tmp_path, fsync='interval', fsync_interval=0.01, snapshot_every=1)
+        attempts, syncs = [], []
+        real_sync = store.wal.sync
+
+        def failing_snapshot():
+            attempts.append(1)
+            raise ValueError("cannot encode row")
+
+        def counting_sync():
+            syncs.append(1)
+            real_sync()
+
+        monkeypatch.setattr(store, 'snapshot', failing_snapshot)
+        monkeypatch.setattr(store.wal, 'sync', counting_sync)
+        patients = store.repositories['patients']
+        patients.create('Anna', '30', '091')
+        for _ in range(200):
+            if attempts:
+                break
+            threading.Event().wait(0.01)
+        with pytest.raises(OSError) as raised:
+            patients.create('Ben', '40', '092')
+        assert isinstance(raised.value.__cause__, ValueError)
+        assert "Background fsync or snapshot failed" in caplog.text
+        synced = len(syncs)
+        for _ in range(200):
+            if len(syncs) > synced:
+                break
+            threading.Event().wait(0.01)
+        assert store._thread.is_alive() and len(syncs) > synced
+        # A repeated failure is not logged again
+        assert caplog.text.count("Background fsync or snapshot failed") == 1
+        store.close()
+        assert len(dump(open_store(tmp_path))[0]) == 2
+
+    @pytest.mark.parametrize('fsync', ['interval', 'never'])
+    def test_relaxed_policies_recover_after_close(self, tmp_path, fsync):
+        """Test that relaxed fsync policies still flush everything on close."""
+        store = open_store(tmp_path, fsync=fsync)
+        store.repositories['patients'].create('Anna', '30', '091')
+        store.close()
+        assert len(dump(open_store(tmp_path))[0]) == 1
+
+
+class TestDurabilityConfig:
+    """Test cases for the DURABILITY_PATH setting."""
+
+    def test_engine_recovers_from_directory(self, tmp_path):
+        """Test that rebuilding the memory engine restores its data."""
+        config = {'DURABILITY_PATH': str(tmp_path)}
+        patients, _ = repositories.create_repositories('memory', config)
+        patients.create('Anna', '30', '091')
+        patients, _ = repositories.create_repositories('memory', config)
+        assert [p.name for p in patients.get_all()] == ['Anna']
+        repositories.durable_store.close()
+        repositories.durable_store = None
+
+    def test_disabled_by_default(self):
+        """Test that the memory engine keeps nothing on disk unless configured."""
+        patients, _ = repositories.create_repositories('memory', {})
+        assert patients._journal is None